@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark of the CLI: wall time and import time per subcommand.
+
+Each scenario runs main.py in a fresh interpreter with "-X importtime" and reports the median wall time,
+the cumulated import time and transport modules that must not be imported by that scenario.
+Exits with -1 if a scenario imports a forbidden module or exceeds --max-ms.
+
+    benchmarks/startup_time.py --runs 10 --max-ms 300 > startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+REPO_DIR = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+MAIN = os.path.join(REPO_DIR, "main.py")
+
+TRANSPORT_MODULES = ["pyvisa", "pyvisa_py", "requests", "urllib3", "urllib.request", "numpy"]
+
+
+class _ScpiRestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):  # noqa
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps("0").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # noqa
+        pass
+
+
+def parse_importtime(stderr: str) -> Tuple[int, List[str]]:
+    """
+    Returns the cumulated import time in µs and the imported top level package names.
+    """
+    total_us = 0
+    modules: List[str] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        modules.append(name.strip())
+        if len(name) - len(name.lstrip()) == 1:  # nested imports are indented
+            total_us += int(cumulative_us)
+    return total_us, modules
+
+
+def run_scenario(argv: List[str], forbidden: List[str], runs: int) -> Dict:
+    wall_ms: List[float] = []
+    import_us: List[int] = []
+    imported_forbidden: set = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", MAIN] + argv, capture_output=True, text=True, cwd=REPO_DIR)
+        wall_ms.append((time.perf_counter() - start) * 1000.0)
+        total_us, modules = parse_importtime(result.stderr)
+        import_us.append(total_us)
+        imported_forbidden.update(m for m in forbidden if m in modules)
+    return {
+        "argv": argv,
+        "runs": runs,
+        "wall_ms_median": round(statistics.median(wall_ms), 3),
+        "wall_ms_min": round(min(wall_ms), 3),
+        "import_ms_median": round(statistics.median(import_us) / 1000.0, 3),
+        "forbidden_imports": sorted(imported_forbidden),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CLI startup time benchmark", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--runs", help="runs per scenario", default=5, type=int)
+    parser.add_argument("--max-ms", help="fail if the median wall time of a scenario exceeds this limit", default=None, type=float)
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    from pygnova.command_catalogue import write_catalogue
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ScpiRestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rest_url = f"http://127.0.0.1:{server.server_address[1]}/scpi"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_catalogue(os.path.join(data_dir, "scpi-commands.catalogue"), {"*IDN": {}, "CHANnel<n>": {"SCALe": {}}})
+        data_args = ["--datadir", data_dir]
+        scenarios = {
+            "help": (["-h"], TRANSPORT_MODULES),
+            "commands --list": (data_args + ["commands", "--list"], TRANSPORT_MODULES),
+            "device --get (rest)": (data_args + ["--rest", rest_url, "device", "--get", "*IDN"], ["pyvisa", "pyvisa_py", "numpy"]),
+        }
+        report = {name: run_scenario(argv, forbidden, args.runs) for name, (argv, forbidden) in scenarios.items()}
+
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+    failed = [name for name, result in report.items()
+              if len(result["forbidden_imports"]) != 0 or (args.max_ms is not None and result["wall_ms_median"] > args.max_ms)]
+    for name in failed:
+        print(f"error: scenario \"{name}\" regressed: {report[name]}", file=sys.stderr)
+    return -1 if len(failed) != 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
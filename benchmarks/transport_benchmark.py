@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark of all transports against the local fake Magnova servers: connection setup time, queries/s, p50/p99 latency,
+pipelined queries/s (asyncio) and bulk transfer MB/s ("WAVeform:DATA?" binary block). Emits a JSON report.
+
+    benchmarks/transport_benchmark.py --queries 1000 --latency 0.0005 --block-size 4000000 --out benchmark.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+REPO_DIR = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from pygnova.async_instrument import get_async_instrument_from_url  # noqa: E402
+from pygnova.fake_instrument import FakeInstrument, FakeInstrumentThread  # noqa: E402
+from pygnova.instrument import TCP_TRANSPORT_SOCKET, TCP_TRANSPORT_VISA, get_instrument_from_url  # noqa: E402
+
+TRANSPORTS = ["visa-tcp", "socket-tcp", "rest", "async-tcp", "async-rest"]
+QUERY = "CHANnel1:SCALe"
+BLOCK_COMMAND = "WAVeform:DATA"
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def _latency_report(queries: int, open_ms: float, latencies_us: List[float]) -> Dict:
+    return {
+        "queries": queries,
+        "open_ms": round(open_ms, 3),
+        "latency_us_p50": round(percentile(latencies_us, 50), 1),
+        "latency_us_p99": round(percentile(latencies_us, 99), 1),
+        "latency_us_mean": round(statistics.fmean(latencies_us), 1),
+        "queries_per_second": round(queries / (sum(latencies_us) / 1e6), 1),
+    }
+
+
+def measure_sync(factory: Callable, queries: int, blocks: int) -> Dict:
+    latencies_us: List[float] = []
+    block_seconds: List[float] = []
+    block_bytes = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # instruments log each command
+        start = time.perf_counter()
+        instrument = factory()
+        with instrument:
+            open_ms = (time.perf_counter() - start) * 1000.0
+            for _ in range(queries):
+                t = time.perf_counter()
+                instrument.read(QUERY)
+                latencies_us.append((time.perf_counter() - t) * 1e6)
+            for _ in range(blocks):
+                t = time.perf_counter()
+                block_bytes += instrument.read_block(BLOCK_COMMAND).nbytes
+                block_seconds.append(time.perf_counter() - t)
+
+    report = _latency_report(queries, open_ms, latencies_us)
+    if blocks != 0:
+        report["block_bytes"] = block_bytes // blocks
+        report["block_mb_per_second"] = round(block_bytes / sum(block_seconds) / 1e6, 1)
+    return report
+
+
+async def _measure_async(url: str, queries: int, concurrency: int) -> Dict:
+    latencies_us: List[float] = []
+    start = time.perf_counter()
+    async with get_async_instrument_from_url(url) as instrument:
+        open_ms = (time.perf_counter() - start) * 1000.0
+        for _ in range(queries):
+            t = time.perf_counter()
+            await instrument.read(QUERY)
+            latencies_us.append((time.perf_counter() - t) * 1e6)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def pipelined_read() -> None:
+            async with semaphore:
+                await instrument.read(QUERY)
+
+        t = time.perf_counter()
+        await asyncio.gather(*(pipelined_read() for _ in range(queries)))
+        pipelined_seconds = time.perf_counter() - t
+
+    report = _latency_report(queries, open_ms, latencies_us)
+    report["pipelined_concurrency"] = concurrency
+    report["pipelined_queries_per_second"] = round(queries / pipelined_seconds, 1)
+    return report
+
+
+def measure(transport: str, fake: FakeInstrumentThread, args: argparse.Namespace) -> Dict:
+    if transport == "visa-tcp":
+        return measure_sync(lambda: get_instrument_from_url(fake.tcp_url, tcp_transport=TCP_TRANSPORT_VISA), args.queries, args.blocks)
+    if transport == "socket-tcp":
+        return measure_sync(lambda: get_instrument_from_url(fake.tcp_url, tcp_transport=TCP_TRANSPORT_SOCKET), args.queries, args.blocks)
+    if transport == "rest":
+        return measure_sync(lambda: get_instrument_from_url(fake.rest_url), args.queries, args.blocks)
+    if transport == "async-tcp":
+        return asyncio.run(_measure_async(fake.tcp_url, args.queries, args.concurrency))
+    if transport == "async-rest":
+        return asyncio.run(_measure_async(fake.rest_url, args.queries, args.concurrency))
+    raise ValueError(f"unknown {transport=}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="transport benchmark against fake Magnova servers",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--transports", help="comma-separated subset of " + ",".join(TRANSPORTS), default=",".join(TRANSPORTS), type=str)
+    parser.add_argument("--queries", help="queries per transport", default=500, type=int)
+    parser.add_argument("--latency", help="fake server response delay in seconds", default=0.0, type=float)
+    parser.add_argument("--reply-size", help="characters per query response; 0 for \"0\"", default=0, type=int)
+    parser.add_argument("--block-size", help="bytes per binary block transfer", default=1024 * 1024, type=int)
+    parser.add_argument("--blocks", help="binary block transfers per (blocking) transport", default=10, type=int)
+    parser.add_argument("--concurrency", help="in-flight queries of the pipelined (asyncio) measurement", default=16, type=int)
+    parser.add_argument("--out", help="JSON report file; stdout if not given", default=None, type=str)
+    args = parser.parse_args()
+
+    instrument = FakeInstrument(latency=args.latency, reply_size=args.reply_size, block_size=args.block_size)
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_s": args.latency,
+            "reply_size": args.reply_size,
+            "block_size": args.block_size,
+        },
+        "results": [],
+    }
+    with FakeInstrumentThread(instrument) as fake:
+        for transport in [t.strip() for t in args.transports.split(",") if len(t.strip()) != 0]:
+            try:
+                result = {"transport": transport, **measure(transport, fake, args)}
+            except ImportError as e:
+                result = {"transport": transport, "error": f"{e}"}
+            report["results"].append(result)
+
+    if args.out is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.out, "w") as out_file:
+            json.dump(report, out_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Query latency of the TCP socket transports (pyvisa vs. plain socket) against a local fake SCPI server;
+the blocking measurement of benchmarks/transport_benchmark.py without block transfers.
+
+    benchmarks/transport_latency.py --queries 1000 > latency.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+
+REPO_DIR = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.transport_benchmark import measure_sync  # noqa: E402
+from pygnova.fake_instrument import FakeInstrumentThread  # noqa: E402
+from pygnova.instrument import TCP_TRANSPORT_SOCKET, TCP_TRANSPORT_VISA, get_instrument_from_url  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="TCP transport latency comparison", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--queries", help="queries per transport", default=500, type=int)
+    args = parser.parse_args()
+
+    report = []
+    with FakeInstrumentThread() as fake:
+        for transport in (TCP_TRANSPORT_VISA, TCP_TRANSPORT_SOCKET):
+            factory = functools.partial(get_instrument_from_url, fake.tcp_url, tcp_transport=transport)
+            try:
+                report.append({"transport": transport, **measure_sync(factory, args.queries, blocks=0)})
+            except ImportError as e:
+                report.append({"transport": transport, "error": f"{e}"})
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,24 +19,286 @@ Note: ensure user belongs to group "users"
 ```
 """
 
+import argparse
+import contextlib
 import os
+import sys
+import tempfile
+import time
 
-import pyvisa_py as _pyvisa_py
-from pyvisa import Resource  # noqa
-
+from pygnova.batch import BatchRunner, parse_script, ScriptCommand
+from pygnova.capture import (
+    CapturePipeline, DecimatorConsumer, FileWriterConsumer, StatisticsConsumer, waveform_acquirer,
+)
 from pygnova.cli_args import CliArgs
-from pygnova.instrument import get_instrument_from_url
+from pygnova.command_catalogue import convert_pickle_to_catalogue
+from pygnova.fanout import print_report, run_on_devices
+from pygnova.instrument import ScpiReadWrite, get_instrument_from_url
 from pygnova.instrument_url import url_from_str, RestUrl
+from pygnova.instrumentation import LatencyHistogram, PrintListener
 from pygnova.known_commands import (
-    print_nested_json_tree, KnownCommandsFileReader, strip_args_from_cmd, KnownCommandsRestReader,
+    print_nested_json_tree, find_subtree, CommandsDiff, KnownCommandsFileReader, strip_args_from_cmd, KnownCommandsRestReader,
 )
 
-pyvisa_py = _pyvisa_py
+
+def open_instrument(args: argparse.Namespace, url: str | None = None, use_daemon: bool = True) -> ScpiReadWrite | None:
+    from pygnova.session_daemon import DaemonInstrument, daemon_available, default_socket_path
+
+    url = url if url is not None else args.url
+    socket_path = args.daemonsocket if args.daemonsocket is not None else default_socket_path()
+    if use_daemon and not args.nodaemon and url_from_str(url) is not None and daemon_available(socket_path):
+        instrument = DaemonInstrument(url, socket_path)
+    else:
+        instrument = get_instrument_from_url(url, tcp_transport=args.transport)
+    if instrument is not None:
+        for listener in args.listeners:
+            instrument.add_listener(listener)
+    return instrument
+
+
+def create_latency_histogram(arg_parser: CliArgs) -> LatencyHistogram:
+    args = arg_parser.args
+
+    # command nodes are normalized if the commands catalogue is available
+    commands = None
+    if os.path.isfile(arg_parser.get_commands_file_path()):
+        commands = KnownCommandsFileReader(args.datadir, args.commandsfile).load_commands()
+    return LatencyHistogram(commands)
+
+
+def read_script(script: str) -> list[ScriptCommand]:
+    if script == "-":
+        return parse_script(sys.stdin)
+    with open(script, "r") as in_file:
+        return parse_script(in_file)
+
+
+def check_commands(arg_parser: CliArgs, commands: list[ScriptCommand]) -> bool:
+    args = arg_parser.args
+
+    with KnownCommandsFileReader(args.datadir, args.commandsfile) as cmd_reader:
+        cmd_reader.load_commands()
+        unknown = [cmd for cmd in commands if not cmd_reader.is_known_command(cmd.text)]
+    for cmd in unknown:
+        print(f"error: line {cmd.line_nr}: no such command=\"{cmd.text}\"")
+    return len(unknown) == 0
+
+
+def interpret_script(arg_parser: CliArgs) -> int:
+    args = arg_parser.args
+
+    print(f"device: {args.url}")
+    try:
+        commands = read_script(args.script)
+    except OSError as e:
+        print(f"error: {e}")
+        return -1
+
+    if not args.nocheck and not check_commands(arg_parser, commands):
+        return -1
+
+    if args.checkerrors:
+        return interpret_script_checked(args, commands)
+
+    try:
+        with open_instrument(args) as instrument:
+            runner = BatchRunner(instrument, max_message_size=args.maxmessagesize)
+            for cmd, response in runner.run(commands):
+                if response is not None:
+                    print(f"{cmd.text} {response}")
+            print(f"executed {len(commands)} commands in {runner.round_trips} messages")
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+
+    return 0
+
+
+def interpret_script_checked(args: argparse.Namespace, commands: list[ScriptCommand]) -> int:
+    from pygnova.deferred_writes import DeferredWriteInstrument
+
+    # writes are deferred per command (not pre-coalesced) so that device errors are attributed to script lines
+    line_nrs = []  # per deferred write, see CommandError.index
+    try:
+        with DeferredWriteInstrument(open_instrument(args), args.maxmessagesize, raise_errors=False) as instrument:
+            for cmd in commands:
+                if cmd.is_query:
+                    print(f"{cmd.text} {instrument.query(cmd.text)}")
+                else:
+                    line_nrs.append(cmd.line_nr)
+                    instrument.write(cmd.text)
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+
+    for error in instrument.errors:
+        print(f"error: line {line_nrs[error.index] if error.index is not None else '?'}: {error}")
+    print(f"executed {len(commands)} commands in {instrument.round_trips + len(commands) - instrument.writes} messages")
+    return 0 if len(instrument.errors) == 0 else -1
+
+
+def interpret_capture(arg_parser: CliArgs) -> int:
+    args = arg_parser.args
+
+    if args.out is None:
+        print("error: --capture requires an --out directory")
+        return -1
+
+    print(f"device: {args.url}")
+    try:
+        writer = FileWriterConsumer(args.out)
+        statistics = StatisticsConsumer()
+        consumers = [writer if args.decimate == 1 else DecimatorConsumer(args.decimate, writer), statistics]
+
+        with open_instrument(args) as instrument:
+            pipeline = CapturePipeline(
+                waveform_acquirer(instrument, args.source, args.dataformat),
+                consumers,
+                queue_size=args.queuesize,
+                policy=CapturePipeline.POLICY_DROP_OLDEST if args.dropoldest else CapturePipeline.POLICY_BLOCK)
+            stats = pipeline.run(args.capture)
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+
+    print(f"capture: {stats}")
+    print(f"statistics: {statistics}")
+    if stats.error is not None:
+        print(f"error: {stats.error}")
+        return -1
+    return 0
+
+
+def interpret_snapshot(arg_parser: CliArgs) -> int:
+    from pygnova.snapshot import StateSnapshot, query_only_headers, restore_snapshot, settings_headers, take_snapshot
+
+    args = arg_parser.args
+
+    print(f"device: {args.url}")
+    try:
+        with KnownCommandsFileReader(args.datadir, args.commandsfile) as cmd_reader:
+            if cmd_reader.load_commands() is None:
+                print(f"error: {cmd_reader.file_path} does not exist, fetch with \"commands --get\" first")
+                return -1
+            headers = settings_headers(cmd_reader.commands, channels=args.channels)
+            query_only = query_only_headers(cmd_reader.commands, channels=args.channels)
+
+        if args.snapshot is not None:
+            with open_instrument(args) as instrument:
+                snapshot, messages = take_snapshot(instrument, args.url, headers, args.maxmessagesize)
+            snapshot.store(args.snapshot)
+            for header in snapshot.unreadable:
+                print(f"warning: not readable command=\"{header}\"")
+            print(f"stored {len(snapshot.settings)} settings to file=\"{args.snapshot}\" in {messages} messages")
+        else:
+            snapshot = StateSnapshot.load(args.restore)
+            with open_instrument(args) as instrument:
+                changes, errors, messages = restore_snapshot(
+                    instrument, snapshot, args.maxmessagesize, dry_run=args.dryrun, query_only=query_only)
+            for header, current, value in changes:
+                print(f"{header}: {current} -> {value}")
+            for error in errors:
+                print(f"error: device error after restore {error}")
+            print(f"{'would restore' if args.dryrun else 'restored'} {len(changes)} of {len(snapshot.settings)} settings "
+                  f"from file=\"{args.restore}\" in {messages} messages")
+            if len(errors) != 0:
+                return -1
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+
+    return 0
+
+
+def interpret_multiple_devices(arg_parser: CliArgs) -> int:
+    args = arg_parser.args
+
+    try:
+        if args.script:
+            commands = read_script(args.script)
+        elif args.get:
+            commands = [ScriptCommand(f"{strip_args_from_cmd(args.get)}?")]
+        elif args.set:
+            commands = [ScriptCommand(args.set)]
+        else:
+            print("error: multiple devices support --get, --set and --script only")
+            return -1
+    except OSError as e:
+        print(f"error: {e}")
+        return -1
+
+    if not args.nocheck and not check_commands(arg_parser, commands):
+        return -1
+
+    print(f"devices: {' '.join(args.urls)}")
+    start = time.monotonic()
+    results = run_on_devices(
+        args.urls,
+        lambda instrument: BatchRunner(instrument, max_message_size=args.maxmessagesize).run(commands),
+        max_workers=args.workers if args.workers > 0 else None,
+        instrument_factory=lambda url: open_instrument(args, url),
+        aliases=args.aliases)
+    print_report(
+        results,
+        time.monotonic() - start,
+        format_result=lambda responses: [f"{cmd.text} {response}" for cmd, response in responses if response is not None])
+
+    return 0 if all(r.ok for r in results) else -1
+
+
+class ProgressPrinter:
+    """
+    Prints the transfer progress in steps of 10%.
+    """
+
+    def __init__(self):
+        self.started: float = time.monotonic()
+        self.step: int = 0
+
+    def __call__(self, transferred: int, total: int) -> None:
+        step = transferred * 10 // total
+        if step > self.step:
+            self.step = step
+            elapsed = time.monotonic() - self.started
+            rate = transferred / elapsed / 1e6 if elapsed > 0 else 0.0
+            print(f"received {transferred}/{total} bytes ({step * 10}%) at {rate:.1f}MB/s")
+
+
+def stream_to_file(instrument: ScpiReadWrite, command: str, out: str, chunk_size: int) -> int:
+    if os.path.exists(out) and not os.path.isfile(out):
+        # i.e. /dev/stdout or a named pipe: written in place
+        with open(out, "wb") as out_file:
+            stats = instrument.stream_block(command, out_file, chunk_size, ProgressPrinter())
+    else:
+        # no partial files: the block is written to a temporary file which replaces out when complete
+        fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(out)}.", dir=os.path.dirname(os.path.abspath(out)))
+        try:
+            with os.fdopen(fd, "wb") as out_file:
+                stats = instrument.stream_block(command, out_file, chunk_size, ProgressPrinter())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, out)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    print(f"stored block response to file=\"{out}\": {stats}")
+    return 0
 
 
 def interpret_device_command(arg_parser: CliArgs) -> int:
     args = arg_parser.args
 
+    if len(args.urls) > 1:
+        return interpret_multiple_devices(arg_parser)
+
+    if args.script:
+        return interpret_script(arg_parser)
+
+    if args.capture is not None:
+        return interpret_capture(arg_parser)
+
+    if args.snapshot is not None or args.restore is not None:
+        return interpret_snapshot(arg_parser)
+
     if not args.get and not args.set:
         arg_parser.device_parser.print_help()
         return -1
@@ -46,9 +308,10 @@ def interpret_device_command(arg_parser: CliArgs) -> int:
 
     if not args.nocheck:
         try:
-            cmd_reader = KnownCommandsFileReader(args.datadir, args.commandsfile)
-            cmd_reader.load_commands()
-            if not cmd_reader.is_known_command(command):
+            with KnownCommandsFileReader(args.datadir, args.commandsfile) as cmd_reader:
+                cmd_reader.load_commands()
+                known = cmd_reader.is_known_command(command)
+            if not known:
                 print(f"error: no such {command=}")
                 return -1
         except FileNotFoundError as e:
@@ -56,12 +319,23 @@ def interpret_device_command(arg_parser: CliArgs) -> int:
             return -1
 
     try:
-        with get_instrument_from_url(args.url) as instrument:
+        # a block streamed to a file bypasses the daemon, which would relay it as one message instead of in chunks
+        with open_instrument(args, use_daemon=not (args.get and args.out is not None)) as instrument:
             cmd = strip_args_from_cmd(command)
-            if args.get:
+            if args.get and args.out is not None:
+                return stream_to_file(instrument, cmd, args.out, args.chunksize)
+            elif args.get:
                 if cmd != command:
                     print(f"warning: stripped command from={command} to={cmd} ")
-                instrument.read(cmd)
+                response = instrument.read(cmd)
+                if args.quiet:
+                    print(response)  # logged by the PrintListener otherwise
+            elif args.set and args.checkerrors:
+                from pygnova.deferred_writes import DeferredWriteInstrument
+
+                deferred = DeferredWriteInstrument(instrument, args.maxmessagesize)
+                deferred.write(command)
+                deferred.sync()
             elif args.set:
                 instrument.write(command)
             else:
@@ -76,17 +350,82 @@ def interpret_device_command(arg_parser: CliArgs) -> int:
     return 0
 
 
+def fetch_commands(cmd_writer: KnownCommandsFileReader, url: RestUrl) -> int:
+    stored = cmd_writer.load_commands() is not None
+    meta = cmd_writer.load_meta()
+    if not stored or meta.get("source_url") != url.to_str_url():
+        meta = {}  # unconditional fetch if the catalogue is missing or from another device
+    with KnownCommandsRestReader(url, etag=meta.get("etag"), last_modified=meta.get("last_modified")) as cmd_reader:
+        if cmd_reader.not_modified:
+            print(f"commands of {cmd_reader.source_url} not modified since last fetch, keeping {cmd_writer.file_path}")
+            return 0
+        commands_tree = cmd_reader.load_known_commands()
+        if commands_tree is None:
+            return -1
+
+    new_meta = {"source_url": cmd_reader.source_url, "etag": cmd_reader.etag, "last_modified": cmd_reader.last_modified,
+                "sha256": cmd_reader.sha256}
+    if meta.get("sha256") == cmd_reader.sha256:
+        print(f"commands of {cmd_reader.source_url} unchanged, keeping {cmd_writer.file_path}")
+        cmd_writer.store_meta(new_meta)
+        return 0
+
+    diff = CommandsDiff(cmd_writer.commands if stored else None, commands_tree)
+    print(diff)
+    if stored and not diff.changed:
+        print(f"commands of {cmd_reader.source_url} unchanged, keeping {cmd_writer.file_path}")
+    else:
+        cmd_writer.commands = commands_tree
+        print(f"storing {cmd_reader.source_url} -> {cmd_writer.file_path} ...")
+        cmd_writer.store_commands()
+    cmd_writer.store_meta(new_meta)
+    return 0
+
+
 def interpret_commands_command(arg_parser: CliArgs) -> int:
     args = arg_parser.args
 
-    if args.list:
+    if args.list is not None:
         commands_file = arg_parser.get_commands_file_path()
         if not os.path.isfile(commands_file):
             print(f"error: {commands_file} does not exist, fetch with \"rest -o\" first")
             return -1
-        cmd_reader = KnownCommandsFileReader(args.datadir, args.commandsfile)
-        cmd_reader.load_commands()
-        print_nested_json_tree(cmd_reader.commands)
+        with KnownCommandsFileReader(args.datadir, args.commandsfile) as cmd_reader:
+            if cmd_reader.load_commands() is None:
+                return -1
+            subtree = find_subtree(cmd_reader.commands, args.list)
+        if subtree is None:
+            print(f"error: no such command path=\"{args.list}\"")
+            return -1
+        print_nested_json_tree(subtree, max_depth=args.depth, root=args.list if len(args.list) != 0 else "*")
+        return 0
+
+    elif args.search is not None or args.complete is not None or args.shellcompletion:
+        from pygnova.command_search import CommandSearchIndex, bash_completion_script
+
+        commands_file = arg_parser.get_commands_file_path()
+        if args.shellcompletion:
+            print(bash_completion_script(commands_file, os.path.basename(sys.argv[0])), end="")
+            return 0
+        try:
+            index = CommandSearchIndex.load(commands_file)
+        except (OSError, ValueError) as e:
+            print(f"error: {e}")
+            return -1
+        results = index.search(args.search, args.limit) if args.search is not None else index.complete(args.complete, args.limit)
+        print("".join(f"{r}\n" for r in results), end="")
+        return 0
+
+    elif args.convert:
+        commands_file = arg_parser.get_commands_file_path()
+        print(f"converting {args.convert} -> {commands_file} ...")
+        try:
+            if not convert_pickle_to_catalogue(args.convert, commands_file):
+                print(f"error: no commands tree in file=\"{args.convert}\"")
+                return -1
+        except Exception as e:
+            print(f"error: {e}")
+            return -1
         return 0
 
     elif args.get:
@@ -94,22 +433,74 @@ def interpret_commands_command(arg_parser: CliArgs) -> int:
         if type(url) is not RestUrl:
             arg_parser.commands_parser.print_help()
             return -1
-        with KnownCommandsRestReader(url) as cmd_reader:
-            commands_tree = cmd_reader.load_known_commands()
-            if commands_tree is not None:
-                print_nested_json_tree(commands_tree)
-                if hasattr(args, "commandsfile"):
-                    cmd_writer = KnownCommandsFileReader(args.datadir, args.commandsfile)
-                    cmd_writer.commands = commands_tree
-                    print(f"storing {cmd_reader.source_url} -> {cmd_writer.file_path} ...")
-                    cmd_writer.store_commands()
-            else:
-                return -1
+        with KnownCommandsFileReader(args.datadir, args.commandsfile) as cmd_writer:
+            return fetch_commands(cmd_writer, url)
     else:
         arg_parser.commands_parser.print_help()
         return -1
 
 
+def interpret_monitor_command(arg_parser: CliArgs) -> int:
+    from pygnova.monitor import CsvSink, JsonLinesSink, Monitor
+
+    args = arg_parser.args
+
+    if len(args.queries) == 0:
+        arg_parser.monitor_parser.print_help()
+        return -1
+
+    if not args.nocheck and not check_commands(arg_parser, [ScriptCommand(q) for q in args.queries]):
+        return -1
+
+    print(f"device: {args.url}")
+    out_file = args.stdout if args.out == "-" else None
+    try:
+        if out_file is None:
+            out_file = open(args.out, "w", newline="")
+        sink = (CsvSink if args.format == "csv" else JsonLinesSink)(out_file, args.queries)
+        with open_instrument(args) as instrument:
+            monitor = Monitor(instrument, args.queries, args.frequency, sink, max_message_size=args.maxmessagesize)
+            stats = monitor.run(duration=args.duration, samples=args.samples)
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+    finally:
+        if out_file is not None and out_file is not args.stdout:
+            out_file.close()
+
+    print(f"monitor: {stats}")
+    return 0
+
+
+def interpret_daemon_command(arg_parser: CliArgs) -> int:
+    from pygnova.session_daemon import SessionDaemon, default_socket_path
+
+    args = arg_parser.args
+    daemon = SessionDaemon(
+        args.daemonsocket if args.daemonsocket is not None else default_socket_path(),
+        lambda url: open_instrument(args, url, use_daemon=False),
+        max_message_size=args.maxmessagesize)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"error: {e}")
+        return -1
+    return 0
+
+
+def interpret_discover_command(arg_parser: CliArgs) -> int:
+    from pygnova.discovery import DiscoveryCache, default_cache_path, discover
+
+    args = arg_parser.args
+    devices = discover(DiscoveryCache(default_cache_path(args.datadir), args.discoveryttl), refresh=args.refresh, mdns_timeout=args.timeout)
+    for device in devices:
+        print(f"{device.alias:<24} {device.source:<5} {device.url}")
+    print(f"discovered {len(devices)} device(s)")
+    return 0
+
+
 def main() -> int:
     arg_parser = CliArgs()
     cli_args = arg_parser.parse()
@@ -117,13 +508,27 @@ def main() -> int:
     known_commands = [
         ("device", interpret_device_command),
         ("commands", interpret_commands_command),
+        ("discover", interpret_discover_command),
+        ("monitor", interpret_monitor_command),
+        ("daemon", interpret_daemon_command),
     ]
 
     if cli_args.command not in [cmd for cmd, _impl in known_commands]:
         arg_parser.parser.print_help()
         return -1
 
-    return [impl(arg_parser) for name, impl in known_commands if name == cli_args.command][0]
+    histogram = create_latency_histogram(arg_parser) if cli_args.stats else None
+    # attached to each opened instrument by open_instrument
+    cli_args.listeners = ([] if cli_args.quiet else [PrintListener()]) + ([histogram] if histogram is not None else [])
+    # monitor data written to stdout: status output and the command log go to stderr
+    cli_args.stdout = sys.stdout
+    status_to_stderr = cli_args.command == "monitor" and cli_args.out == "-"
+    with contextlib.redirect_stdout(sys.stderr) if status_to_stderr else contextlib.nullcontext():
+        try:
+            return [impl(arg_parser) for name, impl in known_commands if name == cli_args.command][0]
+        finally:
+            if histogram is not None:
+                print(f"latency statistics:\n{histogram}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+import abc
+import asyncio
+import collections
+import json
+import socket
+from typing import Deque, Dict, Optional, Union, TYPE_CHECKING
+
+from pygnova.instrument_url import RestUrl, VisaTcpUrl, url_from_str
+from pygnova.scpi_numbers import parse_array, parse_float
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class AsyncScpiReadWrite(metaclass=abc.ABCMeta):
+    """
+    Asynchronous counterpart of ScpiReadWrite. Queries may be issued concurrently;
+    they are sent in call order without awaiting previous replies, and replies are matched to queries in order.
+    """
+
+    @abc.abstractmethod
+    async def read(self, command: str) -> str:
+        """
+        The trailing '?' is appended automatically and shall be omitted in the command string.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def query(self, message: str) -> str:
+        """
+        Sends the (compound) message as is and returns the raw response message.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def write(self, command: str) -> None:
+        """
+        Optional space-separated arguments may be contained in the command string.
+        """
+        raise NotImplementedError
+
+    async def query_float(self, command: str) -> float:
+        return parse_float(await self.query(f"{command}?"))
+
+    async def query_ints(self, command: str) -> "np.ndarray":
+        return parse_array(await self.query(f"{command}?"), "i8")
+
+    async def query_array(self, command: str, dtype: "str | np.dtype" = "f8") -> "np.ndarray":
+        return parse_array(await self.query(f"{command}?"), dtype)
+
+
+class _PipelinedConnection(AsyncScpiReadWrite, metaclass=abc.ABCMeta):
+    """
+    Stream connection with in-flight requests: each request that expects a response queues a future,
+    a reader task resolves the futures in order. Replies to timed out requests are read and discarded.
+    """
+
+    def __init__(self, host: str, port: int, rw_timeout: int, open_timeout: int):
+        self.host: str = host
+        self.port: int = port
+        self.rw_timeout: int = rw_timeout
+        self.open_timeout: int = open_timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._failure: Optional[Exception] = None
+        self._pending: Deque[asyncio.Future] = collections.deque()
+        self._send_lock: asyncio.Lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.open_timeout / 1000)
+            self._writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._reader_task = asyncio.create_task(self._read_loop())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._writer is not None:
+            self._reader_task.cancel()
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._fail_pending(ConnectionError("connection closed"))
+            self._reader, self._writer, self._reader_task, self._failure = None, None, None, None
+        return False
+
+    @abc.abstractmethod
+    async def _read_response(self) -> str:
+        raise NotImplementedError
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                response = await self._read_response()
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # noqa
+            self._failure = e if isinstance(e, ConnectionError) else ConnectionError(f"connection lost: {e}")
+            self._fail_pending(self._failure)
+
+    def _fail_pending(self, error: Exception) -> None:
+        while len(self._pending) != 0:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def _request(self, data: bytes, expect_response: bool) -> Optional[str]:
+        if self._writer is None:
+            raise ConnectionError(f"not connected to {self.host}:{self.port}")
+        future: Optional[asyncio.Future] = asyncio.get_running_loop().create_future() if expect_response else None
+        async with self._send_lock:
+            if self._failure is not None:
+                # nobody would resolve the future once the reader task has stopped
+                raise ConnectionError(f"connection to {self.host}:{self.port} lost") from self._failure
+            # no suspension point between writing and queueing: a cancelled or failed request never leaves a future
+            # without request (or a request without future) behind, which would shift all following responses
+            self._writer.write(data)
+            if future is not None:
+                self._pending.append(future)
+            await self._writer.drain()
+        if future is None:
+            return None
+        return await asyncio.wait_for(future, self.rw_timeout / 1000)
+
+
+class AsyncTcpInstrument(_PipelinedConnection):
+
+    def __init__(self,
+                 url: VisaTcpUrl,
+                 write_termination: str = "\n",
+                 read_termination: str = "\n",
+                 rw_timeout: int = 1000,
+                 open_timeout: int = 10000):
+        super().__init__(url.ip_address, url.tcp_port, rw_timeout, open_timeout)
+        self.instrument_url: str = url.to_str_url()
+        self.write_termination: str = write_termination
+        self.read_termination: str = read_termination
+
+    async def _read_response(self) -> str:
+        line = await self._reader.readuntil(self.read_termination.encode("utf-8"))
+        return line[:-len(self.read_termination)].decode("utf-8")
+
+    async def read(self, command: str) -> str:
+        return await self.query(f"{command}?")
+
+    async def query(self, message: str) -> str:
+        return await self._request(f"{message}{self.write_termination}".encode("utf-8"), expect_response=True)
+
+    async def write(self, command: str) -> None:
+        await self._request(f"{command}{self.write_termination}".encode("utf-8"), expect_response=False)
+
+
+class _HttpError(str):
+    pass
+
+
+class AsyncRestInstrument(_PipelinedConnection):
+    """
+    Minimal HTTP/1.1 keep-alive client pipelining POST requests on one connection.
+    """
+
+    def __init__(self, url: RestUrl, rw_timeout: int = 10000, open_timeout: int = 3000):
+        super().__init__(url.ip_address, url.tcp_port, rw_timeout, open_timeout)
+        self.instrument_url: str = url.to_str_url()
+        self.path: str = url.path
+
+    async def _read_response(self) -> str:
+        status_line = (await self._reader.readline()).decode("latin-1")
+        if len(status_line) == 0:
+            raise ConnectionError("connection closed by server")
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await self._reader.readline()).decode("latin-1").rstrip("\r\n")
+            if len(line) == 0:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await self._reader.readline()).split(b";", 1)[0], 16)
+                chunk = await self._reader.readexactly(size + 2)  # chunk data and CRLF
+                if size == 0:
+                    break
+                body.extend(chunk[:-2])
+        else:
+            body = await self._reader.readexactly(int(headers.get("content-length", "0")))
+
+        status = status_line.split(" ", 2)
+        if len(status) < 2 or not status[1].startswith("2"):
+            # the response is consumed, but the matching request fails
+            return _HttpError(status_line.strip())
+        response = json.loads(body) if len(body) != 0 else None
+        return response if isinstance(response, str) else json.dumps(response)
+
+    def _http_request(self, message: str) -> bytes:
+        body = json.dumps(message).encode("utf-8")
+        return (f"POST /{self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode("latin-1") + body
+
+    async def _checked_request(self, message: str) -> str:
+        response = await self._request(self._http_request(message), expect_response=True)
+        if isinstance(response, _HttpError):
+            raise ConnectionError(f"request failed: {response}")
+        return response
+
+    async def read(self, command: str) -> str:
+        return await self.query(f"{command}?")
+
+    async def query(self, message: str) -> str:
+        return await self._checked_request(message)
+
+    async def write(self, command: str) -> None:
+        # each POST is answered: await the response to keep request/response matching in order
+        await self._checked_request(command)
+
+
+def get_async_instrument_from_url(url: str, **kwargs) -> AsyncTcpInstrument | AsyncRestInstrument | None:
+    known_types = {
+        RestUrl: AsyncRestInstrument,
+        VisaTcpUrl: AsyncTcpInstrument,
+    }
+
+    url_object: Union[RestUrl, VisaTcpUrl, None] = url_from_str(url)
+    clazz = known_types.get(type(url_object))
+    return clazz(url_object, **kwargs) if clazz is not None else None
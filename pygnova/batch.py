@@ -0,0 +1,121 @@
+from typing import Iterable, List, Optional, Tuple
+
+from pygnova.instrument import ScpiReadWrite
+from pygnova.known_commands import strip_args_from_cmd
+
+
+class ScriptCommand:
+
+    def __init__(self, text: str, line_nr: int = 0):
+        self.text: str = text
+        self.line_nr: int = line_nr
+
+    @property
+    def is_query(self) -> bool:
+        return "?" in self.text.split(" ", 1)[0]
+
+    @property
+    def command(self) -> str:
+        """
+        The command without arguments and without trailing '?'.
+        """
+        return strip_args_from_cmd(self.text)
+
+    def __repr__(self) -> str:
+        return f"ScriptCommand({self.text!r}, line_nr={self.line_nr})"
+
+
+def parse_script(lines: Iterable[str], comment: str = "#") -> List[ScriptCommand]:
+    commands: List[ScriptCommand] = []
+    for line_nr, line in enumerate(lines, start=1):
+        text = line.split(comment, 1)[0].strip()
+        if len(text) != 0:
+            commands.append(ScriptCommand(text, line_nr))
+    return commands
+
+
+def join_compound(commands: List[ScriptCommand]) -> str:
+    """
+    Joins commands to one compound message.
+    Each but the first command is prefixed with ':' to reset the header path to the root node (common '*' commands are not).
+    """
+    parts: List[str] = []
+    for idx, cmd in enumerate(commands):
+        text = cmd.text
+        if idx != 0 and not text.startswith((":", "*")):
+            text = f":{text}"
+        parts.append(text)
+    return ";".join(parts)
+
+
+def coalesce(commands: List[ScriptCommand], max_message_size: int = 512) -> List[List[ScriptCommand]]:
+    """
+    Groups consecutive commands so that each joined compound message does not exceed max_message_size.
+    A single command longer than max_message_size is sent as is.
+    """
+    batches: List[List[ScriptCommand]] = []
+    batch: List[ScriptCommand] = []
+    size = 0
+    for cmd in commands:
+        cmd_size = len(cmd.text) + (0 if len(batch) == 0 else 2)  # separator ";" and root prefix ":"
+        if len(batch) != 0 and size + cmd_size > max_message_size:
+            batches.append(batch)
+            batch, size, cmd_size = [], 0, len(cmd.text)
+        batch.append(cmd)
+        size += cmd_size
+    if len(batch) != 0:
+        batches.append(batch)
+    return batches
+
+
+def split_compound_reply(reply: str, separator: str = ";", quotes: str = "\"'") -> List[str]:
+    """
+    Splits a compound response message at separators which are not enclosed in quotes.
+    """
+    parts: List[str] = []
+    current: List[str] = []
+    quote: Optional[str] = None
+    for char in reply.strip():
+        if quote is not None:
+            quote = None if char == quote else quote
+        elif char in quotes:
+            quote = char
+        elif char == separator:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+class BatchRunner:
+
+    def __init__(self, instrument: ScpiReadWrite, max_message_size: int = 512):
+        self.instrument: ScpiReadWrite = instrument
+        self.max_message_size: int = max_message_size
+        self.round_trips: int = 0
+
+    def run(self, commands: List[ScriptCommand]) -> List[Tuple[ScriptCommand, Optional[str]]]:
+        """
+        Returns each command along with its response; responses of non-query commands are None.
+        """
+        results: List[Tuple[ScriptCommand, Optional[str]]] = []
+        for batch in coalesce(commands, self.max_message_size):
+            results.extend(self.run_batch(batch))
+        return results
+
+    def run_batch(self, batch: List[ScriptCommand]) -> List[Tuple[ScriptCommand, Optional[str]]]:
+        message = join_compound(batch)
+        queries = [cmd for cmd in batch if cmd.is_query]
+        self.round_trips += 1
+
+        if len(queries) == 0:
+            self.instrument.write(message)
+            return [(cmd, None) for cmd in batch]
+
+        replies = split_compound_reply(self.instrument.query(message))
+        if len(replies) != len(queries):
+            raise ValueError(f"expected {len(queries)} responses but received {len(replies)} for message=\"{message}\"")
+        replies_iter = iter(replies)
+        return [(cmd, next(replies_iter) if cmd.is_query else None) for cmd in batch]
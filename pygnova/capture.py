@@ -0,0 +1,246 @@
+import abc
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from pygnova.instrument import ScpiReadWrite
+from pygnova.waveform import Waveform, WaveformPreamble
+
+
+class Frame:
+
+    def __init__(self, index: int, waveform: Waveform):
+        self.index: int = index
+        self.timestamp: float = time.time()
+        self.waveform: Waveform = waveform
+
+
+class FrameConsumer(metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def consume(self, frame: Frame) -> None:
+        """
+        Called from the consumer thread for each captured frame in capture order.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FileWriterConsumer(FrameConsumer):
+    """
+    Writes the raw samples of each frame to <out_dir>/frame-<index>.npy along with the preamble as JSON.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir: str = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+
+    def consume(self, frame: Frame) -> None:
+        import numpy as np
+
+        base_name = os.path.join(self.out_dir, f"frame-{frame.index:06d}")
+        np.save(f"{base_name}.npy", frame.waveform.raw)
+        with open(f"{base_name}.json", "w") as out_file:
+            json.dump({"index": frame.index, "timestamp": frame.timestamp, "preamble": vars(frame.waveform.preamble)}, out_file)
+
+
+class DecimatorConsumer(FrameConsumer):
+    """
+    Forwards every factor-th sample of each frame to the downstream consumer.
+    """
+
+    def __init__(self, factor: int, downstream: FrameConsumer):
+        if factor < 1:
+            raise ValueError(f"invalid decimation {factor=}")
+        self.factor: int = factor
+        self.downstream: FrameConsumer = downstream
+
+    def consume(self, frame: Frame) -> None:
+        preamble: WaveformPreamble = copy.copy(frame.waveform.preamble)
+        preamble.x_increment *= self.factor
+        preamble.points = (preamble.points + self.factor - 1) // self.factor
+
+        decimated = Frame(frame.index, Waveform(preamble, frame.waveform.raw[::self.factor]))
+        decimated.timestamp = frame.timestamp
+        self.downstream.consume(decimated)
+
+    def close(self) -> None:
+        self.downstream.close()
+
+
+class StatisticsConsumer(FrameConsumer):
+    """
+    Accumulates the minimum, maximum and mean voltage over all frames.
+    """
+
+    def __init__(self):
+        self.frames: int = 0
+        self.samples: int = 0
+        self.minimum: float = float("inf")
+        self.maximum: float = float("-inf")
+        self._sum: float = 0.0
+
+    def consume(self, frame: Frame) -> None:
+        voltages = frame.waveform.voltages()
+        if len(voltages) == 0:
+            return
+        self.frames += 1
+        self.samples += len(voltages)
+        self.minimum = min(self.minimum, float(voltages.min()))
+        self.maximum = max(self.maximum, float(voltages.max()))
+        self._sum += float(voltages.sum())
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.samples if self.samples != 0 else float("nan")
+
+    def __str__(self) -> str:
+        return f"frames={self.frames} samples={self.samples} min={self.minimum:g}V max={self.maximum:g}V mean={self.mean:g}V"
+
+
+class CaptureStats:
+
+    def __init__(self):
+        self.acquired: int = 0
+        self.consumed: int = 0
+        self.dropped: int = 0
+        self.started: float = time.monotonic()
+        self.stopped: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.stopped if self.stopped is not None else time.monotonic()) - self.started
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.acquired / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"acquired={self.acquired} consumed={self.consumed} dropped={self.dropped} "
+                f"elapsed={self.elapsed:.3f}s rate={self.frames_per_second:.2f}frames/s")
+
+
+class CapturePipeline:
+    """
+    Acquires frames in a producer thread and hands them through a bounded queue to the consumers running in a consumer thread.
+    When the queue is full the producer either waits (POLICY_BLOCK, backpressure) or drops the oldest queued frame.
+    """
+
+    POLICY_BLOCK = "block"
+    POLICY_DROP_OLDEST = "drop-oldest"
+
+    def __init__(self,
+                 acquire: Callable[[], Waveform],
+                 consumers: List[FrameConsumer],
+                 queue_size: int = 8,
+                 policy: str = POLICY_BLOCK):
+        if policy not in (self.POLICY_BLOCK, self.POLICY_DROP_OLDEST):
+            raise ValueError(f"unsupported capture {policy=}")
+        self.acquire: Callable[[], Waveform] = acquire
+        self.consumers: List[FrameConsumer] = consumers
+        self.policy: str = policy
+        self.stats: CaptureStats = CaptureStats()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._producer: Optional[threading.Thread] = None
+        self._consumer: Optional[threading.Thread] = None
+
+    def start(self, frame_count: int) -> None:
+        self.stats = CaptureStats()
+        self._stop.clear()
+        self._producer = threading.Thread(target=self._produce, args=(frame_count,), name="capture-producer", daemon=True)
+        self._consumer = threading.Thread(target=self._consume, name="capture-consumer", daemon=True)
+        self._consumer.start()
+        self._producer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> CaptureStats:
+        for thread in (self._producer, self._consumer):
+            if thread is not None:
+                thread.join()
+        self.stats.stopped = time.monotonic()
+        return self.stats
+
+    def run(self, frame_count: int) -> CaptureStats:
+        self.start(frame_count)
+        try:
+            return self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            return self.join()
+
+    def _put(self, frame: Frame) -> None:
+        if self.policy == self.POLICY_BLOCK:
+            self._queue.put(frame)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.stats.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _produce(self, frame_count: int) -> None:
+        try:
+            for index in range(frame_count):
+                if self._stop.is_set():
+                    break
+                frame = Frame(index, self.acquire())
+                self.stats.acquired += 1
+                self._put(frame)
+        except Exception as e:  # noqa
+            self.stats.error = e
+            self._stop.set()
+        finally:
+            self._queue.put(None)  # end of capture
+
+    def _consume(self) -> None:
+        failed = False
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                if failed:
+                    continue  # drain the queue to release a blocked producer
+                try:
+                    for consumer in self.consumers:
+                        consumer.consume(frame)
+                    self.stats.consumed += 1
+                except Exception as e:  # noqa
+                    self.stats.error = e
+                    self._stop.set()
+                    failed = True
+        finally:
+            for consumer in self.consumers:
+                consumer.close()
+
+
+def waveform_acquirer(instrument: ScpiReadWrite,
+                      source: str = "CHANnel1",
+                      data_format: str = "WORD",
+                      single: bool = True) -> Callable[[], Waveform]:
+    """
+    Returns an acquisition function for the capture producer thread.
+    With single=True each frame is triggered by ":SINGle" and awaited with "*OPC?" before reading the waveform.
+    """
+
+    def acquire() -> Waveform:
+        if single:
+            instrument.query(":SINGle;*OPC?")
+        return instrument.read_waveform(source, data_format)
+
+    return acquire
@@ -1,8 +1,27 @@
 import argparse
 import os
+import re
+import sys
+from typing import Callable, List, Optional
 from argparse import _SubParsersAction  # noqa
 
-from pygnova.instrument_url import RestUrl, VisaTcpUrl, VisaUsbUrl
+from pygnova.fanout import read_inventory
+from pygnova.instrument import TCP_TRANSPORT_SOCKET, TCP_TRANSPORT_VISA
+from pygnova.instrument_url import RestUrl, VisaTcpUrl, VisaUsbUrl, url_from_str
+
+# bare host name (with domain) or IPv4 address of a connection option, optionally followed by a port
+_HOST = re.compile(r"^([0-9a-zA-Z]+(?:\.[0-9a-zA-Z]+)+|localhost)(?::(\d+))?$")
+
+
+class DiscoveryName(str):
+    """
+    "auto" or device alias given for a connection option, resolved by device discovery to a URL of url_class.
+    """
+
+    def __new__(cls, name: str, url_class: type):
+        instance = super().__new__(cls, name)
+        instance.url_class = url_class
+        return instance
 
 
 class CliArgs:
@@ -15,66 +34,139 @@ class CliArgs:
         self.default_tcp_scpi_port: int = 5025
         self.default_tcp_rest_port: int = 8080
 
-        self.default_rest_url: RestUrl = RestUrl(self.ip_address, self.default_tcp_rest_port)
-        self.default_tcp_url: VisaTcpUrl = VisaTcpUrl(self.ip_address, self.default_tcp_scpi_port)
-        self.default_usb_url: VisaUsbUrl = VisaUsbUrl(self.id_vendor, self.id_product, self.serial_nr)
-        self.commands_pickle_name = "scpi-commands.pickle"
+        self.commands_catalogue_name = "scpi-commands.catalogue"
         self.commands_default_artifact_path = os.path.realpath(os.path.join(os.path.abspath(os.path.dirname(__file__)), "../tmp"))
 
-        self.parser: argparse.ArgumentParser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-        self._add_global_args(self.parser)
-
-        commands_parser = self.parser.add_subparsers(dest='command', title="command")
-        self.device_parser = self._declare_device_args(commands_parser)
-        self.commands_parser = self._declare_commands_args(commands_parser)
+        # the argument parser is declared on first use, see parser property
+        self._parser: argparse.ArgumentParser | None = None
+        self.device_parser: argparse.ArgumentParser | None = None
+        self.commands_parser: argparse.ArgumentParser | None = None
+        self.discover_parser: argparse.ArgumentParser | None = None
+        self.monitor_parser: argparse.ArgumentParser | None = None
+        self.daemon_parser: argparse.ArgumentParser | None = None
 
         self.args: argparse.Namespace | None = None
 
+    @property
+    def default_rest_url(self) -> RestUrl:
+        return RestUrl(self.ip_address, self.default_tcp_rest_port)
+
+    @property
+    def default_tcp_url(self) -> VisaTcpUrl:
+        return VisaTcpUrl(self.ip_address, self.default_tcp_scpi_port)
+
+    @property
+    def default_usb_url(self) -> VisaUsbUrl:
+        return VisaUsbUrl(self.id_vendor, self.id_product, self.serial_nr)
+
+    @property
+    def parser(self) -> argparse.ArgumentParser:
+        if self._parser is None:
+            self._parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+            self._add_global_args(self._parser)
+
+            commands_parser = self._parser.add_subparsers(dest='command', title="command")
+            self.device_parser = self._declare_device_args(commands_parser)
+            self.commands_parser = self._declare_commands_args(commands_parser)
+            self.discover_parser = self._declare_discover_args(commands_parser)
+            self.monitor_parser = self._declare_monitor_args(commands_parser)
+            self.daemon_parser = self._declare_daemon_args(commands_parser)
+        return self._parser
+
+    @staticmethod
+    def _url_type(parser: argparse.ArgumentParser, clazz, default: str, msg: str,
+                  from_host: Callable[[str, Optional[int]], object] | None = None):
+        def to_str_url(u: str) -> str:
+            if u == "-":
+                return default
+            url = clazz.from_str_url(u)
+            if url is not None:
+                return url.to_str_url()
+            m = _HOST.match(u)
+            if m is not None and from_host is not None:
+                return from_host(m.group(1), int(m.group(2)) if m.group(2) else None).to_str_url()  # noqa
+            if m is None and "::" not in u and "://" not in u:
+                return DiscoveryName(u, clazz)  # "auto" or device alias, resolved by device discovery
+            return parser.error(msg)
+        return to_str_url
+
     def _add_global_args(self, parser: argparse.ArgumentParser) -> None:
-        grp = parser.add_argument_group(title="connection args")
-        grp = grp.add_mutually_exclusive_group()
+        grp = parser.add_argument_group(title="connection args (repeat to address several devices)")
         grp.add_argument(
             "-u", "--url",
-            help=f"USBTMC/USB URL; use - for default (default: {self.default_usb_url.to_str_url()})",
+            help=f"USBTMC/USB URL, \"auto\" or discovered device alias; use - for default (default: {self.default_usb_url.to_str_url()})",
             default=argparse.SUPPRESS,
             const=self.default_usb_url.to_str_url(),
-            dest="url",
+            dest="urls",
+            action="append",
             nargs="?",
-            type=lambda u, default=self.default_usb_url.to_str_url(), clazz=VisaUsbUrl, msg="invalid USBTMC URL":
-            default if u == "-"
-            else clazz.from_str_url(u).to_str_url() if clazz.from_str_url(u) is not None
-            else parser.error(msg)
+            type=self._url_type(parser, VisaUsbUrl, self.default_usb_url.to_str_url(), "invalid USBTMC URL")
         )
         grp.add_argument(
             "-t", "--tcp",
-            help=f"SCPI-RAW/TCP URL; use - for default (default: {self.default_tcp_url.to_str_url()})",
+            help=f"SCPI-RAW/TCP URL, host[:port], \"auto\" or discovered device alias; use - for default "
+                 f"(default: {self.default_tcp_url.to_str_url()})",
             default=argparse.SUPPRESS,
             const=self.default_tcp_url.to_str_url(),
-            dest="url",
+            dest="urls",
+            action="append",
             nargs="?",
-            type=lambda u, default=self.default_tcp_url.to_str_url(), clazz=VisaTcpUrl, msg="invalid SCPI-Raw URL":
-            default if u == "-"
-            else clazz.from_str_url(u).to_str_url() if clazz.from_str_url(u) is not None
-            else parser.error(msg)
+            type=self._url_type(parser, VisaTcpUrl, self.default_tcp_url.to_str_url(), "invalid SCPI-Raw URL",
+                                lambda host, port: VisaTcpUrl(host, port if port is not None else self.default_tcp_scpi_port))
         )
         grp.add_argument(
             "-r", "--rest",
-            help=f"REST/http URL; use - for default (default: {self.default_rest_url.to_str_url()})",
+            help=f"REST/http URL, host[:port], \"auto\" or discovered device alias; use - for default "
+                 f"(default: {self.default_rest_url.to_str_url()})",
             default=argparse.SUPPRESS,
             const=self.default_rest_url.to_str_url(),
-            dest="url",
+            dest="urls",
+            action="append",
             nargs="?",
-            type=lambda u, default=self.default_rest_url.to_str_url(), clazz=RestUrl, msg="invalid REST API URL":
-            default if u == "-"
-            else clazz.from_str_url(u).to_str_url() if clazz.from_str_url(u) is not None
-            else parser.error(msg)
+            type=self._url_type(parser, RestUrl, self.default_rest_url.to_str_url(), "invalid REST API URL",
+                                lambda host, port: RestUrl(host, port if port is not None else self.default_tcp_rest_port))
         )
+        grp.add_argument(
+            "-i", "--inventory",
+            help="device inventory file: one URL per line, optionally followed by an alias",
+            type=str)
+        grp.add_argument(
+            "--transport",
+            help="transport of SCPI-RAW/TCP URLs: pyvisa or a plain socket",
+            default=TCP_TRANSPORT_VISA,
+            choices=[TCP_TRANSPORT_VISA, TCP_TRANSPORT_SOCKET],
+            type=str)
+        grp.add_argument(
+            "--discoveryttl",
+            help="seconds a device discovery result is cached and reused for resolving \"auto\" and aliases",
+            default=300.0,
+            type=float)
+
+        grp = parser.add_argument_group(title="session daemon")
+        grp.add_argument(
+            "--daemonsocket",
+            help="Unix socket of the session daemon (default: $XDG_RUNTIME_DIR/pygnova-<uid>.sock)",
+            type=str)
+        grp.add_argument(
+            "--nodaemon",
+            help="open the device directly even if a session daemon is running",
+            action="store_true")
+
+        grp = parser.add_argument_group(title="instrumentation")
+        grp.add_argument(
+            "--stats",
+            help="print a latency histogram per command node on exit",
+            action="store_true")
+        grp.add_argument(
+            "--quiet",
+            help="do not log each command sent to and response received from the device",
+            action="store_true")
 
         grp = parser.add_argument_group(title="known commands file")
         grp.add_argument(
             "-c", "--commandsfile",
             help="known SCPI commands file",
-            default=self.commands_pickle_name,
+            default=self.commands_catalogue_name,
             type=str)
         grp.add_argument(
             "-d", "--datadir",
@@ -103,6 +195,92 @@ class CliArgs:
             "-s", "--set",
             help="send/write argument to device",
             type=str)
+        sub_grp.add_argument(
+            "-f", "--script",
+            help="run commands from script file (one command per line, queries end with '?', '#' starts a comment); use - for stdin",
+            type=str)
+        sub_grp.add_argument(
+            "-a", "--capture",
+            help="capture this many waveform frames to the --out directory",
+            metavar="N",
+            type=int)
+        sub_grp.add_argument(
+            "--snapshot",
+            help="store all known settings read from device to file",
+            metavar="FILE",
+            type=str)
+        sub_grp.add_argument(
+            "--restore",
+            help="write the settings of a --snapshot file which differ from the device settings",
+            metavar="FILE",
+            type=str)
+
+        grp = parser.add_argument_group(title="script options")
+        grp.add_argument(
+            "-m", "--maxmessagesize",
+            help="coalesce consecutive script, snapshot and restore commands to compound messages of at most this many characters",
+            default=512,
+            type=int)
+        grp.add_argument(
+            "--checkerrors",
+            help="defer writes until the next query, synchronize them with *OPC? and report device errors per command (--script, --set)",
+            action="store_true")
+
+        grp = parser.add_argument_group(title="snapshot options")
+        grp.add_argument(
+            "--channels",
+            help="expand numeric suffix placeholders \"<n>\" of known commands to 1..CHANNELS",
+            default=4,
+            type=int)
+        grp.add_argument(
+            "--dryrun",
+            help="print the settings --restore would write without writing them",
+            action="store_true")
+
+        grp = parser.add_argument_group(title="capture options")
+        grp.add_argument(
+            "-o", "--out",
+            help="output directory of --capture; output file of a --get binary block response",
+            type=str)
+        grp.add_argument(
+            "--source",
+            help="waveform source",
+            default="CHANnel1",
+            type=str)
+        grp.add_argument(
+            "--dataformat",
+            help="waveform data format",
+            default="WORD",
+            choices=["BYTE", "WORD"],
+            type=str.upper)
+        grp.add_argument(
+            "--queuesize",
+            help="number of frames buffered between acquisition and file writer",
+            default=8,
+            type=int)
+        grp.add_argument(
+            "--dropoldest",
+            help="drop the oldest buffered frame instead of pausing acquisition when the buffer is full",
+            action="store_true")
+        grp.add_argument(
+            "--decimate",
+            help="store only every n-th sample",
+            default=1,
+            type=int)
+
+        grp = parser.add_argument_group(title="transfer options")
+        grp.add_argument(
+            "--chunksize",
+            help="bytes read per chunk when streaming a --get block response to --out",
+            default=1024 * 1024,
+            type=int)
+
+        grp = parser.add_argument_group(title="multiple devices options")
+        grp.add_argument(
+            "-w", "--workers",
+            help="maximum number of devices addressed concurrently; 0 for all at once",
+            default=0,
+            type=int)
         return parser
 
     def _declare_commands_args(self, action: _SubParsersAction) -> argparse.ArgumentParser:
@@ -116,22 +294,175 @@ class CliArgs:
         grp = grp.add_mutually_exclusive_group()
         grp.add_argument(
             "-l", "--list",
-            help="List all known commands from file; requires no connection URL",
-            action="store_true")
+            help="List all known commands (or the subtree at PATH, i.e. \"CHANnel<n>\") from file; requires no connection URL",
+            metavar="PATH",
+            nargs="?",
+            const="",
+            type=str)
         grp.add_argument(
             "-g", "--get",
             help="Fetch all known commands from device via REST API (only with rest URL: \"--rest http://<addr>:8080/scpi\")",
             action="store_true")
+        grp.add_argument(
+            "-p", "--convert",
+            help="Convert a legacy commands pickle file to the commands catalogue file; requires no connection URL",
+            metavar="PICKLE",
+            type=str)
+        grp.add_argument(
+            "-S", "--search",
+            help="List known commands containing the pattern in short or long form, best matches first",
+            metavar="PATTERN",
+            type=str)
+        grp.add_argument(
+            "--complete",
+            help="List completions of the partially typed command, i.e. \"chan1:sc\"",
+            metavar="PREFIX",
+            type=str)
+        grp.add_argument(
+            "--shellcompletion",
+            help="Print a bash completion script for \"device --get/--set\" (i.e. eval \"$(main.py commands --shellcompletion)\")",
+            action="store_true")
+
+        grp = parser.add_argument_group(title="output options")
+        grp.add_argument(
+            "--depth",
+            help="render --list at most this many levels deep",
+            type=int)
+        grp.add_argument(
+            "--limit",
+            help="maximum number of --search and --complete results",
+            default=50,
+            type=int)
+
+        return parser
 
+    def _declare_discover_args(self, action: _SubParsersAction) -> argparse.ArgumentParser:
+        parser = action.add_parser(
+            "discover",
+            help="discover devices",
+            description="Discover devices via USB enumeration and mDNS; results are cached for resolving \"auto\" and aliases.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+        grp = parser.add_argument_group(title="discover command options")
+        grp.add_argument(
+            "--refresh",
+            help="rescan even if the cached result is not expired",
+            action="store_true")
+        grp.add_argument(
+            "--timeout",
+            help="mDNS browse time in seconds",
+            default=2.0,
+            type=float)
+        return parser
+
+    def _declare_monitor_args(self, action: _SubParsersAction) -> argparse.ArgumentParser:
+        parser = action.add_parser(
+            "monitor",
+            help="poll device values",
+            description="Poll queries at a fixed rate over one device session and stream timestamped results.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+        grp = parser.add_argument_group(title="monitor command options")
+        grp.add_argument(
+            "-q", "--query",
+            help="query to poll (repeatable), i.e. \"CHANnel1:SCALe\"",
+            dest="queries",
+            action="append",
+            default=[],
+            type=str)
+        grp.add_argument(
+            "-f", "--frequency",
+            help="polling rate in Hz",
+            default=1.0,
+            type=float)
+        grp.add_argument(
+            "--duration",
+            help="stop after this many seconds; polls until interrupted if neither --duration nor --samples is given",
+            type=float)
+        grp.add_argument(
+            "--samples",
+            help="stop after this many samples",
+            type=int)
+        grp.add_argument(
+            "--format",
+            help="output format",
+            default="csv",
+            choices=["csv", "jsonl"],
+            type=str)
+        grp.add_argument(
+            "-o", "--out",
+            help="output file; - for stdout",
+            default="-",
+            type=str)
+        grp.add_argument(
+            "-m", "--maxmessagesize",
+            help="coalesce the queries of a tick to compound messages of at most this many characters",
+            default=512,
+            type=int)
+        return parser
+
+    def _declare_daemon_args(self, action: _SubParsersAction) -> argparse.ArgumentParser:
+        parser = action.add_parser(
+            "daemon",
+            help="serve device sessions to other invocations",
+            description="Hold device sessions open and serve the commands of other invocations over a Unix socket; "
+                        "while running, \"device\" and \"monitor\" use it transparently.",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+        grp = parser.add_argument_group(title="daemon command options")
+        grp.add_argument(
+            "-m", "--maxmessagesize",
+            help="coalesce the commands of concurrent clients to compound messages of at most this many characters",
+            default=512,
+            type=int)
         return parser
 
     def get_commands_file_path(self) -> str:
         return os.path.realpath(os.path.join(self.args.datadir, self.args.commandsfile))
 
+    def _resolve_discovered(self, urls: List[str]) -> List[str]:
+        from pygnova.discovery import DiscoveryCache, default_cache_path, discover, resolve_device
+
+        cache = DiscoveryCache(default_cache_path(self.args.datadir), self.args.discoveryttl)
+        devices = discover(cache)
+        refreshed = False
+        resolved: List[str] = []
+        for url in urls:
+            if url_from_str(url) is None:
+                url_class = getattr(url, "url_class", None)
+                device_url = resolve_device(url, devices, url_class)
+                if device_url is None and not refreshed:
+                    # the cached devices may be outdated, i.e. a device switched on since
+                    devices, refreshed = discover(cache, refresh=True), True
+                    device_url = resolve_device(url, devices, url_class)
+                if device_url is None:
+                    self.parser.error(f"no discovered device matches \"{url}\"; see \"discover --refresh\"")
+                print(f"resolved device {url} -> {device_url}", file=sys.stderr)  # stdout may carry monitor data
+                self.args.aliases.setdefault(device_url, url)
+                url = device_url
+            resolved.append(url)
+        return resolved
+
     def parse(self) -> argparse.Namespace:
         self.args: argparse.Namespace = self.parser.parse_args()
 
-        usb_url = VisaUsbUrl(self.id_vendor, self.id_product, self.serial_nr).to_str_url()
-        self.args.url = usb_url if not hasattr(self.args, "url") else self.args.url
+        urls = list(getattr(self.args, "urls", []))
+        self.args.aliases = {}  # url -> inventory alias or discovered device name
+        if self.args.inventory is not None:
+            try:
+                for url, alias in read_inventory(self.args.inventory):
+                    urls.append(url)
+                    if alias is not None:
+                        self.args.aliases[url] = alias
+            except (OSError, ValueError) as e:
+                self.parser.error(f"{e}")
+        if len(urls) == 0:
+            urls = [VisaUsbUrl(self.id_vendor, self.id_product, self.serial_nr).to_str_url()]
+
+        if any(url_from_str(url) is None for url in urls):
+            urls = self._resolve_discovered(urls)
+
+        self.args.urls = list(dict.fromkeys(urls))  # unique, in order
+        self.args.url = self.args.urls[0]
 
         return self.args
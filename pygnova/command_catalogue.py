@@ -0,0 +1,186 @@
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+from pygnova.command_index import CommandIndex, CommandNode, NodeName
+
+# File layout (little endian):
+#   header  | magic, format version, reserved, node count, edge count, string table size
+#   nodes   | node_count * (name offset, first edge, edge count, name length, reserved)
+#   edges   | edge_count * (key offset, key length, flags, reserved, target node); sorted by key per node
+#   strings | utf-8 string table referenced by the offsets above
+# Node 0 is the root node. Each node's edges are keyed by the short and long form of its children,
+# including the children of optional nodes, so that lookups are binary searches on the mapped file.
+
+CATALOGUE_MAGIC = b"PYGNOCAT"
+CATALOGUE_VERSION = 1
+
+_HEADER = struct.Struct("<8sHHIII")
+_NODE = struct.Struct("<IIIHH")
+_EDGE = struct.Struct("<IHBBI")
+
+EDGE_PRIMARY = 0x01  # the long form edge to an own child; used to reconstruct the commands tree
+
+
+class CommandCatalogue(CommandIndex):
+    """
+    Read-only command index backed by a memory-mapped catalogue file.
+    Opening is independent of the catalogue size; nodes are decoded on demand.
+    """
+
+    def __init__(self, file_path: str):  # noqa
+        # the parent constructor is not called: the mapped file already is the compiled index
+        self.file_path: str = file_path
+        with open(file_path, "rb") as in_file:
+            self._map: mmap.mmap = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"not a commands catalogue file=\"{file_path}\"")
+        magic, version, _reserved, self.node_count, self.edge_count, strings_size = _HEADER.unpack_from(self._map, 0)
+        if magic != CATALOGUE_MAGIC:
+            self.close()
+            raise ValueError(f"not a commands catalogue file=\"{file_path}\"")
+        if version != CATALOGUE_VERSION:
+            self.close()
+            raise ValueError(f"stale commands catalogue version={version} (expected {CATALOGUE_VERSION}) file=\"{file_path}\"")
+
+        self._nodes_offset: int = _HEADER.size
+        self._edges_offset: int = self._nodes_offset + self.node_count * _NODE.size
+        self._strings_offset: int = self._edges_offset + self.edge_count * _EDGE.size
+        if len(self._map) < self._strings_offset + strings_size:
+            self.close()
+            raise ValueError(f"truncated commands catalogue file=\"{file_path}\"")
+
+        self.root: int = 0
+        self._names: Dict[int, NodeName] = {}
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _node(self, node: int) -> tuple:
+        return _NODE.unpack_from(self._map, self._nodes_offset + node * _NODE.size)
+
+    def _edge(self, edge: int) -> tuple:
+        return _EDGE.unpack_from(self._map, self._edges_offset + edge * _EDGE.size)
+
+    def _edge_key(self, edge: int) -> bytes:
+        key_offset, key_len, _flags, _reserved, _target = self._edge(edge)
+        start = self._strings_offset + key_offset
+        return self._map[start:start + key_len]
+
+    def _node_name(self, node: int) -> NodeName:
+        name = self._names.get(node)
+        if name is None:
+            name_offset, _first_edge, _edge_count, name_len, _reserved = self._node(node)
+            name = self._names[node] = NodeName(self._string(name_offset, name_len))
+        return name
+
+    def _candidates(self, node: int, key: str) -> Iterable[int]:
+        _name_offset, first_edge, edge_count, _name_len, _reserved = self._node(node)
+        wanted = key.encode("utf-8")
+
+        low, high = first_edge, first_edge + edge_count
+        while low < high:  # leftmost edge with key >= wanted
+            mid = (low + high) // 2
+            if self._edge_key(mid) < wanted:
+                low = mid + 1
+            else:
+                high = mid
+
+        candidates: List[int] = []
+        while low < first_edge + edge_count and self._edge_key(low) == wanted:
+            candidates.append(self._edge(low)[4])
+            low += 1
+        return candidates
+
+    def to_tree(self, node: int = 0) -> Dict[str, Dict]:
+        """
+        Materializes the (sub)tree of known commands; only required for listing the commands.
+        """
+        _name_offset, first_edge, edge_count, _name_len, _reserved = self._node(node)
+        tree: Dict[str, Dict] = {}
+        for edge in range(first_edge, first_edge + edge_count):
+            _key_offset, _key_len, flags, _reserved, target = self._edge(edge)
+            if flags & EDGE_PRIMARY:
+                name_offset, _first_edge, _edge_count, name_len, _reserved = self._node(target)
+                tree[self._string(name_offset, name_len)] = self.to_tree(target)
+        return tree
+
+
+def write_catalogue(file_path: str, tree: Dict[str, Dict]) -> None:
+    index = CommandIndex(tree)
+
+    nodes: List[CommandNode] = [index.root]
+    node_ids: Dict[int, int] = {id(index.root): 0}
+    for node in nodes:  # breadth first numbering, the list grows while iterating
+        for child in node.children:
+            node_ids[id(child)] = len(nodes)
+            nodes.append(child)
+
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def add_string(text: str) -> tuple:
+        encoded = text.encode("utf-8")
+        if text not in string_offsets:
+            string_offsets[text] = len(strings)
+            strings.extend(encoded)
+        return string_offsets[text], len(encoded)
+
+    node_records = bytearray()
+    edge_records = bytearray()
+    edge_count = 0
+    for node in nodes:
+        edges = [(key.encode("utf-8"), key, target) for key, targets in node.edges.items() for target in targets]
+        edges.sort(key=lambda e: e[0])  # stable: keeps the candidate order per key
+        name_offset, name_len = add_string(node.name)
+        node_records.extend(_NODE.pack(name_offset, edge_count, len(edges), name_len, 0))
+        for _encoded, key, target in edges:
+            key_offset, key_len = add_string(key)
+            primary = target in node.children and key == target.parsed.long_key
+            edge_records.extend(_EDGE.pack(key_offset, key_len, EDGE_PRIMARY if primary else 0, 0, node_ids[id(target)]))
+        edge_count += len(edges)
+
+    # the catalogue may be mapped by other processes: truncating it in place would invalidate their mappings,
+    # the new catalogue is written to a temporary file and replaces the old one atomically
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(fd, "wb") as out_file:
+            out_file.write(_HEADER.pack(CATALOGUE_MAGIC, CATALOGUE_VERSION, 0, len(nodes), edge_count, len(strings)))
+            out_file.write(node_records)
+            out_file.write(edge_records)
+            out_file.write(strings)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load_legacy_pickle(file_path: str) -> Optional[Dict[str, Dict]]:
+    import pickle  # only required for converting legacy commands files
+
+    class _CommandsTreeUnpickler(pickle.Unpickler):
+
+        def find_class(self, module: str, name: str):
+            # a commands tree consists of dicts and strings only: refuse to construct any other objects
+            raise pickle.UnpicklingError(f"refusing to load {module}.{name} from commands pickle")
+
+    with open(file_path, "rb") as in_file:
+        tree = _CommandsTreeUnpickler(in_file).load()
+    return tree if isinstance(tree, dict) else None
+
+
+def convert_pickle_to_catalogue(pickle_path: str, catalogue_path: str) -> bool:
+    tree = load_legacy_pickle(pickle_path)
+    if tree is None:
+        return False
+    write_catalogue(catalogue_path, tree)
+    return True
@@ -0,0 +1,144 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SUFFIX_NONE = 0  # node takes no numeric suffix, i.e. "SCALe"
+SUFFIX_ANY = 1  # node takes any numeric suffix, i.e. "CHANnel<n>" or "CHANnel{1-4}"
+SUFFIX_LITERAL = 2  # node was listed with a fixed numeric suffix, i.e. "CHANnel1"
+
+_PLACEHOLDER_SUFFIX = re.compile(r"^(.*?)(<[^>]*>|\{[^}]*\})$")
+_LITERAL_SUFFIX = re.compile(r"^(.*?[^\d])(\d+)$")
+_SHORT_FORM = re.compile(r"^[^a-z]*")
+_TOKEN = re.compile(r"^(.*?)(\d*)$")
+
+
+class NodeName:
+    """
+    Parsed SCPI header node name, i.e. "[SOURce]", "CHANnel<n>", "CHANnel1" or "*IDN".
+    """
+
+    def __init__(self, name: str):
+        text = name.strip().lstrip(":")
+        self.optional: bool = text.startswith("[")
+        text = text.strip("[]")
+
+        self.suffix_kind: int = SUFFIX_NONE
+        self.suffix_value: int = 0
+        m = _PLACEHOLDER_SUFFIX.match(text)
+        if m is not None:
+            text, self.suffix_kind = m.group(1), SUFFIX_ANY
+        else:
+            m = _LITERAL_SUFFIX.match(text)
+            if m is not None:
+                text, self.suffix_kind, self.suffix_value = m.group(1), SUFFIX_LITERAL, int(m.group(2), 10)
+
+        self.mnemonic: str = text
+        short_form = _SHORT_FORM.match(text).group(0)
+        self.short_key: str = (short_form if len(short_form) != 0 else text).lower()
+        self.long_key: str = text.lower()
+
+    def accepts(self, digits: str) -> bool:
+        if self.suffix_kind == SUFFIX_ANY:
+            return True
+        value = 1 if len(digits) == 0 else int(digits, 10)  # an omitted suffix defaults to 1
+        if self.suffix_kind == SUFFIX_LITERAL:
+            return value == self.suffix_value
+        return value == 1
+
+    def canonical(self, digits: str) -> str:
+        if self.suffix_kind == SUFFIX_ANY:
+            return f"{self.mnemonic}{int(digits, 10) if len(digits) != 0 else 1}"
+        if self.suffix_kind == SUFFIX_LITERAL:
+            return f"{self.mnemonic}{self.suffix_value}"
+        return self.mnemonic
+
+
+def split_header(command: str) -> List[Tuple[str, str]]:
+    """
+    Splits a command header (without arguments) into lower case (mnemonic, numeric suffix) tokens,
+    i.e. ":chan1:scal?" -> [("chan", "1"), ("scal", "")].
+    """
+    tokens: List[Tuple[str, str]] = []
+    for part in command.strip().lstrip(":").rstrip("?").split(":"):
+        m = _TOKEN.match(part.lower())
+        tokens.append((m.group(1), m.group(2)))
+    return tokens
+
+
+class CommandNode:
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.parsed: NodeName = NodeName(name)
+        self.children: List["CommandNode"] = []
+        self.edges: Dict[str, List["CommandNode"]] = {}
+
+    def link(self, child: "CommandNode") -> None:
+        self.children.append(child)
+        self._add_edge(child.parsed.long_key, child)
+        self._add_edge(child.parsed.short_key, child)
+        if child.parsed.optional:
+            # an optional node may be omitted: its (already linked) children become reachable from here
+            for key, targets in child.edges.items():
+                for target in targets:
+                    self._add_edge(key, target)
+
+    def _add_edge(self, key: str, child: "CommandNode") -> None:
+        targets = self.edges.setdefault(key, [])
+        if child not in targets:
+            targets.append(child)
+
+
+class CommandIndex:
+    """
+    Trie over the known commands tree keyed by lower case short and long form node mnemonics.
+    Resolving a command costs one dictionary lookup per header node.
+    """
+
+    def __init__(self, tree: Dict[str, Dict]):
+        self.root: CommandNode = self._compile("", tree)
+
+    @classmethod
+    def _compile(cls, name: str, tree: Dict[str, Dict]) -> CommandNode:
+        node = CommandNode(name)
+        for child_name, child_tree in tree.items():
+            node.link(cls._compile(child_name, child_tree))
+        return node
+
+    def _candidates(self, node: CommandNode, key: str) -> Iterable[CommandNode]:
+        return node.edges.get(key, ())
+
+    @staticmethod
+    def _node_name(node: CommandNode) -> NodeName:
+        return node.parsed
+
+    def resolve(self, command: str) -> Optional[List[Tuple[NodeName, str]]]:
+        """
+        Returns the matched (node name, numeric suffix) path or None if the command header is unknown.
+        All accepting candidates are tried depth first (in tree order): a node may match several branches,
+        i.e. "CHANnel1" and "CHANnel<n>", of which only one continues with the following nodes.
+        """
+        tokens = split_header(command)
+        stack: List[Tuple[object, int, List[Tuple[NodeName, str]]]] = [(self.root, 0, [])]
+        while len(stack) != 0:
+            node, depth, path = stack.pop()
+            if depth == len(tokens):
+                return path
+            key, digits = tokens[depth]
+            for candidate in reversed(list(self._candidates(node, key))):
+                name = self._node_name(candidate)
+                if name.accepts(digits):
+                    stack.append((candidate, depth + 1, path + [(name, digits)]))
+        return None
+
+    def is_known(self, command: str) -> bool:
+        return self.resolve(command) is not None
+
+    def normalize(self, command: str) -> Optional[str]:
+        """
+        Returns the canonical long form header, i.e. "chan1:scal" -> "CHANnel1:SCALe", or None if unknown.
+        Optional nodes are omitted so that "SOURce:FREQuency" and "FREQuency" share the canonical form.
+        """
+        path = self.resolve(command)
+        if path is None:
+            return None
+        return ":".join(name.canonical(digits) for name, digits in path if not name.optional)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Search and completion index over the commands catalogue, cached next to the catalogue file.
+Shell completion calls this module directly so that neither the CLI nor a transport backend is imported:
+
+    python -m pygnova.command_search --catalogue tmp/scpi-commands.catalogue --complete chan1:sc
+"""
+
+import bisect
+import heapq
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pygnova.command_index import NodeName, SUFFIX_ANY, SUFFIX_LITERAL, split_header
+
+SEARCH_INDEX_VERSION = 1
+
+_SUFFIX_DIGITS = re.compile(r"(?<=[a-z*?])\d+")
+_PLACEHOLDERS = re.compile(r"<[^>]*>|\{[^}]*\}|[\[\]]")
+
+# header node of an entry: [mnemonic, long key, short key, suffix kind, suffix value, optional]
+_Node = List
+
+
+def _search_key(text: str) -> str:
+    return _SUFFIX_DIGITS.sub("", _PLACEHOLDERS.sub("", text.lower()))
+
+
+def _accepts(node: _Node, digits: str) -> bool:
+    # see NodeName.accepts
+    if node[3] == SUFFIX_ANY:
+        return True
+    value = 1 if len(digits) == 0 else int(digits, 10)
+    return value == (node[4] if node[3] == SUFFIX_LITERAL else 1)
+
+
+def _trigrams(text: str) -> Iterator[str]:
+    for i in range(len(text) - 2):
+        yield text[i:i + 3]
+
+
+class CommandSearchIndex:
+    """
+    Every path of the commands tree is an entry: its own header node and its parent entry, parents before children.
+    Completion and search walk the entries as trie node by node, each node in short or long form and optional nodes
+    omitted, i.e. "chan1:scale" and "trig:lev" match "CHANnel<n>:SCALe" and "TRIGger:[EDGE]:LEVel". Matches starting below
+    the root are looked up in the sorted node keys (prefix index); substring matches are narrowed by the trigrams of the
+    pattern (substring index) and ignore numeric suffixes.
+    """
+
+    def __init__(self, paths: List[str], parents: List[int], nodes: List[_Node]):
+        self.paths: List[str] = paths
+        self.parents: List[int] = parents
+        self.nodes: List[_Node] = nodes
+
+        self.long_keys: List[str] = []
+        self.short_keys: List[str] = []
+        self.depths: List[int] = []
+        self.children: Dict[int, List[int]] = {}  # -1 is the root
+        for idx, (parent, node) in enumerate(zip(parents, nodes)):
+            if parent < 0:
+                self.long_keys.append(node[1])
+                self.short_keys.append(node[2])
+                self.depths.append(1)
+            else:
+                self.long_keys.append(f"{self.long_keys[parent]}:{node[1]}")
+                self.short_keys.append(f"{self.short_keys[parent]}:{node[2]}")
+                self.depths.append(self.depths[parent] + 1)
+            self.children.setdefault(parent, []).append(idx)
+
+        # rank of equally good matches: shorter paths first, then alphabetically
+        order = sorted(range(len(paths)), key=lambda i: (self.depths[i], paths[i].lower()))
+        self.ranks: List[int] = [0] * len(paths)
+        for rank, idx in enumerate(order):
+            self.ranks[idx] = rank
+
+        self.sorted_keys: List[Tuple[str, int]] = sorted(
+            [(node[1], idx) for idx, node in enumerate(nodes)] + [(node[2], idx) for idx, node in enumerate(nodes) if node[2] != node[1]])
+        self._trigrams: Optional[Dict[str, List[int]]] = None
+
+    @property
+    def trigrams(self) -> Dict[str, List[int]]:
+        # built on the first substring search, completion does not need it
+        if self._trigrams is None:
+            self._trigrams = {}
+            for idx in range(len(self.paths)):
+                for trigram in set(_trigrams(self.long_keys[idx])) | set(_trigrams(self.short_keys[idx])):
+                    self._trigrams.setdefault(trigram, []).append(idx)
+        return self._trigrams
+
+    @classmethod
+    def from_tree(cls, tree: Dict[str, Dict]) -> "CommandSearchIndex":
+        paths: List[str] = []
+        parents: List[int] = []
+        nodes: List[_Node] = []
+        stack: List[tuple] = [(-1, tree)]
+        while len(stack) != 0:
+            parent, subtree = stack.pop()
+            for name, children in subtree.items():
+                parsed = NodeName(name)
+                paths.append(f"{paths[parent]}:{name}" if parent >= 0 else name)
+                parents.append(parent)
+                nodes.append([parsed.mnemonic, parsed.long_key, parsed.short_key, parsed.suffix_kind, parsed.suffix_value, parsed.optional])
+                stack.append((len(paths) - 1, children))
+        return cls(paths, parents, nodes)
+
+    @staticmethod
+    def cache_path(catalogue_path: str) -> str:
+        return f"{catalogue_path}.search.json"
+
+    @staticmethod
+    def _catalogue_stamp(catalogue_path: str) -> List[int]:
+        stat = os.stat(catalogue_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def store(self, catalogue_path: str) -> None:
+        with open(self.cache_path(catalogue_path), "w") as out_file:
+            json.dump({"version": SEARCH_INDEX_VERSION, "catalogue": self._catalogue_stamp(catalogue_path),
+                       "paths": self.paths, "parents": self.parents, "nodes": self.nodes}, out_file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, catalogue_path: str) -> "CommandSearchIndex":
+        """
+        Loads the cached index or rebuilds it from the catalogue if the cache is missing or older than the catalogue.
+        """
+        try:
+            with open(cls.cache_path(catalogue_path), "r") as in_file:
+                content = json.load(in_file)
+            if content["version"] == SEARCH_INDEX_VERSION and content["catalogue"] == cls._catalogue_stamp(catalogue_path):
+                return cls(content["paths"], content["parents"], content["nodes"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        from pygnova.command_catalogue import CommandCatalogue
+
+        catalogue = CommandCatalogue(catalogue_path)
+        try:
+            index = cls.from_tree(catalogue.to_tree())
+        finally:
+            catalogue.close()
+        try:
+            index.store(catalogue_path)
+        except OSError as e:
+            print(f"warning: cannot store search index: {e}", file=sys.stderr)
+        return index
+
+    def search(self, pattern: str, limit: int = 20) -> List[str]:
+        """
+        Returns the paths matching the pattern, ranked: exact match, path prefix, node prefix (a path prefix starting below
+        the root), substring; then shorter paths first. A matched path prefix matches the subtree of its entry.
+        """
+        text = pattern.strip().lstrip(":").rstrip("?")
+        if len(text) == 0:
+            return []
+        tokens = split_header(text)
+        tiers: Dict[int, int] = {}  # entry -> best match
+        if len(tokens[0][0]) != 0:  # not a bare number
+            self._match_from_root(tokens, tiers)
+            if len(tiers) < limit:
+                self._match_below_root(tokens, tiers)
+        if len(tiers) < limit:
+            self._match_substring(_search_key(text), tiers)
+        return [self.paths[m[-1]] for m in heapq.nsmallest(limit, ((tier, self.ranks[idx], idx) for idx, tier in tiers.items()))]
+
+    def _match_from_root(self, tokens: List[Tuple[str, str]], tiers: Dict[int, int]) -> None:
+        parents = [-1]
+        for key, digits in tokens[:-1]:
+            parents = self._walk(parents, key, digits, prefix=False)
+        key, digits = tokens[-1]
+        self._add_subtrees(tiers, self._walk(parents, key, digits, prefix=True), 1)
+        for idx in self._walk(parents, key, digits, prefix=False):
+            tiers[idx] = 0
+
+    def _match_below_root(self, tokens: List[Tuple[str, str]], tiers: Dict[int, int]) -> None:
+        # the entries of the first node are found in the sorted node keys
+        key, digits = tokens[0]
+        position = bisect.bisect_left(self.sorted_keys, (key, -1))
+        starts: List[int] = []
+        while position < len(self.sorted_keys) and self.sorted_keys[position][0].startswith(key):
+            k, idx = self.sorted_keys[position]
+            position += 1
+            if len(tokens) > 1 and k != key:
+                continue  # only the last node may be typed partially
+            if len(digits) == 0 or _accepts(self.nodes[idx], digits):
+                starts.append(idx)
+        if len(tokens) > 1:
+            for key, digits in tokens[1:-1]:
+                starts = self._walk(starts, key, digits, prefix=False)
+            key, digits = tokens[-1]
+            starts = self._walk(starts, key, digits, prefix=True)
+        self._add_subtrees(tiers, starts, 2)
+
+    def _match_substring(self, key: str, tiers: Dict[int, int]) -> None:
+        if len(key) == 0:
+            return
+        if len(key) >= 3:
+            candidates = None
+            for trigram in set(_trigrams(key)):
+                postings = self.trigrams.get(trigram, ())
+                candidates = set(postings) if candidates is None else candidates.intersection(postings)
+        else:
+            candidates = range(len(self.paths))
+        for idx in candidates:
+            if idx not in tiers and (key in self.long_keys[idx] or key in self.short_keys[idx]):
+                tiers[idx] = 3
+
+    def _add_subtrees(self, tiers: Dict[int, int], entries: List[int], tier: int) -> None:
+        stack = list(entries)
+        while len(stack) != 0:
+            idx = stack.pop()
+            if tiers.get(idx, tier + 1) > tier:
+                tiers[idx] = tier
+                stack.extend(self.children.get(idx, ()))
+
+    def _walk(self, parents: List[int], key: str, digits: str, prefix: bool) -> List[int]:
+        """
+        Returns the children of the parents matching the key (or key prefix) and numeric suffix;
+        optional children may be skipped.
+        """
+        matched: List[int] = []
+        stack = list(reversed(parents))
+        while len(stack) != 0:
+            for idx in self.children.get(stack.pop(), ()):
+                node = self.nodes[idx]
+                if prefix:
+                    if (node[1].startswith(key) or node[2].startswith(key)) and (len(digits) == 0 or _accepts(node, digits)):
+                        matched.append(idx)
+                elif key in (node[1], node[2]) and _accepts(node, digits):
+                    matched.append(idx)
+                if node[5]:
+                    stack.append(idx)
+        return matched
+
+    def complete(self, prefix: str, limit: int = 50) -> List[str]:
+        """
+        Completes the last node of a partially typed command header, i.e. "chan1:sc" -> ["chan1:scale", ...];
+        the typed nodes are kept as typed, the completed node follows the case of the typed text.
+        """
+        prefix = prefix.strip()
+        head, _, typed = prefix.rpartition(":")
+        tokens = split_header(prefix) if len(prefix.lstrip(":")) != 0 else [("", "")]
+        parents = [-1]
+        for key, digits in tokens[:-1]:
+            parents = self._walk(parents, key, digits, prefix=False)
+        key, digits = tokens[-1]
+        case_sample = typed if len(typed) != 0 else head
+        lower_case = case_sample == case_sample.lower()
+
+        completions: List[str] = []
+        for idx in self._walk(parents, key, digits, prefix=True):
+            mnemonic, _long_key, _short_key, suffix_kind, suffix_value, _optional = self.nodes[idx]
+            suffix = digits if suffix_kind == SUFFIX_ANY else f"{suffix_value}" if suffix_kind == SUFFIX_LITERAL else ""
+            completion = f"{mnemonic.lower() if lower_case else mnemonic}{suffix}"
+            completion = f"{head}:{completion}" if len(head) != 0 or prefix.startswith(":") else completion
+            if completion not in completions:
+                completions.append(completion)
+            if len(completions) >= limit:
+                break
+        return completions
+
+
+def bash_completion_script(catalogue_path: str, program: str = "main.py") -> str:
+    """
+    Bash completion of "device --get/--set" command headers; ':' is a word break in bash and is re-joined here.
+    """
+    repo_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    catalogue_path = os.path.realpath(catalogue_path)
+    return f"""_pygnova_complete() {{
+    local line="${{COMP_LINE:0:COMP_POINT}}"
+    local cur="${{line##* }}"
+    local before="${{line% *}}"
+    local prev="${{before##* }}"
+    case "$prev" in
+        -g|--get|-s|--set)
+            local IFS=$'\\n'
+            COMPREPLY=($(PYTHONPATH="{repo_dir}" "{sys.executable}" -m pygnova.command_search \\
+                --catalogue "{catalogue_path}" --complete "$cur"))
+            local colon_prefix="${{cur%"${{cur##*:}}"}}"
+            COMPREPLY=("${{COMPREPLY[@]#"$colon_prefix"}}")
+            ;;
+    esac
+}}
+complete -o default -o nospace -F _pygnova_complete {program}
+"""
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="search and complete known commands")
+    parser.add_argument("--catalogue", help="commands catalogue file", required=True, type=str)
+    grp = parser.add_mutually_exclusive_group(required=True)
+    grp.add_argument("--search", help="ranked commands containing the pattern", type=str)
+    grp.add_argument("--complete", help="completions of the partially typed command", type=str)
+    parser.add_argument("--limit", help="maximum number of results", default=50, type=int)
+    args = parser.parse_args()
+
+    try:
+        index = CommandSearchIndex.load(args.catalogue)
+    except (OSError, ValueError):
+        return 1  # no completions without catalogue
+    results = index.search(args.search, args.limit) if args.search is not None else index.complete(args.complete, args.limit)
+    sys.stdout.write("".join(f"{r}\n" for r in results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
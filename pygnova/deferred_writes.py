@@ -0,0 +1,181 @@
+from typing import Any, ContextManager, List, Optional, Tuple
+
+from pygnova.batch import split_compound_reply
+from pygnova.instrument import ScpiReadWrite
+from pygnova.instrumentation import Listener
+from pygnova.waveform import BlockReader
+
+# *ESR? bits of failed commands: query error, device dependent error, execution error, command error
+ESR_ERROR_MASK = 0x04 | 0x08 | 0x10 | 0x20
+ERROR_QUEUE_QUERY = "SYSTem:ERRor?"
+MAX_DRAINED_ERRORS = 100
+
+
+class CommandError:
+    """
+    Entry of the device error queue along with the deferred write which caused it and its index in the sequence of writes
+    (counted from 0); command and index are None if the error could not be attributed to a single write (i.e. after
+    a barrier without per-command attribution).
+    """
+
+    def __init__(self, command: Optional[str], code: int, message: str, index: int | None = None):
+        self.command: Optional[str] = command
+        self.code: int = code
+        self.message: str = message
+        self.index: Optional[int] = index
+
+    @classmethod
+    def parse(cls, command: Optional[str], response: str, index: int | None = None) -> "CommandError":
+        code, _, message = response.strip().partition(",")
+        return cls(command, int(float(code)), message.strip().strip("\""), index)
+
+    def __str__(self) -> str:
+        return f"{self.code},\"{self.message}\"" + (f" command=\"{self.command}\"" if self.command is not None else "")
+
+
+class DeferredWriteError(RuntimeError):
+
+    def __init__(self, errors: List[CommandError]):
+        super().__init__("; ".join(f"{e}" for e in errors))
+        self.errors: List[CommandError] = errors
+
+
+class DeferredWriteInstrument(ScpiReadWrite):
+    """
+    Queues writes and sends them in compound messages at the next barrier: before a query (read, query, block),
+    at an explicit sync() and on exit. A barrier is one round trip: the queued writes followed by "*OPC?", each write
+    followed by "*ESR?" if attribute_errors is set, so that the device errors (drained from "SYSTem:ERRor?" in one more
+    round trip, only if any occurred) are reported per originating write. Writes are flushed without waiting for
+    a barrier once max_pending are queued (None: no limit).
+    """
+
+    def __init__(self,
+                 instrument: ScpiReadWrite,
+                 max_message_size: int = 512,
+                 attribute_errors: bool = True,
+                 max_pending: int | None = None,
+                 raise_errors: bool = True):
+        self.instrument: ScpiReadWrite = instrument
+        self.max_message_size: int = max_message_size
+        self.attribute_errors: bool = attribute_errors
+        self.max_pending: Optional[int] = max_pending
+        self.raise_errors: bool = raise_errors
+        self.errors: List[CommandError] = []
+        self.writes: int = 0
+        self.round_trips: int = 0
+        self._pending: List[Tuple[int, str]] = []  # (write index, command)
+
+    def __enter__(self):
+        self.instrument.__enter__()  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.sync()
+        finally:
+            result = self.instrument.__exit__(exc_type, exc_val, exc_tb)  # noqa
+        return result
+
+    def add_listener(self, listener: Listener) -> None:
+        self.instrument.add_listener(listener)
+
+    def remove_listener(self, listener: Listener) -> None:
+        self.instrument.remove_listener(listener)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def write(self, command: str) -> None:
+        self._pending.append((self.writes, command.strip()))
+        self.writes += 1
+        if self.max_pending is not None and len(self._pending) >= self.max_pending:
+            self.sync()
+
+    def read(self, command: str) -> Any:
+        self.sync()
+        return self.instrument.read(command)
+
+    def query(self, message: str) -> str:
+        self.sync()
+        return self.instrument.query(message)
+
+    def _block_reader(self, message: str) -> ContextManager[BlockReader]:
+        self.sync()
+        return self.instrument._block_reader(message)  # noqa
+
+    def _batches(self) -> List[Tuple[List[Tuple[int, str]], str]]:
+        """
+        Groups the pending writes to messages of at most max_message_size characters (a single longer write is sent as is).
+        """
+        barrier = ";*OPC?"
+        batches: List[Tuple[List[Tuple[int, str]], str]] = []
+        commands: List[Tuple[int, str]] = []
+        parts: List[str] = []
+        size = len(barrier)
+        for index, command in self._pending:
+            text = command if len(parts) == 0 or command.startswith((":", "*")) else f":{command}"
+            text = f"{text};*ESR?" if self.attribute_errors else text
+            if len(parts) != 0 and size + len(text) + 1 > self.max_message_size:
+                batches.append((commands, ";".join(parts) + barrier))
+                commands, parts, size = [], [], len(barrier)
+                text = text.lstrip(":")
+            commands.append((index, command))
+            parts.append(text)
+            size += len(text) + 1
+        if len(parts) != 0:
+            batches.append((commands, ";".join(parts) + (barrier if self.attribute_errors else f"{barrier};*ESR?")))
+        return batches
+
+    def sync(self) -> List[CommandError]:
+        """
+        Sends the pending writes and waits for their completion; returns the errors of these writes
+        (also collected in errors) or raises DeferredWriteError if raise_errors is set.
+        """
+        if len(self._pending) == 0:
+            return []
+        batches = self._batches()
+        self._pending = []
+
+        failed: List[Optional[Tuple[int, str]]] = []  # originating (write index, command) per flagged event status
+        for idx, (commands, message) in enumerate(batches):
+            self.round_trips += 1
+            replies = split_compound_reply(self.instrument.query(message))
+            expected = len(commands) + 1 if self.attribute_errors else 1 + (idx == len(batches) - 1)
+            if len(replies) != expected:
+                raise ValueError(f"expected {expected} responses but received {len(replies)} for message=\"{message}\"")
+            if self.attribute_errors:
+                failed += [cmd for cmd, esr in zip(commands, replies) if int(float(esr)) & ESR_ERROR_MASK]
+            elif len(replies) == 2 and int(float(replies[1])) & ESR_ERROR_MASK:
+                failed.append(None)
+
+        errors = self._drain_errors(failed) if len(failed) != 0 else []
+        self.errors += errors
+        if len(errors) != 0 and self.raise_errors:
+            raise DeferredWriteError(errors)
+        return errors
+
+    def _drain_errors(self, failed: List[Optional[Tuple[int, str]]]) -> List[CommandError]:
+        """
+        Reads the error queue until empty (one query per failed write and one more in the first message);
+        the errors are attributed to the failed writes in order, surplus errors to the last one.
+        """
+        responses: List[str] = []
+        count = len(failed) + 1
+        while len(responses) < MAX_DRAINED_ERRORS:
+            self.round_trips += 1
+            replies = split_compound_reply(self.instrument.query(";:".join([ERROR_QUEUE_QUERY] * count)))
+            for reply in replies:
+                if int(float(reply.split(",", 1)[0])) == 0:
+                    break
+                responses.append(reply)
+            else:
+                count = 1
+                continue
+            break
+        errors: List[CommandError] = []
+        for i, response in enumerate(responses):
+            write = failed[min(i, len(failed) - 1)]
+            errors.append(CommandError.parse(write[1], response, write[0]) if write is not None else CommandError.parse(None, response))
+        return errors
@@ -0,0 +1,194 @@
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pygnova.instrument_url import RestUrl, VisaTcpUrl, VisaUsbUrl, url_from_str
+
+MAGNOVA_ID_VENDOR = 0x19B2  # Batronix
+MAGNOVA_ID_PRODUCT = 0x0030  # Magnova
+
+# mDNS service type -> URL class built from the announced address and port
+MDNS_SERVICE_TYPES = {
+    "_scpi-raw._tcp.local.": VisaTcpUrl,
+    "_http._tcp.local.": RestUrl,
+}
+
+# preferred transport of "auto" resolution
+AUTO_PREFERENCE = [VisaTcpUrl, VisaUsbUrl, RestUrl]
+
+
+class DiscoveredDevice:
+
+    def __init__(self, alias: str, url: str, source: str):
+        self.alias: str = alias
+        self.url: str = url
+        self.source: str = source
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"alias": self.alias, "url": self.url, "source": self.source}
+
+    @staticmethod
+    def from_dict(d: Dict[str, str]) -> "DiscoveredDevice":
+        return DiscoveredDevice(d["alias"], d["url"], d["source"])
+
+
+def _alias(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "-", name.lower()).strip("-")
+
+
+def discover_usb(id_vendor: int = MAGNOVA_ID_VENDOR,
+                 id_product: int = MAGNOVA_ID_PRODUCT,
+                 find: Callable | None = None) -> List[DiscoveredDevice]:
+    """
+    Enumerates USB devices by vendor/product id; find defaults to usb.core.find (pyusb) and may be replaced by a mock.
+    """
+    if find is None:
+        import usb.core
+        find = usb.core.find
+
+    devices: List[DiscoveredDevice] = []
+    for device in find(find_all=True, idVendor=id_vendor, idProduct=id_product):
+        try:
+            # reading string descriptors requires device access permission (udev rule)
+            serial_nr = device.serial_number
+        except Exception as e:  # noqa
+            print(f"warning: cannot read serial number of USB device {id_vendor:04x}:{id_product:04x}: {e}", file=sys.stderr)
+            continue
+        if serial_nr:
+            devices.append(DiscoveredDevice(_alias(serial_nr), VisaUsbUrl(id_vendor, id_product, serial_nr).to_str_url(), "usb"))
+    return devices
+
+
+def discover_mdns(timeout: float = 2.0, name_filter: str = "magnova", zeroconf=None) -> List[DiscoveredDevice]:
+    """
+    Browses the mDNS service types for timeout seconds and returns the services whose instance name contains name_filter;
+    services announcing IPv6 addresses only are skipped.
+    A Zeroconf instance may be passed in, i.e. bound to a local fake responder.
+    """
+    from zeroconf import IPVersion, ServiceBrowser, ServiceListener, Zeroconf
+
+    found: List[tuple] = []
+
+    class Listener(ServiceListener):
+
+        def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
+            if name_filter.lower() in name.lower():
+                found.append((type_, name))
+
+        def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
+            pass
+
+        def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
+            pass
+
+    zc = zeroconf if zeroconf is not None else Zeroconf()
+    try:
+        browser = ServiceBrowser(zc, list(MDNS_SERVICE_TYPES), Listener())
+        time.sleep(timeout)
+        browser.cancel()
+
+        devices: List[DiscoveredDevice] = []
+        for type_, name in found:
+            info = zc.get_service_info(type_, name, timeout=int(timeout * 1000))
+            if info is None or info.port is None:
+                continue
+            addresses = info.parsed_addresses(IPVersion.V4Only)  # the URL formats take no IPv6 addresses
+            if len(addresses) == 0:
+                continue
+            instance = name[:-len(type_)].rstrip(".") if name.endswith(type_) else name
+            url = MDNS_SERVICE_TYPES[type_](addresses[0], info.port)
+            devices.append(DiscoveredDevice(_alias(instance), url.to_str_url(), "mdns"))
+        return devices
+    finally:
+        if zeroconf is None:
+            zc.close()
+
+
+class DiscoveryCache:
+    """
+    Discovered devices stored as JSON along with the discovery time; entries older than ttl seconds are stale.
+    """
+
+    def __init__(self, file_path: str, ttl: float = 300.0):
+        self.file_path: str = file_path
+        self.ttl: float = ttl
+
+    def load(self) -> Optional[List[DiscoveredDevice]]:
+        try:
+            with open(self.file_path, "r") as in_file:
+                content = json.load(in_file)
+            if time.time() - float(content["timestamp"]) > self.ttl:
+                return None
+            return [DiscoveredDevice.from_dict(d) for d in content["devices"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def store(self, devices: Iterable[DiscoveredDevice]) -> None:
+        with open(self.file_path, "w") as out_file:
+            json.dump({"timestamp": time.time(), "devices": [d.to_dict() for d in devices]}, out_file, indent=2)
+
+    def clear(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.file_path)
+
+
+def discover(cache: DiscoveryCache | None = None,
+             refresh: bool = False,
+             usb: bool = True,
+             mdns: bool = True,
+             mdns_timeout: float = 2.0) -> List[DiscoveredDevice]:
+    """
+    Returns the cached devices if the cache is fresh, otherwise scans and updates the cache;
+    a scan without devices (i.e. a device not yet booted) clears the cache rather than being reused.
+    """
+    if cache is not None and not refresh:
+        devices = cache.load()
+        if devices is not None:
+            return devices
+
+    devices: List[DiscoveredDevice] = []
+    if usb:
+        try:
+            devices += discover_usb()
+        except Exception as e:  # noqa
+            print(f"warning: USB discovery failed: {e}", file=sys.stderr)
+    if mdns:
+        try:
+            devices += discover_mdns(mdns_timeout)
+        except Exception as e:  # noqa
+            print(f"warning: mDNS discovery failed: {e}", file=sys.stderr)
+
+    if cache is not None:
+        if len(devices) != 0:
+            cache.store(devices)
+        else:
+            cache.clear()
+    return devices
+
+
+def resolve_device(name: str, devices: List[DiscoveredDevice], url_class: type | None = None) -> Optional[str]:
+    """
+    Resolves "auto" to the first device of the preferred transport or an alias to its URL;
+    only devices with URLs of url_class are considered if given (i.e. the transport of the connection option).
+    """
+    candidates = [d for d in devices if url_class is None or type(url_from_str(d.url)) is url_class]
+    if name.lower() == "auto":
+        for clazz in AUTO_PREFERENCE:
+            for device in candidates:
+                if type(url_from_str(device.url)) is clazz:
+                    return device.url
+        return None
+
+    alias = _alias(name)
+    for device in candidates:
+        if device.alias == alias or device.alias.endswith(f"-{alias}"):
+            return device.url
+    return None
+
+
+def default_cache_path(data_dir: str) -> str:
+    return os.path.join(data_dir, "discovery-cache.json")
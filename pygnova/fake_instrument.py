@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a Magnova serving SCPI over raw TCP and the REST API over HTTP, for development without a device.
+
+    python -m pygnova.fake_instrument --scpi-port 5025 --rest-port 8080
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from pygnova.batch import split_compound_reply
+
+
+BLOCK_QUERIES = ("WAV:DATA", "WAVEFORM:DATA")
+
+
+class FakeInstrument:
+    """
+    Stores written settings and answers queries with the last written value.
+
+    For benchmarks the response time (latency in seconds), the size of responses to settings never written (reply_size
+    characters of comma-separated numbers, 0 for "0") and the size of the "WAVeform:DATA?" binary block (block_size bytes)
+    are configurable.
+    """
+
+    def __init__(self,
+                 identification: str = "Batronix,Magnova,000000,fake",
+                 known_commands: List[str] | None = None,
+                 latency: float = 0.0,
+                 reply_size: int = 0,
+                 block_size: int = 1024):
+        self.identification: str = identification
+        self.known_commands: List[str] = known_commands if known_commands is not None else [
+            "*IDN", "*RST", "*OPC", "*ESR", "WAVeform:DATA", "WAVeform:PREamble"]
+        self.latency: float = latency
+        self.settings: Dict[str, str] = {}
+        self.messages: int = 0
+        self.default_reply: str = self._numeric_list(reply_size) if reply_size > 0 else "0"
+        self.block_size: int = block_size
+        self.block: bytes = self._block(block_size)
+
+    @staticmethod
+    def _numeric_list(size: int) -> str:
+        item = "1.2345E-03"
+        return ",".join([item] * max(1, (size + 1) // (len(item) + 1)))
+
+    @staticmethod
+    def _block(size: int) -> bytes:
+        payload = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+        return f"#{len(str(size))}{size}".encode("ascii") + payload
+
+    def handle(self, message: str) -> Optional[bytes]:
+        """
+        Executes a (compound) program message and returns the response message or None if it contained no query.
+        """
+        self.messages += 1
+        replies: List[bytes] = []
+        for command in split_compound_reply(message):
+            header, _, args = command.strip().lstrip(":").partition(" ")
+            header = header.upper()
+            if header.endswith("?"):
+                reply = self.query(header[:-1], args.strip())
+                replies.append(reply if isinstance(reply, bytes) else reply.encode("utf-8"))
+            elif len(header) != 0:
+                self.write(header, args.strip())
+        return b";".join(replies) if len(replies) != 0 else None
+
+    def query(self, header: str, args: str) -> str | bytes:
+        if header == "*IDN":
+            return self.identification
+        if header == "*OPC":
+            return "1"
+        if header in ("*ESR", "*STB"):
+            return "0"
+        if header in ("SYST:ERR", "SYSTEM:ERROR"):
+            return "0,\"No error\""
+        if header in BLOCK_QUERIES:
+            return self.block
+        if header in ("WAV:PRE", "WAVEFORM:PREAMBLE"):
+            return f"0,0,{self.block_size},1,1e-9,0,0,0.01,0,128"
+        return self.settings.get(header, self.default_reply)
+
+    def write(self, header: str, args: str) -> None:
+        if header == "*RST":
+            self.settings.clear()
+        else:
+            self.settings[header] = args
+
+
+class FakeScpiServer:
+    """
+    Raw SCPI socket server: newline terminated program messages, newline terminated responses.
+    """
+
+    def __init__(self, instrument: FakeInstrument, host: str = "127.0.0.1", port: int = 0):
+        self.instrument: FakeInstrument = instrument
+        self.host: str = host
+        self.port: int = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+                reply = self.instrument.handle(line.decode("utf-8").rstrip("\r\n"))
+                if self.instrument.latency > 0:
+                    await asyncio.sleep(self.instrument.latency)
+                if reply is not None:
+                    writer.write(reply + b"\n")
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class FakeRestServer:
+    """
+    HTTP/1.1 keep-alive server: POST /<path> with a JSON string message, GET /<path> lists the known commands (with ETag).
+    Binary block responses are sent as raw body or, with json_blocks, as JSON string (one code point per byte).
+    """
+
+    def __init__(self, instrument: FakeInstrument, host: str = "127.0.0.1", port: int = 0, path: str = "scpi", json_blocks: bool = False):
+        self.instrument: FakeInstrument = instrument
+        self.json_blocks: bool = json_blocks
+        self.host: str = host
+        self.port: int = port
+        self.path: str = path
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/{self.path}"
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if len(request_line) == 0:
+                    break
+                method, target, _version = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+                    if len(line) == 0:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                content_type = "application/json"
+                extra_headers = ""
+                if target.strip("/") != self.path:
+                    status, payload = "404 Not Found", b""
+                elif method == "GET":
+                    payload = json.dumps(self.instrument.known_commands).encode("utf-8")
+                    etag = f"\"{hashlib.sha256(payload).hexdigest()[:16]}\""
+                    extra_headers = f"ETag: {etag}\r\n"
+                    if headers.get("if-none-match") == etag:
+                        status, payload = "304 Not Modified", b""
+                    else:
+                        status = "200 OK"
+                elif method == "POST":
+                    reply = self.instrument.handle(json.loads(body))
+                    if self.instrument.latency > 0:
+                        await asyncio.sleep(self.instrument.latency)
+                    if reply is not None and reply.startswith(b"#") and self.json_blocks:
+                        status, payload = "200 OK", json.dumps(reply.decode("latin-1")).encode("utf-8")
+                    elif reply is not None and reply.startswith(b"#"):
+                        status, payload, content_type = "200 OK", reply, "application/octet-stream"  # binary block as raw body
+                    else:
+                        status, payload = "200 OK", json.dumps(reply.decode("utf-8") if reply is not None else None).encode("utf-8")
+                else:
+                    status, payload = "405 Method Not Allowed", b""
+
+                writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n{extra_headers}"
+                              f"Content-Length: {len(payload)}\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class FakeInstrumentThread:
+    """
+    Runs fake SCPI and REST servers in an event loop thread, i.e. for blocking clients:
+
+        with FakeInstrumentThread() as fake:
+            with get_instrument_from_url(fake.rest_url) as instrument:
+                instrument.read("*IDN")
+    """
+
+    def __init__(self, instrument: FakeInstrument | None = None, host: str = "127.0.0.1", scpi_port: int = 0, rest_port: int = 0):
+        self.instrument: FakeInstrument = instrument if instrument is not None else FakeInstrument()
+        self.scpi_server: FakeScpiServer = FakeScpiServer(self.instrument, host, scpi_port)
+        self.rest_server: FakeRestServer = FakeRestServer(self.instrument, host, rest_port)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def tcp_url(self) -> str:
+        return f"TCPIP::{self.scpi_server.host}::{self.scpi_server.port}::SOCKET"
+
+    @property
+    def rest_url(self) -> str:
+        return self.rest_server.url
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fake-instrument", daemon=True)
+        self._thread.start()
+        for server in (self.scpi_server, self.rest_server):
+            asyncio.run_coroutine_threadsafe(server.start(), self._loop).result()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for server in (self.scpi_server, self.rest_server):
+            asyncio.run_coroutine_threadsafe(server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        return False
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    instrument = FakeInstrument(latency=args.latency, reply_size=args.reply_size, block_size=args.block_size)
+    scpi_server = FakeScpiServer(instrument, args.host, args.scpi_port)
+    rest_server = FakeRestServer(instrument, args.host, args.rest_port)
+    print(f"serving SCPI on TCPIP::{args.host}::{await scpi_server.start()}::SOCKET")
+    print(f"serving REST on http://{args.host}:{await rest_server.start()}/scpi")
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="fake Magnova SCPI/REST servers", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", type=str)
+    parser.add_argument("--scpi-port", default=5025, type=int)
+    parser.add_argument("--rest-port", default=8080, type=int)
+    parser.add_argument("--latency", help="response delay in seconds", default=0.0, type=float)
+    parser.add_argument("--reply-size", help="characters of responses to settings never written; 0 for \"0\"", default=0, type=int)
+    parser.add_argument("--block-size", help="bytes of the \"WAVeform:DATA?\" binary block", default=1024, type=int)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pygnova.instrument import ScpiReadWrite, get_instrument_from_url
+from pygnova.instrument_url import url_from_str
+
+
+class DeviceResult:
+
+    def __init__(self, url: str, alias: str | None = None):
+        self.url: str = url
+        self.alias: Optional[str] = alias
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def label(self) -> str:
+        return f"{self.alias} ({self.url})" if self.alias is not None else self.url
+
+
+def read_inventory(file_path: str, comment: str = "#") -> List[Tuple[str, Optional[str]]]:
+    """
+    Reads (device URL, alias) from an inventory file: one URL per line, optionally followed by whitespace and a device alias
+    (None if missing).
+    """
+    devices: List[Tuple[str, Optional[str]]] = []
+    with open(file_path, "r") as in_file:
+        for line_nr, line in enumerate(in_file, start=1):
+            text = line.split(comment, 1)[0].strip()
+            if len(text) == 0:
+                continue
+            fields = text.split(maxsplit=1)
+            url, alias = fields[0], fields[1] if len(fields) == 2 else None
+            if url_from_str(url) is None:
+                raise ValueError(f"{file_path}:{line_nr}: invalid device {url=}")
+            devices.append((url, alias))
+    return devices
+
+
+def _run_on_device(url: str, alias: Optional[str], job: Callable[[ScpiReadWrite], Any],
+                   instrument_factory: Callable[[str], Any]) -> DeviceResult:
+    result = DeviceResult(url, alias)
+    start = time.monotonic()
+    try:
+        instrument = instrument_factory(url)
+        if instrument is None:
+            raise ValueError(f"unsupported device {url=}")
+        with instrument:
+            result.result = job(instrument)
+    except Exception as e:  # noqa
+        result.error = f"{type(e).__name__}: {e}"
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def run_on_devices(urls: List[str],
+                   job: Callable[[ScpiReadWrite], Any],
+                   max_workers: int | None = None,
+                   instrument_factory: Callable[[str], Any] = get_instrument_from_url,
+                   aliases: Dict[str, str] | None = None) -> List[DeviceResult]:
+    """
+    Opens each device and runs the job on it concurrently, one worker thread per device (at most max_workers).
+    Returns the results in the order of urls, labelled with their aliases (url -> alias) if any;
+    failures are reported per device and do not stop the others.
+    """
+    aliases = aliases if aliases is not None else {}
+    workers = max(1, min(len(urls), max_workers if max_workers else len(urls)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="device") as executor:
+        futures = [executor.submit(_run_on_device, url, aliases.get(url), job, instrument_factory) for url in urls]
+        return [future.result() for future in futures]
+
+
+def print_report(results: List[DeviceResult], wall_time: float, format_result: Callable[[Any], List[str]] = lambda r: [str(r)]) -> None:
+    width = max([len(r.label) for r in results] + [len("device")])
+    print(f"{'device':<{width}}  status  elapsed")
+    for r in results:
+        print(f"{r.label:<{width}}  {'ok' if r.ok else 'error':<6}  {r.elapsed:.3f}s")
+        for line in (format_result(r.result) if r.ok else [r.error]):
+            print(f"  {line}")
+    ok_count = len([r for r in results if r.ok])
+    print(f"total: devices={len(results)} ok={ok_count} failed={len(results) - ok_count} "
+          f"wall={wall_time:.3f}s sum={sum(r.elapsed for r in results):.3f}s")
@@ -1,18 +1,55 @@
 import abc
-from typing import Dict, Union
-
-import pyvisa_py as _pyvisa_py
-import requests
-from pyvisa import Resource, ResourceManager  # noqa
-from pyvisa import constants
+import contextlib
+import inspect
+import io
+import json
+import threading
+import time
+from typing import BinaryIO, ContextManager, Dict, Iterator, Tuple, Union, TYPE_CHECKING
 
 from pygnova.instrument_url import VisaUsbUrl, VisaTcpUrl, RestUrl, url_from_str
+from pygnova.instrumentation import CommandEvent, EVENT_ERROR, EVENT_RECEIVE, EVENT_SEND, EVENT_TIMEOUT, Listener
+from pygnova.scpi_numbers import parse_array, parse_float
+from pygnova.waveform import (
+    BlockReader, ProgressCallback, TransferStats, Waveform, WaveformPreamble, WAVEFORM_FORMATS, copy_block, read_block,
+)
 
-pyvisa_py = _pyvisa_py
+# transport backends are imported when an instrument of that type is created, not at module load
+if TYPE_CHECKING:
+    import numpy as np
+    import requests
+    from pyvisa import Resource, ResourceManager  # noqa
 
 
 class ScpiReadWrite(metaclass=abc.ABCMeta):
 
+    # notified of a CommandEvent per message; without listeners no events are created
+    listeners: Tuple[Listener, ...] = ()
+
+    def add_listener(self, listener: Listener) -> None:
+        self.listeners = self.listeners + (listener,)
+
+    def remove_listener(self, listener: Listener) -> None:
+        self.listeners = tuple(li for li in self.listeners if li is not listener)
+
+    def _notify(self,
+                kind: str,
+                message: str,
+                nbytes: int,
+                started: float,
+                response_expected: bool,
+                response: str | bytes | None = None,
+                error: Exception | None = None) -> None:
+        event = CommandEvent(kind, message, nbytes, started, response_expected, response, error)
+        for listener in self.listeners:
+            listener(event)
+
+    def _notify_failure(self, message: str, started: float, response_expected: bool, error: Exception) -> None:
+        self._notify(EVENT_TIMEOUT if self._is_timeout(error) else EVENT_ERROR, message, 0, started, response_expected, error=error)
+
+    def _is_timeout(self, error: Exception) -> bool:
+        return isinstance(error, TimeoutError)
+
     @abc.abstractmethod
     def read(self, command: str) -> str | Dict:
         """
@@ -24,6 +61,17 @@ class ScpiReadWrite(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def query(self, message: str) -> str:
+        """
+        Sends the message as is and returns the raw response message.
+        The message may be a compound message of several ';'-separated commands.
+
+        Message examples:
+        - read CH1 and CH2 scale: "CHANnel1:SCALe?;:CHANnel2:SCALe?"
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def write(self, command: str) -> int | Dict:
         """
@@ -34,6 +82,136 @@ class ScpiReadWrite(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def query_float(self, command: str) -> float:
+        """
+        Reads a numeric setting or result, i.e. "CHANnel1:SCALe" -> 0.5 for the response "500m".
+        The trailing '?' is appended automatically and shall be omitted in the command string.
+        """
+        return parse_float(self.query(f"{command}?"))
+
+    def query_ints(self, command: str) -> "np.ndarray":
+        """
+        Reads a comma-separated list of integers to an int64 array.
+        """
+        return parse_array(self.query(f"{command}?"), "i8")
+
+    def query_array(self, command: str, dtype: "str | np.dtype" = "f8") -> "np.ndarray":
+        """
+        Reads a comma-separated list of numbers (i.e. ASCII waveform points or measurement lists) to an array of dtype.
+        """
+        return parse_array(self.query(f"{command}?"), dtype)
+
+    def _block_reader(self, message: str) -> ContextManager[BlockReader]:
+        """
+        Sends the message and provides a reader of the raw response bytes.
+        """
+        raise NotImplementedError
+
+    def read_block(self, command: str, dtype: "str | np.dtype" = "u1") -> "np.ndarray":
+        """
+        Reads an IEEE 488.2 definite length binary block response into an array of the given dtype.
+        The trailing '?' is appended automatically and shall be omitted in the command string.
+
+        Command examples:
+        - read raw waveform data as 16 bit LSB first: "WAVeform:DATA" with dtype "<u2"
+        """
+        message = f"{command}?"
+        started = time.monotonic()
+        try:
+            with self._block_reader(message) as reader:
+                data = read_block(reader, dtype)
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(message, started, True, e)
+            raise
+        if self.listeners:
+            self._notify(EVENT_RECEIVE, message, data.nbytes, started, True)
+        return data
+
+    def stream_block(self,
+                     command: str,
+                     out: BinaryIO,
+                     chunk_size: int = 1024 * 1024,
+                     progress: ProgressCallback | None = None) -> TransferStats:
+        """
+        Streams an IEEE 488.2 definite length binary block response (i.e. a screenshot or waveform export) to out,
+        a file or writable buffer, in chunks of at most chunk_size bytes; progress is called after each chunk.
+        The trailing '?' is appended automatically and shall be omitted in the command string.
+        """
+        message = f"{command}?"
+        started = time.monotonic()
+        try:
+            with self._block_reader(message) as reader:
+                stats = copy_block(reader, out, chunk_size, progress)
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(message, started, True, e)
+            raise
+        if self.listeners:
+            self._notify(EVENT_RECEIVE, message, stats.nbytes, started, True)
+        return stats
+
+    def read_waveform(self, source: str = "CHANnel1", data_format: str = "WORD") -> Waveform:
+        """
+        Reads the waveform preamble and the binary waveform data of the source.
+        Data formats: "BYTE" (8 bit) or "WORD" (16 bit); see Waveform.voltages() for scaled values.
+        """
+        data_format = data_format.upper()
+        if data_format not in WAVEFORM_FORMATS:
+            raise ValueError(f"unsupported waveform {data_format=}, expected one of {list(WAVEFORM_FORMATS)}")
+
+        setup = f"WAVeform:SOURce {source};:WAVeform:FORMat {data_format}"
+        self.write(setup + (";:WAVeform:BYTeorder LSBFirst" if data_format == "WORD" else ""))
+        preamble = WaveformPreamble(self.query("WAVeform:PREamble?"))
+        return Waveform(preamble, self.read_block("WAVeform:DATA", WAVEFORM_FORMATS[data_format]))
+
+
+class _VisaBlockReader:
+
+    def __init__(self, instrument: "Resource", chunk_size: int):
+        self.instrument: "Resource" = instrument
+        self.chunk_size: int = chunk_size
+
+    def readinto(self, buffer: memoryview) -> int:
+        data = self.instrument.read_bytes(min(len(buffer), self.chunk_size), break_on_termchar=False)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _RestBlockReader:
+    """
+    Raw (non-JSON) REST response body, which shall be the block itself: "#<n><length><payload>".
+    """
+
+    def __init__(self, raw: BinaryIO, message: str, content_type: str):
+        self.raw: BinaryIO = raw
+        self.message: str = message
+        self.content_type: str = content_type
+        self._started: bool = False
+
+    def readinto(self, buffer: memoryview) -> int:
+        count = self.raw.readinto(buffer)
+        if not self._started and count:
+            self._started = True
+            if buffer[0] != ord("#"):
+                raise ValueError(f"response to message=\"{self.message}\" with Content-Type=\"{self.content_type}\" "
+                                 f"is no raw binary block")
+        return count
+
+
+# one pyvisa ResourceManager per resource manager class and process, shared by all VisaInstruments
+_resource_managers: Dict[str, "ResourceManager"] = {}
+_resource_managers_lock = threading.Lock()
+
+
+def shared_resource_manager(resource_manager_class: str = "@py") -> "ResourceManager":
+    from pyvisa import ResourceManager
+
+    with _resource_managers_lock:
+        if resource_manager_class not in _resource_managers:
+            _resource_managers[resource_manager_class] = ResourceManager(resource_manager_class)
+        return _resource_managers[resource_manager_class]
+
 
 class VisaInstrument(ScpiReadWrite):
 
@@ -42,18 +220,26 @@ class VisaInstrument(ScpiReadWrite):
                  write_termination: str = "\n",
                  read_termination: str = "\n",
                  rw_timeout: int = 1000,
-                 resource_manager_class: str | None = "@py"):
+                 resource_manager_class: str | None = "@py",
+                 block_chunk_size: int = 1024 * 1024):
+        # pyvisa_py provides the backend of resource manager class "@py"
+        import pyvisa_py as _pyvisa_py  # noqa
+
         self.instrument_url: str = url.to_str_url()
-        self.resource_manager: ResourceManager = ResourceManager(resource_manager_class if resource_manager_class is not None else "")
-        self.instrument: Resource | None = None
+        self.resource_manager: "ResourceManager" = shared_resource_manager(
+            resource_manager_class if resource_manager_class is not None else "")
+        self.instrument: "Resource | None" = None
         self.write_termination: str = write_termination
         self.read_termination: str = read_termination
         self.rw_timeout: int = rw_timeout
+        self.block_chunk_size: int = block_chunk_size
 
     def __enter__(self):
+        from pyvisa import constants
+
         if self.instrument is None:
             print(f"opening device={self.instrument_url}")
-            self.instrument: Resource = self.resource_manager.open_resource(
+            self.instrument: "Resource" = self.resource_manager.open_resource(
                 self.instrument_url,
                 access_mode=constants.AccessModes.exclusive_lock,
                 open_timeout=10)
@@ -72,46 +258,195 @@ class VisaInstrument(ScpiReadWrite):
         return False
 
     def read(self, command: str) -> str:
-        cmd = f"{command}?"
-        print(f"-> write={self.instrument.write(cmd)} command=\"{cmd}\"")  # noqa
-        response = self.instrument.read()  # noqa
-        print(f"<- recv=\"{response}\"")
+        return self.query(f"{command}?")
+
+    def _is_timeout(self, error: Exception) -> bool:
+        from pyvisa import constants, errors
+
+        return isinstance(error, errors.VisaIOError) and error.error_code == constants.StatusCode.error_timeout
+
+    def query(self, message: str) -> str:
+        started = time.monotonic()
+        try:
+            sent = self.instrument.write(message)  # noqa
+            if self.listeners:
+                self._notify(EVENT_SEND, message, sent, started, True)
+            response = self.instrument.read()  # noqa
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(message, started, True, e)
+            raise
+        if self.listeners:
+            self._notify(EVENT_RECEIVE, message, len(response), started, True, response)
         return response
 
+    @contextlib.contextmanager
+    def _block_reader(self, message: str) -> Iterator[BlockReader]:
+        sent = self.instrument.write(message)  # noqa
+        if self.listeners:
+            self._notify(EVENT_SEND, message, sent, time.monotonic(), True)
+        try:
+            yield _VisaBlockReader(self.instrument, self.block_chunk_size)
+        except Exception:
+            self.instrument.clear()  # discard the rest of the block
+            raise
+        # consume the response message terminator following the block
+        self.instrument.read_bytes(len(self.read_termination), break_on_termchar=False)
+
     def write(self, command: str) -> int:
-        response = self.instrument.write(command)  # noqa
-        print(f"-> write={response} command=\"{command}\"")  # noqa
+        started = time.monotonic()
+        try:
+            response = self.instrument.write(command)  # noqa
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(command, started, False, e)
+            raise
+        if self.listeners:
+            self._notify(EVENT_SEND, command, response, started, False)
         return response
 
 
 class RestInstrument(ScpiReadWrite):
 
-    def __init__(self, instrument_url: RestUrl):
+    def __init__(self,
+                 instrument_url: RestUrl,
+                 pool_size: int = 4,
+                 connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0,
+                 retries: int = 2,
+                 retry_backoff: float = 0.1):
         self.instrument_url = instrument_url.to_str_url()
+        self.pool_size: int = pool_size
+        self.connect_timeout: float = connect_timeout
+        self.read_timeout: float = read_timeout
+        self.retries: int = retries
+        self.retry_backoff: float = retry_backoff
+        self.session: "requests.Session | None" = None
 
     def __enter__(self):
+        if self.session is None:
+            self.session = self._create_session()
+        else:
+            print(f"warning: session already opened={self.instrument_url}")
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
         return False
 
-    def read(self, command: str) -> Dict:
-        print(f"-> write={command}")
-        response = requests.post(self.instrument_url, json=f"{command}?").json()
-        print(f"<- recv={response}")
+    def _create_session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # SCPI writes are not idempotent: only retry if the connection could not be established
+        retry = Retry(total=self.retries, connect=self.retries, read=0, redirect=0, status=0, backoff_factor=self.retry_backoff)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _is_timeout(self, error: Exception) -> bool:
+        import requests
+
+        return isinstance(error, requests.Timeout)
+
+    def _post(self, payload: str, response_expected: bool) -> Dict:
+        """
+        Posts the message; send events of writes follow the HTTP response and carry the round trip time.
+        """
+        import requests
+
+        started = time.monotonic()
+        if self.listeners and response_expected:
+            self._notify(EVENT_SEND, payload, len(payload), started, True)
+        try:
+            # without an open session (not used as context manager) fall back to one-shot requests
+            poster = self.session if self.session is not None else requests
+            http_response = poster.post(self.instrument_url, json=payload, timeout=(self.connect_timeout, self.read_timeout))
+            response = http_response.json()
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(payload, started, response_expected, e)
+            raise
+        if self.listeners:
+            if response_expected:
+                self._notify(EVENT_RECEIVE, payload, len(http_response.content), started, True, response)
+            else:
+                self._notify(EVENT_SEND, payload, len(payload), started, False)
         return response
 
+    def read(self, command: str) -> Dict:
+        return self._post(f"{command}?", True)
+
+    def query(self, message: str) -> str:
+        response = self._post(message, True)
+        return response if isinstance(response, str) else json.dumps(response)
+
+    @contextlib.contextmanager
+    def _block_reader(self, message: str) -> Iterator[BlockReader]:
+        import requests
+
+        if self.listeners:
+            self._notify(EVENT_SEND, message, len(message), time.monotonic(), True)
+        poster = self.session if self.session is not None else requests
+        with poster.post(self.instrument_url, json=message, stream=True, timeout=(self.connect_timeout, self.read_timeout)) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if "json" in content_type.lower():
+                # block wrapped in a JSON string like any other response (one code point per byte): buffered as a whole
+                reply = response.json()
+                if not isinstance(reply, str) or not reply.startswith("#"):
+                    raise ValueError(f"no binary block in JSON response to message=\"{message}\": {str(reply)[:32]!r}")
+                try:
+                    block = reply.encode("latin-1")
+                except UnicodeEncodeError as e:
+                    raise ValueError(f"binary block in JSON response to message=\"{message}\" is not 8 bit: {e}")
+                yield io.BytesIO(block)
+            else:
+                yield _RestBlockReader(response.raw, message, content_type)
+
     def write(self, command: str) -> Dict:
-        print(f"-> write={command}")
-        return requests.post(self.instrument_url, json=f"{command}").json()
+        return self._post(f"{command}", False)
+
+
+TCP_TRANSPORT_VISA = "visa"
+TCP_TRANSPORT_SOCKET = "socket"
+
+
+def get_instrument_from_url(url: str, tcp_transport: str = TCP_TRANSPORT_VISA, **kwargs) -> ScpiReadWrite | None:
+    """
+    TCP socket URLs are served by pyvisa (TCP_TRANSPORT_VISA) or a plain socket (TCP_TRANSPORT_SOCKET).
+    Additional keyword arguments are forwarded to the instrument constructor if it takes them,
+    i.e. pool size, timeouts and retries of the RestInstrument session are dropped for VISA and socket URLs;
+    a keyword argument which no instrument takes (i.e. a misspelled option) raises TypeError.
+    """
+    from pygnova.socket_instrument import SocketInstrument
+
+    if tcp_transport == TCP_TRANSPORT_SOCKET:
+        tcp_instrument = SocketInstrument
+    elif tcp_transport == TCP_TRANSPORT_VISA:
+        tcp_instrument = VisaInstrument
+    else:
+        raise ValueError(f"unsupported {tcp_transport=}")
 
+    options = {name for clazz in (RestInstrument, VisaInstrument, SocketInstrument)
+               for name in inspect.signature(clazz.__init__).parameters}
+    unknown = [name for name in kwargs if name not in options or name in ("self", "url")]
+    if len(unknown) != 0:
+        raise TypeError(f"unsupported instrument option(s) {', '.join(unknown)}")
 
-def get_instrument_from_url(url: str) -> RestInstrument | VisaInstrument | None:
     known_types = {
         RestUrl: RestInstrument,
         VisaUsbUrl: VisaInstrument,
-        VisaTcpUrl: VisaInstrument,
-        None: lambda _o: None}
+        VisaTcpUrl: tcp_instrument}
 
     url_object = url_from_str(url)
-    return known_types[type(url_object)](url_object)
+    if url_object is None:
+        return None
+    instrument_class = known_types[type(url_object)]
+    accepted = inspect.signature(instrument_class.__init__).parameters
+    return instrument_class(url_object, **{name: value for name, value in kwargs.items() if name in accepted})
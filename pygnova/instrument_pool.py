@@ -0,0 +1,195 @@
+import atexit
+import collections
+import contextlib
+import threading
+import time
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from pygnova.instrument import ScpiReadWrite, TCP_TRANSPORT_VISA, get_instrument_from_url
+from pygnova.instrument_url import url_from_str
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.opened: int = 0
+        self.reused: int = 0
+        self.health_check_failures: int = 0
+        self.evictions: int = 0
+        self.discarded: int = 0
+
+    def __str__(self) -> str:
+        return (f"opened={self.opened} reused={self.reused} health_check_failures={self.health_check_failures} "
+                f"evictions={self.evictions} discarded={self.discarded}")
+
+
+class InstrumentPool:
+    """
+    Keeps opened instruments per normalized URL for reuse, i.e. by test frameworks opening the same device per test case.
+    A lease hands out an idle instrument (or opens one) and returns it to the pool afterwards; instruments idle for longer
+    than health_check_after seconds are checked with health_check before reuse, instruments idle for longer than
+    idle_timeout seconds are closed (by a timer thread, so that an idle VISA session does not keep its exclusive lock).
+    An instrument whose lease ended with a connection error or timeout is closed, not returned.
+    Thread-safe; an instrument is leased to one holder at a time.
+    """
+
+    def __init__(self,
+                 instrument_factory: Callable[[str], ScpiReadWrite] | None = None,
+                 tcp_transport: str = TCP_TRANSPORT_VISA,
+                 idle_timeout: float = 300.0,
+                 health_check_after: float = 5.0,
+                 health_check: str = "*IDN?",
+                 max_idle: int = 4):
+        self.instrument_factory: Callable[[str], ScpiReadWrite] = (
+            instrument_factory if instrument_factory is not None else lambda url: get_instrument_from_url(url, tcp_transport=tcp_transport))
+        self.idle_timeout: float = idle_timeout
+        self.health_check_after: float = health_check_after
+        self.health_check: str = health_check
+        self.max_idle: int = max_idle
+        self.stats: PoolStats = PoolStats()
+        self._idle: Dict[str, Deque[Tuple[float, ScpiReadWrite]]] = {}  # url -> (monotonic time returned, instrument), oldest first
+        self._lock: threading.Lock = threading.Lock()
+        self._reaper: Optional[threading.Timer] = None
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        url_object = url_from_str(url)
+        if url_object is None:
+            raise ValueError(f"unsupported device url={url}")
+        return url_object.to_str_url()
+
+    def _take_idle(self, key: str) -> Tuple[Optional[float], Optional[ScpiReadWrite], List[ScpiReadWrite]]:
+        """
+        Returns the most recently returned instrument of key along with its idle time and the expired instruments to close.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = self._evict_expired(now)
+            idle = self._idle.get(key)
+            if idle is None or len(idle) == 0:
+                return None, None, expired
+            returned, instrument = idle.pop()
+            return now - returned, instrument, expired
+
+    def _evict_expired(self, now: float) -> List[ScpiReadWrite]:
+        expired: List[ScpiReadWrite] = []
+        for idle in self._idle.values():
+            while len(idle) != 0 and now - idle[0][0] > self.idle_timeout:
+                expired.append(idle.popleft()[1])
+        self.stats.evictions += len(expired)
+        return expired
+
+    def _schedule_reaper(self) -> None:
+        """
+        Starts the timer closing the expired instruments unless running or nothing is idle; called with the lock held.
+        """
+        returned = [idle[0][0] for idle in self._idle.values() if len(idle) != 0]
+        if self._reaper is not None or len(returned) == 0:
+            return
+        delay = min(returned) + self.idle_timeout - time.monotonic()
+        self._reaper = threading.Timer(max(0.0, delay) + 0.01, self._reap)
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        with self._lock:
+            self._reaper = None
+            expired = self._evict_expired(time.monotonic())
+            self._schedule_reaper()
+        self._close(expired)
+
+    @staticmethod
+    def _close(instruments: List[ScpiReadWrite]) -> None:
+        for instrument in instruments:
+            try:
+                instrument.__exit__(None, None, None)  # noqa
+            except Exception as e:  # noqa
+                print(f"warning: closing pooled device failed: {e}")
+
+    def _healthy(self, instrument: ScpiReadWrite) -> bool:
+        try:
+            instrument.query(self.health_check)
+            return True
+        except Exception:  # noqa
+            return False
+
+    def acquire(self, url: str) -> ScpiReadWrite:
+        key = self.normalize_url(url)
+        while True:
+            idle_time, instrument, expired = self._take_idle(key)
+            self._close(expired)
+            if instrument is None:
+                break
+            if idle_time <= self.health_check_after or self._healthy(instrument):
+                self.stats.reused += 1
+                return instrument
+            self.stats.health_check_failures += 1
+            self._close([instrument])
+
+        instrument = self.instrument_factory(key)
+        if instrument is None:
+            raise ValueError(f"unsupported device url={url}")
+        instrument = instrument.__enter__()  # noqa
+        self.stats.opened += 1
+        return instrument
+
+    def release(self, url: str, instrument: ScpiReadWrite, discard: bool = False) -> None:
+        key = self.normalize_url(url)
+        now = time.monotonic()
+        with self._lock:
+            closing = self._evict_expired(now)
+            idle = self._idle.setdefault(key, collections.deque())
+            if not discard and len(idle) < self.max_idle:
+                idle.append((now, instrument))
+                self._schedule_reaper()
+            else:
+                self.stats.discarded += 1
+                closing.append(instrument)
+        self._close(closing)
+
+    @contextlib.contextmanager
+    def lease(self, url: str) -> Iterator[ScpiReadWrite]:
+        """
+        with pool.lease("TCPIP::192.168.2.24::5025::SOCKET") as instrument:
+            instrument.read("*IDN")
+        """
+        instrument = self.acquire(url)
+        listeners = instrument.listeners
+        discard = False
+        try:
+            yield instrument
+        except Exception as e:
+            discard = isinstance(e, ConnectionError) or instrument._is_timeout(e)  # noqa
+            raise
+        finally:
+            instrument.listeners = listeners  # listeners added during the lease end with it
+            self.release(url, instrument, discard)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+            instruments = [instrument for idle in self._idle.values() for _returned, instrument in idle]
+            self._idle.clear()
+        self._close(instruments)
+
+
+_default_pool: Optional[InstrumentPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> InstrumentPool:
+    """
+    The process-wide pool; its instruments are closed at interpreter exit.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = InstrumentPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def lease(url: str) -> contextlib.AbstractContextManager:
+    return default_pool().lease(url)
@@ -1,13 +1,14 @@
+import functools
 import re
 from typing import Optional
 
 
 class RestUrl:
+    _MATCHER = re.compile(r"^http://([0-9a-zA-Z.]+):(\d+)/(\w+)$")
 
-    @staticmethod
-    def from_str_url(url: str) -> Optional["RestUrl"]:
-        matcher = re.compile(r"^http://([0-9a-zA-Z.]+):(\d+)/(\w+)$")
-        m = matcher.match(url.lower())
+    @classmethod
+    def from_str_url(cls, url: str) -> Optional["RestUrl"]:
+        m = cls._MATCHER.match(url.lower())
         if m is not None and 3 == len(m.groups()):
             return RestUrl(m.group(1), int(f"{m.group(2)}", 10), m.group(3))
         return None
@@ -23,11 +24,11 @@ class RestUrl:
 
 
 class VisaTcpUrl:
+    _MATCHER = re.compile(r"^TCPIP::([0-9a-zA-Z.]+)::(\d+)::SOCKET$")
 
-    @staticmethod
-    def from_str_url(url: str) -> Optional["VisaTcpUrl"]:
-        matcher = re.compile(r"^TCPIP::([0-9a-zA-Z.]+)::(\d+)::SOCKET$")
-        m = matcher.match(url)
+    @classmethod
+    def from_str_url(cls, url: str) -> Optional["VisaTcpUrl"]:
+        m = cls._MATCHER.match(url)
         if m is not None and 2 == len(m.groups()):
             return VisaTcpUrl(m.group(1), int(f"{m.group(2)}", 10))
         return None
@@ -41,11 +42,11 @@ class VisaTcpUrl:
 
 
 class VisaUsbUrl:
+    _MATCHER = re.compile(r"^USB::0[xX]([0-9a-fA-F]+)::0[xX]([0-9a-fA-F]+)::(\w+)::INSTR$")
 
-    @staticmethod
-    def from_str_url(url: str) -> Optional["VisaUsbUrl"]:
-        matcher = re.compile(r"^USB::0[xX]([0-9a-fA-F]+)::0[xX]([0-9a-fA-F]+)::(\w+)::INSTR$")
-        m = matcher.match(url)
+    @classmethod
+    def from_str_url(cls, url: str) -> Optional["VisaUsbUrl"]:
+        m = cls._MATCHER.match(url)
         if m is not None and 3 == len(m.groups()):
             return VisaUsbUrl(int(f"{m.group(1)}", 16), int(f"{m.group(2)}", 16), m.group(3))
         return None
@@ -59,12 +60,13 @@ class VisaUsbUrl:
         self.serial_nr: str = serial_nr
 
 
+@functools.lru_cache(maxsize=256)
 def url_from_str(url: str) -> RestUrl | VisaUsbUrl | VisaTcpUrl | None:
-    if RestUrl.from_str_url(url):
-        return RestUrl.from_str_url(url)
-    elif VisaTcpUrl.from_str_url(url):
-        return VisaTcpUrl.from_str_url(url)
-    elif VisaUsbUrl.from_str_url(url):
-        return VisaUsbUrl.from_str_url(url)
-    else:
-        return None
+    """
+    Parsed URLs are cached and shared: the returned objects shall not be modified.
+    """
+    for clazz in (RestUrl, VisaTcpUrl, VisaUsbUrl):
+        url_object = clazz.from_str_url(url)
+        if url_object is not None:
+            return url_object
+    return None
@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from pygnova.command_index import CommandIndex
+from pygnova.known_commands import strip_args_from_cmd
+
+EVENT_SEND = "send"
+EVENT_RECEIVE = "receive"
+EVENT_TIMEOUT = "timeout"
+EVENT_ERROR = "error"
+
+
+class CommandEvent:
+    """
+    Emitted by ScpiReadWrite transports per message: started and elapsed are time.monotonic() based seconds
+    since the message was passed to the transport; response_expected is set for messages containing a query.
+    """
+
+    def __init__(self,
+                 kind: str,
+                 message: str,
+                 nbytes: int,
+                 started: float,
+                 response_expected: bool,
+                 response: str | bytes | None = None,
+                 error: Exception | None = None):
+        self.kind: str = kind
+        self.message: str = message
+        self.nbytes: int = nbytes
+        self.started: float = started
+        self.elapsed: float = time.monotonic() - started
+        self.response_expected: bool = response_expected
+        self.response: str | bytes | None = response
+        self.error: Optional[Exception] = error
+
+
+Listener = Callable[[CommandEvent], None]
+
+
+class PrintListener:
+    """
+    Logs each command and response to stdout (the CLI default).
+    """
+
+    def __call__(self, event: CommandEvent) -> None:
+        if event.kind == EVENT_SEND:
+            print(f"-> write={event.nbytes} command=\"{event.message}\"")
+        elif event.kind == EVENT_RECEIVE:
+            response = event.response if event.response is not None else f"<{event.nbytes} bytes>"
+            print(f"<- recv=\"{response}\"")
+        else:
+            print(f"{event.kind}: message=\"{event.message}\" after {event.elapsed * 1000:.1f}ms: {event.error}")
+
+
+class _NodeLatencies:
+
+    def __init__(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.maximum: float = 0.0
+        self.timeouts: int = 0
+        self.errors: int = 0
+        self.buckets: Dict[int, int] = {}  # bucket b counts latencies in [2^(b-1), 2^b) µs
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper bound in seconds of the bucket containing the p-th percentile.
+        """
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.maximum, (1 << bucket) / 1e6)
+        return self.maximum
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count != 0 else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.maximum * 1000,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "buckets_us": {1 << b: n for b, n in sorted(self.buckets.items())},
+        }
+
+
+class LatencyHistogram:
+    """
+    Listener aggregating round trip latencies (queries) and send times (writes) per command node in log2 µs buckets.
+    Command nodes are normalized with the commands index if given, i.e. "chan1:scal?" and "CHANnel1:SCALe?" share a node;
+    the nodes of a compound message are joined by ';'. Thread-safe, listeners may be shared across instruments.
+    """
+
+    def __init__(self, commands: CommandIndex | None = None):
+        self.commands: Optional[CommandIndex] = commands
+        self.nodes: Dict[str, _NodeLatencies] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _node(self, message: str) -> str:
+        nodes: List[str] = []
+        for command in message.split(";"):
+            header = strip_args_from_cmd(command.strip().lstrip(":"))
+            node = self.commands.normalize(header) if self.commands is not None else None
+            nodes.append(f"{node if node is not None else header.upper()}{'?' if '?' in command else ''}")
+        return ";".join(nodes)
+
+    def __call__(self, event: CommandEvent) -> None:
+        if event.kind == EVENT_SEND and event.response_expected:
+            return  # recorded on receive
+        node = self._node(event.message)
+        with self._lock:
+            latencies = self.nodes.setdefault(node, _NodeLatencies())
+            if event.kind == EVENT_TIMEOUT:
+                latencies.timeouts += 1
+            elif event.kind == EVENT_ERROR:
+                latencies.errors += 1
+            else:
+                latencies.record(event.elapsed)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {node: latencies.to_dict() for node, latencies in sorted(self.nodes.items())}
+
+    def __str__(self) -> str:
+        lines = [f"{'command':<40} {'count':>7} {'mean':>9} {'p50':>9} {'p99':>9} {'max':>9} {'timeouts':>8} {'errors':>6}"]
+        for node, s in self.to_dict().items():
+            lines.append(f"{node:<40} {s['count']:>7} {s['mean_ms']:>7.2f}ms {s['p50_ms']:>7.2f}ms {s['p99_ms']:>7.2f}ms "
+                         f"{s['max_ms']:>7.2f}ms {s['timeouts']:>8} {s['errors']:>6}")
+        return "\n".join(lines)
@@ -1,22 +1,47 @@
+import codecs
+import hashlib
 import json
 import os.path
-import pickle
 import re
-import urllib.error
-import urllib.request
-from typing import Dict, Optional
+import sys
+from typing import IO, Dict, Iterator, List, Optional, Set, TYPE_CHECKING
 
+from pygnova.command_catalogue import CommandCatalogue, write_catalogue
+from pygnova.command_index import CommandIndex, NodeName, split_header
 from pygnova.instrument_url import RestUrl
 
+if TYPE_CHECKING:
+    import urllib.request
+
 CommandsDict = Dict[str, "CommandsDict"]
 
 
 class KnownCommandsRestReader:
+    """
+    Fetches the known commands list. With the etag and/or last_modified of a previous fetch the request is conditional:
+    if the device answers "304 Not Modified", not_modified is set and there is nothing to load.
+    """
+
+    def __init__(self,
+                 url: RestUrl,
+                 headers: Dict[str, str] | None = None,
+                 etag: str | None = None,
+                 last_modified: str | None = None,
+                 chunk_size: int = 64 * 1024):
+        import urllib.request  # only required when fetching commands from a device
 
-    def __init__(self, url: RestUrl, headers: Dict[str, str] | None = None):
         self._source_url: str = url.to_str_url()
-        headers = {"Accept": "text/html"} if headers is None else headers
-        self.request: urllib.request.Request = urllib.request.Request(self.source_url, headers=headers)
+        headers = {"Accept": "text/html"} if headers is None else dict(headers)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        self.request: "urllib.request.Request" = urllib.request.Request(self.source_url, headers=headers)
+        self.chunk_size: int = chunk_size
+        self.not_modified: bool = False
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.sha256: Optional[str] = None
         self._open_context_manager = None
 
     @property
@@ -24,8 +49,19 @@ class KnownCommandsRestReader:
         return self._source_url
 
     def __enter__(self):
+        import urllib.error
+        import urllib.request
+
         if self._open_context_manager is None:
-            self._open_context_manager = urllib.request.urlopen(self.request)
+            try:
+                self._open_context_manager = urllib.request.urlopen(self.request)
+            except urllib.error.HTTPError as e:
+                if e.code != 304:
+                    raise
+                self.not_modified = True
+                return self
+            self.etag = self._open_context_manager.headers.get("ETag")
+            self.last_modified = self._open_context_manager.headers.get("Last-Modified")
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -35,31 +71,153 @@ class KnownCommandsRestReader:
             self._open_context_manager = None
         return False
 
-    def load_known_commands(self) -> CommandsDict:
+    def load_known_commands(self) -> Optional[CommandsDict]:
+        """
+        Builds the commands tree while the command list is streamed; the SHA-256 of the body is set on the way.
+        """
+        if self.not_modified:
+            return None
+        digest = hashlib.sha256()
         try:
-            return self._nested_json_from_delimited_items(self._open_context_manager.read())
-        except urllib.error.HTTPError as e:
+            tree = self._nested_json_from_delimited_items(iter_json_array(self._open_context_manager, self.chunk_size, digest))
+        except (OSError, ValueError) as e:
             print(f"error: {e}")
+            return None
+        self.sha256 = digest.hexdigest()
+        return tree
 
     @staticmethod
-    def _nested_json_from_delimited_items(items: str, delimiter=":") -> CommandsDict:
+    def _nested_json_from_delimited_items(items: Iterator[str], delimiter=":") -> CommandsDict:
         tree: CommandsDict = {}
-        for item in json.loads(items):
+        for item in items:
             t = tree
             for part in item.split(delimiter):
                 t = t.setdefault(part, {})
         return tree
 
 
-def print_nested_json_tree(tree: CommandsDict):
-    return _traverse_nested_json_tree({"*": tree}, prefix="")
+def iter_json_array(stream: IO[bytes], chunk_size: int = 64 * 1024, digest: "hashlib._Hash | None" = None) -> Iterator:
+    """
+    Yields the items of a top-level JSON array while it is read in chunks, so the document is never buffered as a whole.
+    The digest (i.e. hashlib.sha256()) is updated with the raw bytes read.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # skip whitespace and separators up to the next item
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ("," if started else "")):
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("commands list is not a JSON array")
+                started, position = True, position + 1
+                continue
+            if buffer[position] == "]":
+                # the digest covers the whole body, including what follows the array
+                while digest is not None and not eof:
+                    chunk = stream.read(chunk_size)
+                    digest.update(chunk)
+                    eof = len(chunk) == 0
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # a number (or literal) may continue in the next chunk, i.e. "-1" of "-1.5e3", unless a delimiter follows;
+                # a string, array or object is complete when decoded
+                if eof or buffer[position] in "\"[{" or (end < len(buffer) and (buffer[end].isspace() or buffer[end] in ",]")):
+                    yield item
+                    position = end
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError("unexpected end of commands list")
+
+        chunk = stream.read(chunk_size)
+        if digest is not None:
+            digest.update(chunk)
+        eof = len(chunk) == 0
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+
+
+def flatten_commands(tree: CommandsDict, delimiter: str = ":") -> Set[str]:
+    """
+    Returns the paths of the leaf nodes, i.e. {"CHANnel<n>:SCALe", ...}.
+    """
+    paths: Set[str] = set()
+    stack: List[tuple] = [("", tree)]
+    while len(stack) != 0:
+        prefix, node = stack.pop()
+        for key, children in node.items():
+            path = f"{prefix}{delimiter}{key}" if len(prefix) != 0 else key
+            if len(children) == 0:
+                paths.add(path)
+            else:
+                stack.append((path, children))
+    return paths
+
+
+class CommandsDiff:
+
+    def __init__(self, old: CommandsDict | None, new: CommandsDict):
+        old_paths = flatten_commands(old) if old is not None else set()
+        new_paths = flatten_commands(new)
+        self.added: List[str] = sorted(new_paths - old_paths)
+        self.removed: List[str] = sorted(old_paths - new_paths)
+
+    @property
+    def changed(self) -> bool:
+        return len(self.added) != 0 or len(self.removed) != 0
+
+    def __str__(self) -> str:
+        lines = [f"+ {path}" for path in self.added] + [f"- {path}" for path in self.removed]
+        lines.append(f"added={len(self.added)} removed={len(self.removed)}")
+        return "\n".join(lines)
+
+
+def print_nested_json_tree(tree: CommandsDict, max_depth: int | None = None, out: IO[str] | None = None, root: str = "*"):
+    """
+    Renders the tree into a buffer which is written at once; subtrees below max_depth are summarized by their size.
+    """
+    lines: List[str] = []
+    _traverse_nested_json_tree({root: tree}, lines, prefix="", depth=0, max_depth=max_depth)
+    lines.append("")
+    (out if out is not None else sys.stdout).write("\n".join(lines))
+
+
+def find_subtree(tree: CommandsDict, path: str) -> Optional[CommandsDict]:
+    """
+    Returns the subtree at the path, i.e. "CHANnel<n>", "chan" or "CHANnel<n>:SCALe"; None if there is no such node.
+    """
+    for key, _digits in split_header(path) if len(path.strip(": ")) != 0 else []:
+        for name, children in tree.items():
+            node_name = NodeName(name)
+            if key in (name.lower(), node_name.long_key, node_name.short_key):
+                tree = children
+                break
+        else:
+            return None
+    return tree
+
+
+def _count_nodes(tree: CommandsDict) -> int:
+    return sum(1 + _count_nodes(children) for children in tree.values())
 
 
-def _traverse_nested_json_tree(tree: CommandsDict, prefix: str = ""):
+def _traverse_nested_json_tree(tree: CommandsDict, lines: List[str], prefix: str = "", depth: int = 0, max_depth: int | None = None):
     for idx, (key, value) in enumerate(tree.items()):
         is_last = idx + 1 == len(tree.items())
         is_first = idx == 0
         has_children = len(value) != 0
+        if has_children and max_depth is not None and depth >= max_depth:
+            key += f" (+{_count_nodes(value)})"
+            has_children = False
 
         line = prefix
         if is_first and is_last and not has_children:
@@ -74,9 +232,10 @@ def _traverse_nested_json_tree(tree: CommandsDict, prefix: str = ""):
             line += "╰•" + key
         else:
             line += "├•" + key
-        print(line)
+        lines.append(line)
 
-        _traverse_nested_json_tree(tree[key], prefix=prefix + ("  " if is_last else "│ "))
+        if has_children:
+            _traverse_nested_json_tree(value, lines, prefix=prefix + ("  " if is_last else "│ "), depth=depth + 1, max_depth=max_depth)
 
 
 def strip_args_from_cmd(command_with_optional_args: str) -> str:
@@ -90,46 +249,93 @@ class KnownCommandsFileReader:
         self.path_name: str = path_name
         self.file_name: str = file_name
         self._commands_tree: Optional[CommandsDict] = None
+        self._index: Optional[CommandIndex] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """
+        Unmaps the commands catalogue file; a materialized commands tree stays available.
+        """
+        if isinstance(self._index, CommandCatalogue):
+            self._index.close()
+            self._index = None
 
     @property
     def file_path(self):
         return os.path.relpath(os.path.join(self.path_name, self.file_name))
 
-    def load_commands(self) -> Optional[CommandsDict]:
+    @property
+    def meta_file_path(self):
+        return f"{self.file_path}.meta.json"
+
+    def load_meta(self) -> Dict[str, str]:
+        """
+        Fetch metadata stored alongside the catalogue: source_url, etag, last_modified and sha256 of the command list.
+        """
+        try:
+            with open(self.meta_file_path, "r") as in_file:
+                return json.load(in_file)
+        except (OSError, ValueError):
+            return {}
+
+    def store_meta(self, meta: Dict[str, str]) -> None:
+        with open(self.meta_file_path, "w") as out_file:
+            json.dump(meta, out_file, indent=2)
+
+    def load_commands(self) -> Optional[CommandIndex]:
+        """
+        Maps the commands catalogue file; the commands tree is only materialized on access of the commands property.
+        """
+        self.close()
         try:
-            with open(self.file_path, 'rb') as in_file:
-                print(f"loading commands from file=\"{self.file_path}\" ...")
-                self._commands_tree = pickle.load(in_file)
-                return self._commands_tree
-        except Exception:  # noqa
+            self._index = CommandCatalogue(self.file_path)
+            print(f"loading commands from file=\"{self.file_path}\" ...")
+            self._commands_tree = None
+            return self._index
+        except ValueError as e:
+            print(f"error: {e}")
+            return None
+        except OSError:
             return None
 
     @property
     def commands(self) -> Optional[dict]:
+        if self._commands_tree is None and isinstance(self._index, CommandCatalogue):
+            self._commands_tree = self._index.to_tree()
         return self._commands_tree
 
     @commands.setter
     def commands(self, new_commands_tree: CommandsDict):
+        self.close()
         self._commands_tree = new_commands_tree
+        self._index = None
 
-    def store_commands(self):
-        with open(self.file_path, 'wb') as out_file:
-            if self.commands is not None:
-                print(f"storing commands to file=\"{out_file.name}\" ...")
-                pickle.dump(self.commands, out_file)
-
-    def _is_known_command(self, command: str, command_tree: Dict[str, Dict]) -> bool:
-        for key, value in command_tree.items():
-            if command.lower() == key.lower():
-                return True
-            elif not self._is_known_command(command, value):
-                pass
+    @property
+    def index(self) -> Optional[CommandIndex]:
+        if self._index is None and self.commands is not None:
+            self._index = CommandIndex(self.commands)
+        return self._index
 
-        return False
+    def store_commands(self):
+        if self.commands is not None:
+            print(f"storing commands to file=\"{self.file_path}\" ...")
+            write_catalogue(self.file_path, self.commands)
 
     def is_known_command(self, command: str, ) -> bool:
-        if self.commands is not None:
-            return self._is_known_command(strip_args_from_cmd(command), self.commands)
+        if self.index is not None:
+            return self.index.is_known(strip_args_from_cmd(command))
         else:
             print(f"error: no commands loaded from file=\"{self.file_path}\"")
             return False
+
+    def normalize_command(self, command: str) -> Optional[str]:
+        """
+        Returns the canonical long form of the command header (without arguments) or None if unknown.
+        """
+        return self.index.normalize(strip_args_from_cmd(command)) if self.index is not None else None
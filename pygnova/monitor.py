@@ -0,0 +1,139 @@
+import abc
+import csv
+import json
+import math
+import time
+from typing import IO, List, Optional
+
+from pygnova.batch import BatchRunner, ScriptCommand, coalesce
+from pygnova.instrument import ScpiReadWrite
+from pygnova.known_commands import strip_args_from_cmd
+
+
+class Sample:
+
+    def __init__(self, tick: int, timestamp: float, values: List[Optional[str]]):
+        self.tick: int = tick
+        self.timestamp: float = timestamp
+        self.values: List[Optional[str]] = values
+
+
+class MonitorSink(metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def write(self, sample: Sample) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class CsvSink(MonitorSink):
+
+    def __init__(self, out: IO, queries: List[str]):
+        self.out: IO = out
+        self.writer = csv.writer(out)
+        self.writer.writerow(["timestamp", "tick"] + queries)
+
+    def write(self, sample: Sample) -> None:
+        self.writer.writerow([f"{sample.timestamp:.6f}", sample.tick] + sample.values)
+        self.out.flush()
+
+
+class JsonLinesSink(MonitorSink):
+
+    def __init__(self, out: IO, queries: List[str]):
+        self.out: IO = out
+        self.queries: List[str] = queries
+
+    def write(self, sample: Sample) -> None:
+        record = {"timestamp": sample.timestamp, "tick": sample.tick, "values": dict(zip(self.queries, sample.values))}
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+
+class MonitorStats:
+
+    def __init__(self, rate: float):
+        self.rate: float = rate
+        self.samples: int = 0
+        self.late_ticks: int = 0
+        self.skipped_ticks: int = 0
+        self.max_lateness: float = 0.0
+        self.started: float = time.monotonic()
+        self.stopped: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.stopped if self.stopped is not None else time.monotonic()) - self.started
+
+    @property
+    def achieved_rate(self) -> float:
+        return self.samples / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"samples={self.samples} elapsed={self.elapsed:.3f}s rate={self.achieved_rate:.2f}Hz (requested {self.rate:g}Hz) "
+                f"late_ticks={self.late_ticks} skipped_ticks={self.skipped_ticks} max_lateness={self.max_lateness * 1000:.1f}ms")
+
+
+class Monitor:
+    """
+    Polls the queries at a fixed rate over one open instrument session. Ticks are scheduled on a fixed time grid
+    (start + tick * period) so that polling time does not accumulate as drift. A tick starting later than late_tolerance
+    (fraction of the period) after its deadline is late; ticks missed entirely are skipped to get back on the grid.
+    All queries of a tick are coalesced into compound messages of at most max_message_size characters.
+    """
+
+    def __init__(self,
+                 instrument: ScpiReadWrite,
+                 queries: List[str],
+                 rate: float,
+                 sink: MonitorSink,
+                 max_message_size: int = 512,
+                 late_tolerance: float = 0.1):
+        if rate <= 0:
+            raise ValueError(f"invalid monitor {rate=}")
+        self.instrument: ScpiReadWrite = instrument
+        self.queries: List[str] = queries
+        self.period: float = 1.0 / rate
+        self.sink: MonitorSink = sink
+        self.late_tolerance: float = late_tolerance
+        self.stats: MonitorStats = MonitorStats(rate)
+        self._runner: BatchRunner = BatchRunner(instrument, max_message_size)
+        self._batches = coalesce([ScriptCommand(f"{strip_args_from_cmd(q)}?") for q in queries], max_message_size)
+
+    def poll(self) -> List[Optional[str]]:
+        values: List[Optional[str]] = []
+        for batch in self._batches:
+            values.extend(response for _cmd, response in self._runner.run_batch(batch))
+        return values
+
+    def run(self, duration: float | None = None, samples: int | None = None) -> MonitorStats:
+        self.stats = MonitorStats(1.0 / self.period)
+        start = self.stats.started
+        tick = 0
+        try:
+            while (samples is None or self.stats.samples < samples) and (duration is None or time.monotonic() - start < duration):
+                deadline = start + tick * self.period
+                now = time.monotonic()
+                if now < deadline:
+                    time.sleep(deadline - now)
+                else:
+                    lateness = now - deadline
+                    if lateness > self.late_tolerance * self.period:
+                        self.stats.late_ticks += 1
+                        self.stats.max_lateness = max(self.stats.max_lateness, lateness)
+                    if lateness >= self.period:
+                        missed = math.floor(lateness / self.period)
+                        self.stats.skipped_ticks += missed
+                        tick += missed
+
+                self.sink.write(Sample(tick, time.time(), self.poll()))
+                self.stats.samples += 1
+                tick += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stats.stopped = time.monotonic()
+            self.sink.close()
+        return self.stats
@@ -0,0 +1,199 @@
+import collections
+import json
+import time
+from typing import Any, ContextManager, Dict, List, Optional, TYPE_CHECKING
+
+from pygnova.batch import split_compound_reply
+from pygnova.command_index import CommandIndex
+from pygnova.instrument import ScpiReadWrite
+from pygnova.instrumentation import Listener
+from pygnova.known_commands import strip_args_from_cmd
+from pygnova.scpi_numbers import parse_array, parse_float
+from pygnova.waveform import BlockReader
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# writing these commands changes (almost) any setting: the whole cache is invalidated
+GLOBAL_INVALIDATORS = {
+    "*RST": {},
+    "*RCL": {},
+    "AUToset": {},
+    "SYSTem": {"PRESet": {}},
+}
+
+# responses of these queries (and their subtrees) change without a write: status, error queue, measurements, acquired data
+VOLATILE_QUERIES = {
+    "*OPC": {},
+    "*ESR": {},
+    "*STB": {},
+    "*TST": {},
+    "SYSTem": {"ERRor": {}},
+    "STATus": {},
+    "MEASure": {},
+    "WAVeform": {"DATA": {}, "PREamble": {}},
+}
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total != 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"hits={self.hits} misses={self.misses} hit_ratio={self.hit_ratio:.1%} "
+                f"evictions={self.evictions} invalidations={self.invalidations}")
+
+
+class CachedInstrument(ScpiReadWrite):
+    """
+    Write-through cache of query responses wrapping any ScpiReadWrite.
+
+    Responses are cached per canonical command node (see CommandIndex.normalize), so "chan1:scal" and "CHANnel1:SCALe" share
+    an entry. Writing a command invalidates its node, the node's subtree and the configured dependents;
+    writing a global invalidator (i.e. "*RST", ":AUToset") clears the cache. Volatile queries (i.e. "*OPC", "SYSTem:ERRor",
+    "MEASure" subtree) are never cached. Entries expire after ttl seconds (None: never) and the least recently used entry
+    is evicted beyond max_entries.
+    """
+
+    def __init__(self,
+                 instrument: ScpiReadWrite,
+                 commands: CommandIndex | None = None,
+                 max_entries: int = 256,
+                 ttl: float | None = None,
+                 dependents: Dict[str, List[str]] | None = None,
+                 global_invalidators: Dict[str, Dict] | None = None,
+                 volatile_queries: Dict[str, Dict] | None = None):
+        self.instrument: ScpiReadWrite = instrument
+        self.commands: Optional[CommandIndex] = commands
+        self.max_entries: int = max_entries
+        self.ttl: Optional[float] = ttl
+        self.global_invalidators: CommandIndex = CommandIndex(
+            global_invalidators if global_invalidators is not None else GLOBAL_INVALIDATORS)
+        self.volatile_queries: CommandIndex = CommandIndex(volatile_queries if volatile_queries is not None else VOLATILE_QUERIES)
+        self.dependents: Dict[str, List[str]] = {
+            self._key(node): [self._key(d) for d in nodes] for node, nodes in (dependents if dependents is not None else {}).items()}
+        self.stats: CacheStats = CacheStats()
+        self._entries: collections.OrderedDict = collections.OrderedDict()  # key -> (monotonic time stored, response)
+
+    def __enter__(self):
+        self.instrument.__enter__()  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.instrument.__exit__(exc_type, exc_val, exc_tb)  # noqa
+
+    def add_listener(self, listener: Listener) -> None:
+        self.instrument.add_listener(listener)  # events are emitted by the transport, cache hits are silent
+
+    def remove_listener(self, listener: Listener) -> None:
+        self.instrument.remove_listener(listener)
+
+    def _key(self, command: str) -> str:
+        text = command.strip().lstrip(":")
+        header = strip_args_from_cmd(text)
+        args = text[len(header):].lstrip("?").strip()
+        node = self.commands.normalize(header) if self.commands is not None else None
+        node = node if node is not None else header.upper()
+        return f"{node} {args}" if len(args) != 0 else node
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def is_volatile(self, command: str) -> bool:
+        nodes = strip_args_from_cmd(command.strip().lstrip(":")).split(":")
+        return any(self.volatile_queries.is_known(":".join(nodes[:depth])) for depth in range(1, len(nodes) + 1))
+
+    @staticmethod
+    def absolute_commands(message: str) -> List[str]:
+        """
+        Splits a compound message into its commands with absolute headers: a header without leading colon is relative
+        to the path of the previous one, i.e. "CHANnel1:SCALe 1;OFFSet 2" -> ["CHANnel1:SCALe 1", "CHANnel1:OFFSet 2"].
+        """
+        commands: List[str] = []
+        path = ""
+        for command in split_compound_reply(message):
+            text = command.strip()
+            if len(path) != 0 and not text.startswith((":", "*")):
+                text = f"{path}:{text}"
+            text = text.lstrip(":")
+            if not text.startswith("*"):  # common commands leave the path unchanged
+                path = strip_args_from_cmd(text).rpartition(":")[0]
+            commands.append(text)
+        return commands
+
+    def invalidate(self, command: str) -> None:
+        """
+        Drops the cached responses affected by writing the command.
+        """
+        self.stats.invalidations += 1
+        if self.global_invalidators.is_known(strip_args_from_cmd(command.strip())):
+            self.clear()
+            return
+
+        key = self._key(strip_args_from_cmd(command.strip()))
+        nodes = [key] + self.dependents.get(key, [])
+        stale = [k for k in self._entries if any(k == n or k.startswith((f"{n} ", f"{n}:")) for n in nodes)]
+        for k in stale:
+            del self._entries[k]
+
+    def read(self, command: str) -> Any:
+        if self.is_volatile(command):
+            return self.instrument.read(command)
+
+        key = self._key(command)
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored, response = entry
+            if self.ttl is None or time.monotonic() - stored <= self.ttl:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return response
+            del self._entries[key]
+
+        self.stats.misses += 1
+        response = self.instrument.read(command)
+        self._entries[key] = (time.monotonic(), response)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        return response
+
+    def _read_text(self, command: str) -> str:
+        # typed queries of a single command share the cache entries of read; compound messages are sent as is
+        if ";" in command:
+            return self.query(f"{command}?")
+        response = self.read(command)
+        return response if isinstance(response, str) else json.dumps(response)
+
+    def query_float(self, command: str) -> float:
+        return parse_float(self._read_text(command))
+
+    def query_ints(self, command: str) -> "np.ndarray":
+        return parse_array(self._read_text(command), "i8")
+
+    def query_array(self, command: str, dtype: "str | np.dtype" = "f8") -> "np.ndarray":
+        return parse_array(self._read_text(command), dtype)
+
+    def query(self, message: str) -> str:
+        # raw (compound) messages are not cached, but may contain writes
+        for command in self.absolute_commands(message):
+            if "?" not in command.split(" ", 1)[0]:
+                self.invalidate(command)
+        return self.instrument.query(message)
+
+    def write(self, command: str) -> Any:
+        for part in self.absolute_commands(command):
+            self.invalidate(part)
+        return self.instrument.write(command)
+
+    def _block_reader(self, message: str) -> ContextManager[BlockReader]:
+        return self.instrument._block_reader(message)  # noqa
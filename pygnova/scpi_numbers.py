@@ -0,0 +1,96 @@
+import math
+import re
+import warnings
+from typing import List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# SCPI multiplier suffixes are case-insensitive: "M" is milli, "MA" mega
+MULTIPLIERS = {
+    "EX": 1e18, "PE": 1e15, "T": 1e12, "G": 1e9, "MA": 1e6, "K": 1e3,
+    "M": 1e-3, "U": 1e-6, "N": 1e-9, "P": 1e-12, "F": 1e-15, "A": 1e-18,
+}
+# exceptions of IEEE 488.2 where "M" is mega: megahertz and megaohm
+MEGA_UNITS = ("MHZ", "MOHM")
+# a single letter following the number is a unit, not a multiplier, i.e. "5A" is 5 ampere
+UNITS = ("V", "S", "A", "W", "HZ", "OHM", "DB", "DBM", "PCT", "DEG", "%")
+
+# IEEE 488.2 / SCPI markers of out of range values
+OVERFLOW = 9.9e37
+NOT_A_NUMBER = 9.91e37
+
+_NUMBER = re.compile(r"^\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([a-zA-Z%]*)\s*$")
+
+
+def _special(value: float) -> float:
+    if abs(value) == OVERFLOW:
+        return math.copysign(math.inf, value)
+    if value == NOT_A_NUMBER:
+        return math.nan
+    return value
+
+
+def parse_float(text: str) -> float:
+    """
+    Parses a SCPI numeric response: NR1, NR2 or NR3 optionally followed by a multiplier and/or unit, i.e. "500m",
+    "5.0E-1 V", "2.5MAHZ" or "2.5MHZ" (both mega); "INF", "NINF" and "NAN" mnemonics.
+    The overflow markers 9.9E37 and 9.91E37 map to inf and nan.
+    """
+    text = text.strip().strip("\"'")
+    m = _NUMBER.match(text)
+    if m is None:
+        mnemonic = text.upper()
+        if mnemonic in ("INF", "+INF", "NINF", "-INF", "NAN"):
+            return -math.inf if mnemonic in ("NINF", "-INF") else math.nan if mnemonic == "NAN" else math.inf
+        raise ValueError(f"invalid numeric response=\"{text}\"")
+
+    value = float(m.group(1))
+    suffix = m.group(2).upper()
+    if suffix in MEGA_UNITS:
+        value *= MULTIPLIERS["MA"]
+    elif len(suffix) != 0 and suffix not in UNITS:
+        for multiplier in (suffix[:2], suffix[:1]):
+            if multiplier in MULTIPLIERS and (suffix[len(multiplier):] in UNITS or len(suffix) == len(multiplier)):
+                value *= MULTIPLIERS[multiplier]
+                break
+        else:
+            raise ValueError(f"invalid numeric suffix=\"{m.group(2)}\" of response=\"{text}\"")
+    return _special(value)
+
+
+def parse_floats(text: str, separator: str = ",") -> List[float]:
+    text = text.strip().strip("[]")
+    return [parse_float(item) for item in text.split(separator)] if len(text) != 0 else []
+
+
+def parse_array(text: str, dtype: "str | np.dtype" = "f8", separator: str = ",") -> "np.ndarray":
+    """
+    Parses a separated list of numbers to an array of the given dtype. Plain numbers (the common case of ASCII waveform
+    points and measurement lists) are parsed by NumPy in one pass without creating a Python object per element;
+    lists containing multiplier suffixes or mnemonics fall back to parse_float per element.
+    """
+    import numpy as np
+
+    text = text.strip().strip("[]")
+    if len(text) == 0:
+        return np.empty(0, dtype=dtype)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)  # raised by fromstring on unparsable data
+            values = np.fromstring(text, dtype="f8", sep=separator)
+        if len(values) != text.count(separator) + 1:
+            raise ValueError("trailing data")
+    except (DeprecationWarning, ValueError):
+        values = np.array(parse_floats(text, separator), dtype="f8")
+    else:
+        overflow = np.abs(values) == OVERFLOW
+        if overflow.any():
+            values[overflow] = np.copysign(np.inf, values[overflow])
+        values[values == NOT_A_NUMBER] = np.nan
+
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        if not np.isfinite(values).all() or (values != np.rint(values)).any():
+            raise ValueError(f"non-integer values in response of {len(values)} numbers for {dtype=}")
+    return values.astype(dtype, copy=False)
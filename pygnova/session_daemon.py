@@ -0,0 +1,333 @@
+import base64
+import collections
+import contextlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+from pygnova.batch import BatchRunner, ScriptCommand, coalesce
+from pygnova.instrument import ScpiReadWrite
+from pygnova.instrumentation import EVENT_RECEIVE, EVENT_SEND
+from pygnova.waveform import BlockReader, read_block
+
+OP_READ = "read"
+OP_QUERY = "query"
+OP_WRITE = "write"
+OP_BLOCK = "block"
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"pygnova-{os.getuid()}.sock")
+
+
+def daemon_available(socket_path: str) -> bool:
+    """
+    True if a daemon accepts connections on the socket; a socket file left over by a terminated daemon is not.
+    """
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+class _Request:
+
+    def __init__(self, op: str, message: str):
+        self.op: str = op
+        self.message: str = message
+        self.future: Future = Future()
+
+    @property
+    def script_command(self) -> Optional[ScriptCommand]:
+        """
+        Single commands are coalesced with the commands of other clients; compound messages and blocks are sent as is.
+        """
+        if self.op in (OP_QUERY, OP_BLOCK) or ";" in self.message:
+            return None
+        return ScriptCommand(f"{self.message}?" if self.op == OP_READ else self.message)
+
+
+class DeviceSession:
+    """
+    Owns the open instrument of one device and executes the requests of all clients in a worker thread.
+    Requests are taken round-robin, one per client and round, so that a client sending many commands does not starve
+    the others; the single commands of a round are coalesced to compound messages of at most max_message_size characters.
+    """
+
+    def __init__(self, url: str, instrument_factory: Callable[[str], ScpiReadWrite], max_message_size: int = 512):
+        self.url: str = url
+        self.instrument_factory: Callable[[str], ScpiReadWrite] = instrument_factory
+        self.max_message_size: int = max_message_size
+        self.requests: int = 0
+        self.messages: int = 0
+        self._instrument: Optional[ScpiReadWrite] = None
+        self._pending: collections.OrderedDict = collections.OrderedDict()  # client id -> deque of requests, in round-robin order
+        self._condition: threading.Condition = threading.Condition()
+        self._closed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, name=f"session-{url}", daemon=True)
+        self._thread.start()
+
+    def submit(self, client_id: int, op: str, message: str) -> Future:
+        request = _Request(op, message)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"session closed device={self.url}")
+            self._pending.setdefault(client_id, collections.deque()).append(request)
+            self._condition.notify()
+        return request.future
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _next_round(self) -> List[_Request]:
+        with self._condition:
+            while len(self._pending) == 0 and not self._closed:
+                self._condition.wait()
+            round_requests: List[_Request] = []
+            for client_id in list(self._pending):
+                requests = self._pending[client_id]
+                round_requests.append(requests.popleft())
+                if len(requests) == 0:
+                    del self._pending[client_id]
+                else:
+                    self._pending.move_to_end(client_id)
+            return round_requests
+
+    def _run(self) -> None:
+        try:
+            while True:
+                round_requests = self._next_round()
+                if len(round_requests) == 0:
+                    break
+                self.requests += len(round_requests)
+                batch: List[_Request] = []
+                for request in round_requests:
+                    if request.script_command is not None:
+                        batch.append(request)
+                        continue
+                    self._execute_batch(batch)
+                    batch = []
+                    self._execute(request)
+                self._execute_batch(batch)
+        finally:
+            self._close_instrument()
+
+    def _open_instrument(self) -> ScpiReadWrite:
+        if self._instrument is None:
+            instrument = self.instrument_factory(self.url)
+            if instrument is None:
+                raise ValueError(f"unsupported device url={self.url}")
+            self._instrument = instrument.__enter__()
+        return self._instrument
+
+    def _close_instrument(self) -> None:
+        if self._instrument is not None:
+            instrument, self._instrument = self._instrument, None
+            instrument.__exit__(None, None, None)
+
+    def is_timeout(self, error: Exception) -> bool:
+        instrument = self._instrument
+        return instrument._is_timeout(error) if instrument is not None else isinstance(error, TimeoutError)  # noqa
+
+    def _fail(self, requests: List[_Request], error: Exception) -> None:
+        if isinstance(error, ConnectionError):
+            self._close_instrument()  # reopened by the next request
+        for request in requests:
+            request.future.set_exception(error)
+
+    def _execute_batch(self, requests: List[_Request]) -> None:
+        if len(requests) == 0:
+            return
+        try:
+            runner = BatchRunner(self._open_instrument(), self.max_message_size)
+        except Exception as e:  # noqa
+            self._fail(requests, e)
+            return
+
+        remaining = iter(requests)
+        for commands in coalesce([r.script_command for r in requests], self.max_message_size):
+            batch = [next(remaining) for _ in commands]
+            self.messages += 1
+            try:
+                results = runner.run_batch(commands)
+            except Exception as e:  # noqa
+                self._fail(batch, e)
+                continue
+            for request, (_cmd, response) in zip(batch, results):
+                request.future.set_result(response)
+
+    def _execute(self, request: _Request) -> None:
+        self.messages += 1
+        try:
+            instrument = self._open_instrument()
+            if request.op == OP_BLOCK:
+                with instrument._block_reader(request.message) as reader:  # noqa
+                    result = base64.b64encode(read_block(reader, "u1").tobytes()).decode("ascii")
+            elif request.op == OP_QUERY:
+                result = instrument.query(request.message)
+            elif request.op == OP_READ:
+                result = instrument.read(request.message)
+            else:
+                result = instrument.write(request.message)
+        except Exception as e:  # noqa
+            self._fail([request], e)
+            return
+        request.future.set_result(result)
+
+
+class SessionDaemon:
+    """
+    Serves device sessions to local clients over a Unix socket; each device is opened once on its first request and
+    kept open until the daemon stops. Protocol: one JSON object per line,
+    request {"url", "op" (read, query, write or block), "message"}, response {"result"} or {"error", "timeout"}.
+    """
+
+    def __init__(self, socket_path: str, instrument_factory: Callable[[str], ScpiReadWrite], max_message_size: int = 512):
+        self.socket_path: str = socket_path
+        self.instrument_factory: Callable[[str], ScpiReadWrite] = instrument_factory
+        self.max_message_size: int = max_message_size
+        self.sessions: Dict[str, DeviceSession] = {}
+        self._sessions_lock: threading.Lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._next_client_id: int = 0
+
+    def session(self, url: str) -> DeviceSession:
+        with self._sessions_lock:
+            if url not in self.sessions:
+                self.sessions[url] = DeviceSession(url, self.instrument_factory, self.max_message_size)
+            return self.sessions[url]
+
+    def serve_forever(self) -> None:
+        if daemon_available(self.socket_path):
+            raise RuntimeError(f"daemon already running socket={self.socket_path}")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # left over by a terminated daemon
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        bound_inode: Optional[int] = None
+        try:
+            # created accessible to the owner only: no window in which other users may connect
+            umask = os.umask(0o177)
+            try:
+                self._server.bind(self.socket_path)
+            finally:
+                os.umask(umask)
+            bound_inode = os.stat(self.socket_path).st_ino
+            self._server.listen()
+            print(f"serving sessions on socket={self.socket_path}")
+            while True:
+                connection, _address = self._server.accept()
+                self._next_client_id += 1
+                threading.Thread(target=self._serve_client, args=(connection, self._next_client_id), daemon=True).start()
+        finally:
+            self._server.close()
+            # only the socket bound here: a failed bind may be due to the socket of another daemon
+            with contextlib.suppress(FileNotFoundError):
+                if bound_inode is not None and os.stat(self.socket_path).st_ino == bound_inode:
+                    os.unlink(self.socket_path)
+            for session in self.sessions.values():
+                session.close()
+                print(f"session device={session.url} requests={session.requests} messages={session.messages}")
+
+    def _serve_client(self, connection: socket.socket, client_id: int) -> None:
+        with connection, connection.makefile("rwb") as stream:
+            for line in stream:
+                session: Optional[DeviceSession] = None
+                try:
+                    request = json.loads(line)
+                    session = self.session(request["url"])
+                    reply = {"result": session.submit(client_id, request["op"], request["message"]).result()}
+                except Exception as e:  # noqa
+                    timeout = session.is_timeout(e) if session is not None else False
+                    reply = {"error": f"{type(e).__name__}: {e}", "timeout": timeout}
+                try:
+                    stream.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    stream.flush()
+                except OSError:
+                    break
+
+
+class DaemonInstrument(ScpiReadWrite):
+    """
+    Client of the SessionDaemon: forwards the commands for url to the session held by the daemon.
+    """
+
+    def __init__(self, url: str, socket_path: str):
+        self.instrument_url: str = url
+        self.socket_path: str = socket_path
+        self.socket: Optional[socket.socket] = None
+        self._stream: Optional[io.BufferedRWPair] = None
+
+    def __enter__(self):
+        if self.socket is None:
+            print(f"opening device={self.instrument_url} via daemon={self.socket_path}")
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(self.socket_path)
+            self._stream = self.socket.makefile("rwb")
+        else:
+            print(f"warning: device already opened={self.instrument_url}")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.socket is not None:
+            print(f"closing device={self.instrument_url} via daemon={self.socket_path}")
+            self._stream.close()
+            self.socket.close()
+            self._stream, self.socket = None, None
+        return False
+
+    def _call(self, op: str, message: str) -> Any:
+        self._stream.write(json.dumps({"url": self.instrument_url, "op": op, "message": message}).encode("utf-8") + b"\n")
+        self._stream.flush()
+        line = self._stream.readline()
+        if len(line) == 0:
+            raise ConnectionError(f"connection closed by daemon={self.socket_path}")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise (TimeoutError if reply["timeout"] else RuntimeError)(f"daemon: {reply['error']}")
+        return reply["result"]
+
+    def _request(self, op: str, message: str, event_message: str, response_expected: bool) -> Any:
+        started = time.monotonic()
+        if self.listeners and response_expected:
+            self._notify(EVENT_SEND, event_message, len(event_message), started, True)
+        try:
+            response = self._call(op, message)
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(event_message, started, response_expected, e)
+            raise
+        if self.listeners and op != OP_BLOCK:
+            if response_expected:
+                self._notify(EVENT_RECEIVE, event_message, len(f"{response}"), started, True, response)
+            else:
+                self._notify(EVENT_SEND, event_message, len(event_message), started, False)
+        return response
+
+    def read(self, command: str) -> str:
+        return self._request(OP_READ, command, f"{command}?", True)
+
+    def query(self, message: str) -> str:
+        return self._request(OP_QUERY, message, message, True)
+
+    def _block_reader(self, message: str) -> ContextManager[BlockReader]:
+        # the block is re-framed as IEEE 488.2 definite length block for read_block
+        data = base64.b64decode(self._request(OP_BLOCK, message, message, True))
+        return io.BytesIO(f"#{len(str(len(data)))}{len(data)}".encode("ascii") + data)
+
+    def write(self, command: str) -> int | Dict:
+        return self._request(OP_WRITE, command, command, False)
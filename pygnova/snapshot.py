@@ -0,0 +1,209 @@
+import json
+import re
+import time
+from typing import Collection, Dict, List, Optional, Tuple
+
+from pygnova.batch import BatchRunner, ScriptCommand, coalesce
+from pygnova.command_index import NodeName, SUFFIX_ANY, SUFFIX_LITERAL
+from pygnova.deferred_writes import CommandError, ERROR_QUEUE_QUERY, MAX_DRAINED_ERRORS
+from pygnova.instrument import ScpiReadWrite
+from pygnova.scpi_numbers import parse_float
+
+SNAPSHOT_VERSION = 1
+
+# leaves and subtrees which are no settings: data transfers, measurement results, status and error queues
+EXCLUDED_NODES = ("WAVeform:DATA", "WAVeform:PREamble", "MEASure", "SYSTem:ERRor", "STATus")
+
+# settings which define the range of others are written first, i.e. probe attenuation before scale before offset;
+# other settings are written between scales and positions, trigger settings after all other subsystems
+RESTORE_PRIORITIES = {
+    "display": 0, "type": 0, "mode": 0, "source": 0, "coupling": 0, "probe": 0, "impedance": 0, "units": 0, "bwlimit": 0,
+    "scale": 1, "range": 1,
+    "offset": 3, "position": 3, "delay": 3, "level": 3,
+}
+LAST_SUBSYSTEMS = ("trigger",)
+
+_SUFFIX_RANGE = re.compile(r"\{(\d+)-(\d+)\}$")
+_SUFFIX_DIGITS = re.compile(r"\d+(?=:|$)")
+
+
+def _suffixes(name: str, parsed: NodeName, channels: int) -> List[str]:
+    if parsed.suffix_kind == SUFFIX_LITERAL:
+        return [f"{parsed.suffix_value}"]
+    if parsed.suffix_kind == SUFFIX_ANY:
+        m = _SUFFIX_RANGE.search(name.strip("[]"))
+        first, last = (int(m.group(1)), int(m.group(2))) if m is not None else (1, channels)
+        return [f"{n}" for n in range(first, last + 1)]
+    return [""]
+
+
+def _is_query_only(name: str) -> bool:
+    return name.strip("[]").endswith("?")  # listed with "?" in the commands catalogue, i.e. "MEASure:VPP?"
+
+
+def _leaf_headers(tree: Dict[str, Dict], channels: int, excluded: Tuple[str, ...], query_only: bool) -> List[str]:
+    excluded_keys = {e.lower() for e in excluded}
+    headers: List[str] = []
+
+    def traverse(subtree: Dict[str, Dict], prefix: List[str]) -> None:
+        for name, children in subtree.items():
+            if name.startswith("*"):
+                continue
+            parsed = NodeName(name)
+            for suffix in _suffixes(name, parsed, channels):
+                path = prefix if parsed.optional else prefix + [f"{parsed.mnemonic}{suffix}"]
+                if path is not prefix and _SUFFIX_DIGITS.sub("", ":".join(path).lower()) in excluded_keys:
+                    continue
+                if len(children) != 0:
+                    traverse(children, path)
+                elif len(path) != 0 and _is_query_only(name) == query_only:
+                    headers.append(":".join(path).replace("?", ""))
+
+    traverse(tree, [])
+    return list(dict.fromkeys(headers))  # optional nodes may yield the same header twice
+
+
+def settings_headers(tree: Dict[str, Dict], channels: int = 4, excluded: Tuple[str, ...] = EXCLUDED_NODES) -> List[str]:
+    """
+    Returns the long form headers of all leaves of the commands tree which are settings, in tree order:
+    placeholder suffixes are expanded ("CHANnel{1-4}" to its range, "CHANnel<n>" to 1..channels), optional nodes omitted,
+    common '*' commands, query-only leaves and the excluded nodes skipped.
+    """
+    return _leaf_headers(tree, channels, excluded, query_only=False)
+
+
+def query_only_headers(tree: Dict[str, Dict], channels: int = 4) -> List[str]:
+    """
+    Returns the long form headers of the leaves which the commands tree lists as query-only, expanded as in settings_headers.
+    """
+    return _leaf_headers(tree, channels, (), query_only=True)
+
+
+def read_settings(instrument: ScpiReadWrite, headers: List[str], max_message_size: int = 512) -> Tuple[Dict[str, str], List[str], int]:
+    """
+    Queries the headers with compound messages and returns the values, the unreadable headers and the number of messages.
+    A compound query failing (i.e. a header which is not queryable) is repeated command by command.
+    """
+    runner = BatchRunner(instrument, max_message_size)
+    values: Dict[str, str] = {}
+    unreadable: List[str] = []
+    for batch in coalesce([ScriptCommand(f"{header}?") for header in headers], max_message_size):
+        try:
+            results = runner.run_batch(batch)
+        except Exception:  # noqa
+            results = []
+            for cmd in batch:
+                try:
+                    results.extend(runner.run_batch([cmd]))
+                except Exception:  # noqa
+                    unreadable.append(cmd.command)
+        for cmd, response in results:
+            values[cmd.command] = response.strip()
+    return values, unreadable, runner.round_trips
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return parse_float(value)
+    except ValueError:
+        return None
+
+
+def same_value(a: str, b: str) -> bool:
+    """
+    Numbers are compared by value ("1.0E-3" equals "1m" and "0.001"), other responses case-insensitive without quotes.
+    """
+    number_a, number_b = _number(a), _number(b)
+    if number_a is not None and number_b is not None:
+        return number_a == number_b or abs(number_a - number_b) <= 1e-9 * max(abs(number_a), abs(number_b))
+    return a.strip().strip("\"'").lower() == b.strip().strip("\"'").lower()
+
+
+def restore_order(headers: List[str]) -> List[str]:
+    def key(item: Tuple[int, str]) -> tuple:
+        idx, header = item
+        nodes = header.lower().split(":")
+        leaf = _SUFFIX_DIGITS.sub("", nodes[-1])
+        return _SUFFIX_DIGITS.sub("", nodes[0]) in LAST_SUBSYSTEMS, RESTORE_PRIORITIES.get(leaf, 2), idx
+
+    return [header for _idx, header in sorted(enumerate(headers), key=key)]
+
+
+class StateSnapshot:
+
+    def __init__(self,
+                 device: str,
+                 identification: str,
+                 settings: Dict[str, str],
+                 unreadable: List[str] | None = None,
+                 timestamp: str | None = None):
+        self.device: str = device
+        self.identification: str = identification
+        self.settings: Dict[str, str] = settings
+        self.unreadable: List[str] = unreadable if unreadable is not None else []
+        self.timestamp: str = timestamp if timestamp is not None else time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    def store(self, path: str) -> None:
+        with open(path, "w") as out_file:
+            json.dump({"version": SNAPSHOT_VERSION, "device": self.device, "identification": self.identification,
+                       "timestamp": self.timestamp, "settings": self.settings, "unreadable": self.unreadable}, out_file, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "StateSnapshot":
+        with open(path, "r") as in_file:
+            content = json.load(in_file)
+        if content.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version={content.get('version')} file=\"{path}\"")
+        return cls(content["device"], content["identification"], content["settings"], content["unreadable"], content["timestamp"])
+
+    def diff(self, current: Dict[str, str], headers: Collection[str] | None = None) -> List[Tuple[str, Optional[str], str]]:
+        """
+        Returns (header, current value, snapshot value) of the settings (of headers only if given) differing from current,
+        in restore order.
+        """
+        changed = [h for h, value in self.settings.items()
+                   if (headers is None or h in headers) and (h not in current or not same_value(current[h], value))]
+        return [(h, current.get(h), self.settings[h]) for h in restore_order(changed)]
+
+
+def take_snapshot(instrument: ScpiReadWrite, url: str, headers: List[str], max_message_size: int = 512) -> Tuple[StateSnapshot, int]:
+    identification = instrument.query("*IDN?").strip()
+    settings, unreadable, messages = read_settings(instrument, headers, max_message_size)
+    return StateSnapshot(url, identification, settings, unreadable), messages + 1
+
+
+def read_errors(instrument: ScpiReadWrite) -> Tuple[List[CommandError], int]:
+    """
+    Reads the device error queue until empty; returns the errors and the number of messages.
+    """
+    errors: List[CommandError] = []
+    while len(errors) < MAX_DRAINED_ERRORS:
+        error = CommandError.parse(None, instrument.query(ERROR_QUEUE_QUERY))
+        if error.code == 0:
+            return errors, len(errors) + 1
+        errors.append(error)
+    return errors, len(errors)
+
+
+def restore_snapshot(instrument: ScpiReadWrite,
+                     snapshot: StateSnapshot,
+                     max_message_size: int = 512,
+                     dry_run: bool = False,
+                     query_only: Collection[str] = ()) -> Tuple[List[Tuple[str, Optional[str], str]], List[CommandError], int]:
+    """
+    Reads the current values of the snapshot settings (without the query_only headers) and writes only the differing ones
+    in restore order, preceded by "*CLS" and followed by "*OPC?" to wait for their completion, then reads the error queue.
+    Returns the differences, the device errors of restoring and the number of messages.
+    """
+    skipped = {h.replace("?", "").lower() for h in query_only}
+    headers = [h for h in snapshot.settings if h.replace("?", "").lower() not in skipped]
+    current, _unreadable, messages = read_settings(instrument, headers, max_message_size)
+    changes = snapshot.diff(current, set(headers))
+    errors: List[CommandError] = []
+    if len(changes) != 0 and not dry_run:
+        runner = BatchRunner(instrument, max_message_size)
+        runner.run([ScriptCommand("*CLS")] + [ScriptCommand(f"{header} {value}") for header, _current, value in changes] +
+                   [ScriptCommand("*OPC?")])
+        errors, error_messages = read_errors(instrument)
+        messages += runner.round_trips + error_messages
+    return changes, errors, messages
@@ -0,0 +1,141 @@
+import contextlib
+import socket
+import time
+from typing import Iterator
+
+from pygnova.instrument import ScpiReadWrite
+from pygnova.instrument_url import VisaTcpUrl
+from pygnova.instrumentation import EVENT_RECEIVE, EVENT_SEND
+from pygnova.waveform import BlockReader, read_exact
+
+
+class SocketInstrument(ScpiReadWrite):
+    """
+    SCPI over a plain TCP socket (TCPIP::<ip>::<port>::SOCKET) without a VISA resource manager.
+    Responses are read through a receive buffer which is searched for the read termination.
+    """
+
+    def __init__(self,
+                 url: VisaTcpUrl,
+                 write_termination: str = "\n",
+                 read_termination: str = "\n",
+                 rw_timeout: int = 1000,
+                 open_timeout: int = 10000,
+                 receive_buffer_size: int = 4 * 1024 * 1024,
+                 read_chunk_size: int = 64 * 1024):
+        self.instrument_url: str = url.to_str_url()
+        self.address: tuple = (url.ip_address, url.tcp_port)
+        self.write_termination: bytes = write_termination.encode("utf-8")
+        self.read_termination: bytes = read_termination.encode("utf-8")
+        self.rw_timeout: int = rw_timeout
+        self.open_timeout: int = open_timeout
+        self.receive_buffer_size: int = receive_buffer_size
+        self.read_chunk_size: int = read_chunk_size
+        self.socket: socket.socket | None = None
+        self._buffer: bytearray = bytearray()
+
+    def __enter__(self):
+        if self.socket is None:
+            print(f"opening device={self.instrument_url}")
+            self.socket = socket.create_connection(self.address, timeout=self.open_timeout / 1000)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+            self.socket.settimeout(self.rw_timeout / 1000)
+            self._buffer.clear()
+        else:
+            print(f"warning: device already opened={self.instrument_url}")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.socket is not None:
+            print(f"closing device={self.instrument_url}")
+            self.socket.close()
+            self.socket = None
+        return False
+
+    def clear(self) -> None:
+        """
+        Discards buffered and in-flight responses by reconnecting: the rest of a response is dropped with the connection.
+        """
+        self._buffer.clear()
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            self.__enter__()
+
+    def _send(self, message: str) -> int:
+        data = message.encode("utf-8") + self.write_termination
+        self.socket.sendall(data)
+        return len(data)
+
+    def _receive(self) -> None:
+        chunk = self.socket.recv(self.read_chunk_size)
+        if len(chunk) == 0:
+            raise ConnectionError(f"connection closed by device={self.instrument_url}")
+        self._buffer += chunk
+
+    def _read_line(self) -> str:
+        searched = 0
+        while True:
+            end = self._buffer.find(self.read_termination, searched)
+            if end >= 0:
+                line = self._buffer[:end].decode("utf-8")
+                del self._buffer[:end + len(self.read_termination)]
+                return line
+            searched = max(0, len(self._buffer) - len(self.read_termination) + 1)
+            self._receive()
+
+    def readinto(self, buffer: memoryview) -> int:
+        """
+        Raw reads for binary blocks: buffered bytes first, then straight from the socket into the buffer.
+        """
+        if len(self._buffer) != 0:
+            count = min(len(buffer), len(self._buffer))
+            buffer[:count] = self._buffer[:count]
+            del self._buffer[:count]
+            return count
+        return self.socket.recv_into(buffer)
+
+    def read(self, command: str) -> str:
+        return self.query(f"{command}?")
+
+    def query(self, message: str) -> str:
+        started = time.monotonic()
+        try:
+            sent = self._send(message)
+            if self.listeners:
+                self._notify(EVENT_SEND, message, sent, started, True)
+            response = self._read_line()
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(message, started, True, e)
+            self.clear()  # a late response would be returned to the next query
+            raise
+        if self.listeners:
+            self._notify(EVENT_RECEIVE, message, len(response), started, True, response)
+        return response
+
+    @contextlib.contextmanager
+    def _block_reader(self, message: str) -> Iterator[BlockReader]:
+        sent = self._send(message)
+        if self.listeners:
+            self._notify(EVENT_SEND, message, sent, time.monotonic(), True)
+        try:
+            yield self
+        except Exception:
+            self.clear()  # discard the rest of the block
+            raise
+        # consume the response message terminator following the block
+        read_exact(self, memoryview(bytearray(len(self.read_termination))))
+
+    def write(self, command: str) -> int:
+        started = time.monotonic()
+        try:
+            response = self._send(command)
+        except Exception as e:
+            if self.listeners:
+                self._notify_failure(command, started, False, e)
+            raise
+        if self.listeners:
+            self._notify(EVENT_SEND, command, response, started, False)
+        return response
@@ -0,0 +1,152 @@
+import time
+from typing import BinaryIO, Callable, List, Optional, Protocol, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class BlockReader(Protocol):
+
+    def readinto(self, buffer: memoryview) -> int:
+        """
+        Reads up to len(buffer) bytes into buffer and returns the number of bytes read (0 on end of data).
+        """
+        ...
+
+
+def read_exact(reader: BlockReader, buffer: memoryview) -> None:
+    received = 0
+    while received < len(buffer):
+        count = reader.readinto(buffer[received:])
+        if not count:
+            raise ValueError(f"block data truncated after {received} of {len(buffer)} bytes")
+        received += count
+
+
+def read_block_header(reader: BlockReader) -> int:
+    """
+    Reads the IEEE 488.2 definite length block header "#<n><n digits length>" and returns the payload length in bytes.
+    """
+    head = bytearray(2)
+    read_exact(reader, memoryview(head))
+    if head[0:1] != b"#" or not chr(head[1]).isdigit():
+        raise ValueError(f"invalid block header={bytes(head)!r}")
+    digits = int(chr(head[1]), 10)
+    if digits == 0:
+        raise ValueError("indefinite length blocks (#0) are not supported")
+
+    length = bytearray(digits)
+    read_exact(reader, memoryview(length))
+    return int(length.decode("ascii"), 10)
+
+
+def read_block(reader: BlockReader, dtype: "str | np.dtype" = "u1") -> "np.ndarray":
+    """
+    Reads a definite length block payload straight into a preallocated array of the given dtype (incl. byte order).
+    """
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    length = read_block_header(reader)
+    if length % dtype.itemsize != 0:
+        raise ValueError(f"block length={length} is no multiple of {dtype=} item size={dtype.itemsize}")
+
+    data = np.empty(length // dtype.itemsize, dtype=dtype)
+    read_exact(reader, memoryview(data).cast("B"))
+    return data
+
+
+class TransferStats:
+
+    def __init__(self, nbytes: int, seconds: float):
+        self.nbytes: int = nbytes
+        self.seconds: float = seconds
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.nbytes / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"bytes={self.nbytes} seconds={self.seconds:.3f} rate={self.mb_per_second:.1f}MB/s"
+
+
+# called with the bytes transferred so far and the payload length
+ProgressCallback = Callable[[int, int], None]
+
+
+def copy_block(reader: BlockReader,
+               out: BinaryIO,
+               chunk_size: int = 1024 * 1024,
+               progress: Optional[ProgressCallback] = None) -> TransferStats:
+    """
+    Copies a definite length block payload to out (a file or writable buffer) through one chunk_size buffer,
+    i.e. with constant memory regardless of the payload length.
+    """
+    started = time.monotonic()
+    length = read_block_header(reader)
+    buffer = memoryview(bytearray(min(chunk_size, length)))
+    copied = 0
+    while copied < length:
+        count = reader.readinto(buffer[:min(len(buffer), length - copied)])
+        if not count:
+            raise ValueError(f"block data truncated after {copied} of {length} bytes")
+        out.write(buffer[:count])
+        copied += count
+        if progress is not None:
+            progress(copied, length)
+    return TransferStats(length, time.monotonic() - started)
+
+
+class WaveformPreamble:
+    """
+    Parsed reply of "WAVeform:PREamble?":
+    format, type, points, count, x increment, x origin, x reference, y increment, y origin, y reference
+    """
+
+    def __init__(self, preamble: str):
+        fields: List[str] = [f.strip() for f in preamble.strip().split(",")]
+        if len(fields) < 10:
+            raise ValueError(f"invalid waveform {preamble=}")
+        self.format: int = int(float(fields[0]))
+        self.type: int = int(float(fields[1]))
+        self.points: int = int(float(fields[2]))
+        self.count: int = int(float(fields[3]))
+        self.x_increment: float = float(fields[4])
+        self.x_origin: float = float(fields[5])
+        self.x_reference: float = float(fields[6])
+        self.y_increment: float = float(fields[7])
+        self.y_origin: float = float(fields[8])
+        self.y_reference: float = float(fields[9])
+
+
+class Waveform:
+
+    def __init__(self, preamble: WaveformPreamble, raw: "np.ndarray"):
+        self.preamble: WaveformPreamble = preamble
+        self.raw: "np.ndarray" = raw
+
+    def voltages(self, dtype: str = "f8") -> "np.ndarray":
+        import numpy as np
+
+        p = self.preamble
+        out = np.subtract(self.raw, p.y_reference, dtype=dtype)
+        out *= p.y_increment
+        out += p.y_origin
+        return out
+
+    def times(self, dtype: str = "f8") -> "np.ndarray":
+        import numpy as np
+
+        p = self.preamble
+        out = np.arange(len(self.raw), dtype=dtype)
+        out -= p.x_reference
+        out *= p.x_increment
+        out += p.x_origin
+        return out
+
+
+# waveform data format -> dtype of the raw sample values; WORD samples are requested in LSB first byte order
+WAVEFORM_FORMATS = {
+    "BYTE": "u1",
+    "WORD": "<u2",
+}
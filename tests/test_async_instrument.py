@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from pygnova.async_instrument import get_async_instrument_from_url
+from pygnova.fake_instrument import FakeInstrument, FakeRestServer, FakeScpiServer
+
+
+async def _with_fake(test, latency: float = 0.0, rest: bool = False, **kwargs):
+    fake = FakeInstrument(latency=latency)
+    server = FakeRestServer(fake) if rest else FakeScpiServer(fake)
+    port = await server.start()
+    url = f"http://127.0.0.1:{port}/scpi" if rest else f"TCPIP::127.0.0.1::{port}::SOCKET"
+    try:
+        async with get_async_instrument_from_url(url, **kwargs) as instrument:
+            await test(instrument, fake)
+    finally:
+        await server.stop()
+
+
+@pytest.mark.parametrize("rest", [False, True])
+def test_pipelined_responses_match_requests(rest):
+    async def test(instrument, _fake):
+        await asyncio.gather(*(instrument.write(f"CHANnel{i}:OFFSet {i}") for i in range(1, 5)))
+        responses = await asyncio.gather(*(instrument.read(f"CHANNEL{i % 4 + 1}:OFFSET") for i in range(40)))
+        assert responses == [f"{i % 4 + 1}" for i in range(40)]
+
+    asyncio.run(_with_fake(test, rest=rest))
+
+
+def test_cancelled_query_does_not_shift_responses():
+    async def test(instrument, _fake):
+        await instrument.write("CHANnel1:SCALe 1")
+        await instrument.write("CHANnel2:SCALe 2")
+        cancelled = asyncio.create_task(instrument.read("CHANNEL1:SCALE"))
+        await asyncio.sleep(0.01)  # sent, response pending
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert await instrument.read("CHANNEL2:SCALE") == "2"
+        assert await instrument.read("CHANNEL1:SCALE") == "1"
+
+    asyncio.run(_with_fake(test, latency=0.05))
+
+
+def test_cancelled_before_sending_does_not_shift_responses():
+    async def test(instrument, _fake):
+        await instrument.write("CHANnel1:SCALe 1")
+        await instrument.write("CHANnel2:SCALe 2")
+        tasks = [asyncio.create_task(instrument.read(f"CHANNEL{i % 2 + 1}:SCALE")) for i in range(10)]
+        tasks[3].cancel()  # before the task ran: nothing sent
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert isinstance(results[3], asyncio.CancelledError)
+        assert [r for i, r in enumerate(results) if i != 3] == [f"{i % 2 + 1}" for i in range(10) if i != 3]
+
+    asyncio.run(_with_fake(test))
+
+
+def test_timed_out_query_response_is_discarded():
+    async def test(instrument, fake):
+        await instrument.write("CHANnel1:SCALe 1")
+        await instrument.write("CHANnel2:SCALe 2")
+        fake.latency = 0.5
+        with pytest.raises(asyncio.TimeoutError):
+            await instrument.read("CHANNEL1:SCALE")
+        fake.latency = 0.0
+        assert await instrument.read("CHANNEL2:SCALE") == "2"
+
+    asyncio.run(_with_fake(test, rw_timeout=300))
+
+
+def test_request_after_close_fails():
+    async def test(instrument, _fake):
+        await instrument.__aexit__(None, None, None)
+        with pytest.raises(ConnectionError):
+            await instrument.read("*IDN")
+
+    asyncio.run(_with_fake(test))
+
+
+def test_request_after_connection_loss_fails_fast():
+    async def test():
+        server = await asyncio.start_server(lambda _reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with get_async_instrument_from_url(f"TCPIP::127.0.0.1::{port}::SOCKET", rw_timeout=5000) as instrument:
+                await asyncio.sleep(0.1)  # the reader task sees the closed connection
+                started = asyncio.get_running_loop().time()
+                for _ in range(2):
+                    with pytest.raises(ConnectionError):
+                        await instrument.read("*IDN")
+                assert asyncio.get_running_loop().time() - started < 1
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(test())
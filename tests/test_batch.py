@@ -0,0 +1,50 @@
+from pygnova.batch import BatchRunner, ScriptCommand, coalesce, join_compound, parse_script, split_compound_reply
+from pygnova.fake_instrument import FakeInstrument
+
+
+class _Instrument:
+
+    def __init__(self):
+        self.fake = FakeInstrument()
+        self.messages = []
+
+    def query(self, message: str) -> str:
+        self.messages.append(message)
+        return self.fake.handle(message).decode("utf-8")
+
+    def write(self, message: str) -> None:
+        self.messages.append(message)
+        self.fake.handle(message)
+
+
+def test_parse_script_skips_comments_and_blank_lines():
+    commands = parse_script(["# setup\n", "\n", "CHANnel1:SCALe 1  # volts\n", "  CHANnel1:SCALe?\n"])
+    assert [(cmd.text, cmd.line_nr, cmd.is_query) for cmd in commands] == [
+        ("CHANnel1:SCALe 1", 3, False), ("CHANnel1:SCALe?", 4, True)]
+    assert commands[1].command == "CHANnel1:SCALe"
+
+
+def test_coalesce_respects_max_message_size():
+    commands = [ScriptCommand(f"CHANnel{i % 4 + 1}:SCALe {i}") for i in range(20)] + [ScriptCommand("X" * 100)]
+    batches = coalesce(commands, max_message_size=64)
+    assert [cmd for batch in batches for cmd in batch] == commands
+    assert all(len(join_compound(batch)) <= 64 for batch in batches[:-1])
+    assert batches[-1] == [commands[-1]]  # longer than the limit: sent alone
+
+
+def test_join_compound_resets_header_path():
+    commands = [ScriptCommand("CHANnel1:SCALe 1"), ScriptCommand("*CLS"), ScriptCommand("TIMebase:SCALe?"), ScriptCommand(":ACQuire:MODE?")]
+    assert join_compound(commands) == "CHANnel1:SCALe 1;*CLS;:TIMebase:SCALe?;:ACQuire:MODE?"
+
+
+def test_split_compound_reply_keeps_quoted_separators():
+    assert split_compound_reply("1;\"a;b\";'c;d';2\n") == ["1", "\"a;b\"", "'c;d'", "2"]
+    assert split_compound_reply("\"it's\";3") == ["\"it's\"", "3"]
+
+
+def test_batch_runner_matches_replies_to_queries():
+    instrument = _Instrument()
+    runner = BatchRunner(instrument, max_message_size=512)  # noqa
+    results = runner.run(parse_script(["CHANnel1:SCALe 2", "CHANnel1:SCALe?", "*IDN?"]))
+    assert [response for _cmd, response in results] == [None, "2", "Batronix,Magnova,000000,fake"]
+    assert runner.round_trips == 1 and len(instrument.messages) == 1
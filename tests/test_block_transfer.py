@@ -0,0 +1,85 @@
+import io
+import os
+
+import pytest
+
+import main
+from pygnova.waveform import TransferStats, copy_block
+
+
+def _block(payload: bytes) -> bytes:
+    return f"#{len(str(len(payload)))}{len(payload)}".encode("ascii") + payload
+
+
+class _Reader:
+
+    def __init__(self, data: bytes):
+        self.stream = io.BytesIO(data)
+        self.buffer_sizes = []
+
+    def readinto(self, buffer: memoryview) -> int:
+        self.buffer_sizes.append(len(buffer))
+        return self.stream.readinto(buffer)
+
+
+class _Writer:
+
+    def __init__(self):
+        self.data = bytearray()
+        self.writes = 0
+
+    def write(self, data) -> int:
+        self.data += data
+        self.writes += 1
+        return len(data)
+
+
+def test_copy_block_through_one_chunk_buffer():
+    payload = os.urandom(10_000)
+    reader, out, progress = _Reader(_block(payload) + b"\n"), _Writer(), []
+    stats = copy_block(reader, out, chunk_size=1024, progress=lambda copied, total: progress.append((copied, total)))  # noqa
+    assert bytes(out.data) == payload and stats.nbytes == len(payload)
+    assert max(reader.buffer_sizes) <= 1024 and out.writes == 10
+    assert progress[-1] == (10_000, 10_000) and len(progress) == 10
+    assert reader.stream.read() == b"\n"  # the terminator is left to the transport
+
+
+def test_copy_block_truncated():
+    with pytest.raises(ValueError):
+        copy_block(_Reader(_block(b"x" * 100)[:-10]), _Writer(), chunk_size=16)  # noqa
+
+
+class _Instrument:
+
+    def __init__(self, payload: bytes, fail: bool = False):
+        self.payload = payload
+        self.fail = fail
+
+    def stream_block(self, command, out, chunk_size, progress) -> TransferStats:
+        out.write(self.payload[:len(self.payload) // 2])
+        if self.fail:
+            raise ConnectionError("connection lost")
+        out.write(self.payload[len(self.payload) // 2:])
+        return TransferStats(len(self.payload), 0.1)
+
+
+def test_stream_to_file_replaces_the_file_when_complete(tmp_path):
+    out = tmp_path / "screen.png"
+    out.write_bytes(b"old")
+    assert main.stream_to_file(_Instrument(b"new screenshot"), "DISPlay:DATA", str(out), 1024) == 0  # noqa
+    assert out.read_bytes() == b"new screenshot"
+    assert os.listdir(tmp_path) == ["screen.png"]
+
+
+def test_stream_to_file_keeps_the_file_on_failure(tmp_path):
+    out = tmp_path / "screen.png"
+    out.write_bytes(b"old")
+    with pytest.raises(ConnectionError):
+        main.stream_to_file(_Instrument(b"new screenshot", fail=True), "DISPlay:DATA", str(out), 1024)  # noqa
+    assert out.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["screen.png"]  # no partial temporary file
+
+
+def test_stream_to_file_writes_special_files_in_place(tmp_path):
+    assert main.stream_to_file(_Instrument(b"data"), "DISPlay:DATA", os.devnull, 1024) == 0  # noqa
+    assert os.path.exists(os.devnull)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from pygnova.capture import CapturePipeline, FrameConsumer
+
+
+class _Recorder(FrameConsumer):
+
+    def __init__(self, gate: threading.Event | None = None):
+        self.gate = gate
+        self.started = threading.Event()
+        self.indices = []
+        self.closed = False
+
+    def consume(self, frame) -> None:
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.indices.append(frame.index)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def test_drop_oldest_keeps_the_newest_frames():
+    gate = threading.Event()
+    recorder = _Recorder(gate)
+
+    acquired = []
+
+    def acquire():
+        if acquired:
+            recorder.started.wait(5)  # the consumer holds frame 0 before the queue fills up
+        acquired.append(True)
+
+    pipeline = CapturePipeline(acquire, [recorder], queue_size=2, policy=CapturePipeline.POLICY_DROP_OLDEST)  # noqa
+    pipeline.start(10)
+    _wait_for(lambda: pipeline.stats.dropped == 7)
+    gate.set()
+    stats = pipeline.join()
+    assert recorder.indices == [0, 8, 9]
+    assert (stats.acquired, stats.consumed, stats.dropped) == (10, 3, 7)
+    assert recorder.closed
+
+
+def test_block_policy_consumes_every_frame_in_order():
+    recorder = _Recorder()
+    stats = CapturePipeline(lambda: None, [recorder], queue_size=1).run(20)  # noqa
+    assert recorder.indices == list(range(20))
+    assert (stats.acquired, stats.consumed, stats.dropped) == (20, 20, 0)
+
+
+def test_failing_consumer_stops_the_capture():
+    class Failing(FrameConsumer):
+        def consume(self, frame) -> None:
+            raise RuntimeError("disk full")
+
+    stats = CapturePipeline(lambda: None, [Failing()], queue_size=1).run(1000)  # noqa
+    assert isinstance(stats.error, RuntimeError) and stats.consumed == 0 and stats.acquired < 1000
@@ -0,0 +1,44 @@
+import pytest
+
+from pygnova.command_catalogue import CommandCatalogue, write_catalogue
+from pygnova.command_index import CommandIndex
+
+TREE = {
+    "CHANnel1": {"LABel": {}},
+    "CHANnel<n>": {"SCALe": {}, "OFFSet": {}},
+    "[SOURce]": {"FREQuency": {}},
+    "TRIGger": {"[EDGE]": {"LEVel": {}}},
+    "MEASure{1-4}": {"VALue": {}},
+    "*IDN": {},
+}
+
+
+@pytest.fixture(params=["index", "catalogue"])
+def index(request, tmp_path):
+    if request.param == "index":
+        yield CommandIndex(TREE)
+        return
+    write_catalogue(str(tmp_path / "commands.catalogue"), TREE)
+    catalogue = CommandCatalogue(str(tmp_path / "commands.catalogue"))
+    yield catalogue
+    catalogue.close()
+
+
+def test_short_and_long_forms(index):
+    assert index.normalize("chan2:scal") == "CHANnel2:SCALe"
+    assert index.normalize(":CHANNEL3:OFFSET?") == "CHANnel3:OFFSet"
+    assert index.normalize("*idn?") == "*IDN"
+    assert not index.is_known("CHANnel1:SCALing")
+
+
+def test_backtracks_over_matching_branches(index):
+    assert index.normalize("CHANnel1:LABel") == "CHANnel1:LABel"
+    assert index.normalize("CHANnel1:SCALe") == "CHANnel1:SCALe"
+    assert index.normalize("chan:lab") == "CHANnel1:LABel"  # an omitted suffix is 1
+    assert not index.is_known("CHANnel2:LABel")
+
+
+def test_optional_nodes_and_suffix_ranges(index):
+    assert index.normalize("FREQ") == index.normalize("SOUR:FREQ") == "FREQuency"
+    assert index.normalize("TRIG:LEV") == index.normalize("TRIGger:EDGE:LEVel") == "TRIGger:LEVel"
+    assert index.normalize("MEAS2:VAL") == "MEASure2:VALue"
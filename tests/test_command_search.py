@@ -0,0 +1,47 @@
+import pytest
+
+from pygnova.command_search import CommandSearchIndex
+
+TREE = {"CHANnel1": {"LABel": {}}, "CHANnel<n>": {"SCALe": {}, "OFFSet": {}}, "[SOURce]": {"FREQuency": {}},
+        "TRIGger": {"[EDGE]": {"LEVel": {}}}, "MEASure{1-4}": {"VALue": {}}, "TIMebase": {"SCALe": {}}, "*IDN": {}}
+
+
+@pytest.fixture
+def index():
+    return CommandSearchIndex.from_tree(TREE)
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("chan1:scale", ["CHANnel<n>:SCALe"]),  # short and long forms mixed
+    (":CHANnel2:SCALe?", ["CHANnel<n>:SCALe"]),
+    ("trigger:level", ["TRIGger:[EDGE]:LEVel"]),  # optional node omitted
+    ("trig:edge:lev", ["TRIGger:[EDGE]:LEVel"]),
+    ("freq", ["[SOURce]:FREQuency"]),
+    ("meas2:val", ["MEASure{1-4}:VALue"]),
+    ("*idn", ["*IDN"]),
+    ("edge:lev", ["TRIGger:[EDGE]:LEVel"]),  # starting below the root
+    ("1", []),
+    ("", []),
+])
+def test_search_matches_node_by_node(index, pattern, expected):
+    assert index.search(pattern) == expected
+
+
+def test_search_ranks_exact_before_prefix_before_node_prefix_before_substring(index):
+    assert index.search("chan1") == ["CHANnel1", "CHANnel<n>", "CHANnel1:LABel", "CHANnel<n>:OFFSet", "CHANnel<n>:SCALe"]
+    assert index.search("scal") == ["CHANnel<n>:SCALe", "TIMebase:SCALe"]
+    assert index.search("time") == ["TIMebase", "TIMebase:SCALe"]
+    assert index.search("ale") == ["CHANnel<n>:SCALe", "TIMebase:SCALe"]
+    assert index.search("chan", limit=2) == ["CHANnel1", "CHANnel<n>"]
+
+
+@pytest.mark.parametrize("prefix, expected", [
+    ("chan2:", ["chan2:scale", "chan2:offset"]),
+    ("CHAN1:L", ["CHAN1:LABel"]),
+    ("trig:", ["trig:edge", "trig:level"]),
+    ("trig:edge:", ["trig:edge:level"]),
+    (":ti", [":timebase"]),
+    ("chan2:lab", []),  # only CHANnel1 has LABel
+])
+def test_complete(index, prefix, expected):
+    assert index.complete(prefix) == expected
@@ -0,0 +1,38 @@
+from pygnova.deferred_writes import DeferredWriteInstrument
+
+
+class _Instrument:
+    """
+    Fails the writes with the given (0-based) sequence numbers: flags them in *ESR? and queues an error.
+    """
+
+    def __init__(self, failing):
+        self.failing = set(failing)
+        self.writes = 0
+        self.error_queue = []
+
+    def query(self, message: str) -> str:
+        replies = []
+        for command in message.split(";"):
+            command = command.lstrip(":")
+            if command == "*ESR?":
+                replies.append("32" if self.writes - 1 in self.failing else "0")
+            elif command == "*OPC?":
+                replies.append("1")
+            elif command == "SYSTem:ERRor?":
+                replies.append(self.error_queue.pop(0) if len(self.error_queue) != 0 else "0,\"No error\"")
+            else:
+                if self.writes in self.failing:
+                    self.error_queue.append(f"-222,\"Data out of range {command}\"")
+                self.writes += 1
+        return ";".join(replies)
+
+
+def test_errors_of_repeated_commands_are_attributed_by_index():
+    device = _Instrument(failing=[2])
+    instrument = DeferredWriteInstrument(device, raise_errors=False)  # noqa
+    for command in ("CHANnel1:SCALe 99", "TIMebase:SCALe 1", "CHANnel1:SCALe 99"):
+        instrument.write(command)
+    errors = instrument.sync()
+    assert [(e.index, e.command, e.code) for e in errors] == [(2, "CHANnel1:SCALe 99", -222)]
+    assert device.writes == 3
@@ -0,0 +1,64 @@
+import socket
+
+import pytest
+
+from pygnova.discovery import DiscoveredDevice, DiscoveryCache, discover, discover_mdns, discover_usb, resolve_device
+from pygnova.instrument_url import RestUrl, VisaTcpUrl, VisaUsbUrl
+
+
+class _UsbDevice:
+
+    def __init__(self, serial_number: str | None):
+        self._serial_number = serial_number
+
+    @property
+    def serial_number(self) -> str:
+        if self._serial_number is None:
+            raise ValueError("access denied")
+        return self._serial_number
+
+
+def test_discover_usb_skips_inaccessible_devices(capsys):
+    def find(find_all, idVendor, idProduct):  # noqa
+        assert find_all and (idVendor, idProduct) == (0x19B2, 0x0030)
+        return [_UsbDevice("001065"), _UsbDevice(None)]
+
+    devices = discover_usb(find=find)
+    assert [d.to_dict() for d in devices] == [{"alias": "001065", "url": "USB::0x19b2::0x30::001065::INSTR", "source": "usb"}]
+    captured = capsys.readouterr()
+    assert captured.out == "" and "cannot read serial number" in captured.err  # stdout may carry monitor data
+
+
+def test_discover_mdns_with_fake_responder():
+    zeroconf = pytest.importorskip("zeroconf")
+    zc = zeroconf.Zeroconf(interfaces=["127.0.0.1"], ip_version=zeroconf.IPVersion.V4Only)
+    try:
+        services = [("_scpi-raw._tcp.local.", "Magnova 1234", 5025), ("_http._tcp.local.", "Printer", 80),
+                    ("_http._tcp.local.", "Magnova 5678", 8080)]
+        for type_, name, port in services:
+            addresses = [socket.inet_pton(socket.AF_INET6, "fe80::1")]
+            if name != "Magnova 5678":
+                addresses.append(socket.inet_aton("127.0.0.1"))
+            info = zeroconf.ServiceInfo(type_, f"{name}.{type_}", addresses=addresses, port=port, server=f"{port}.local.")
+            zc.register_service(info, cooperating_responders=True)
+        devices = discover_mdns(0.5, zeroconf=zc)
+    finally:
+        zc.close()
+    assert [d.to_dict() for d in devices] == [{"alias": "magnova-1234", "url": "TCPIP::127.0.0.1::5025::SOCKET", "source": "mdns"}]
+
+
+def test_empty_scan_is_not_cached(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "cache.json"))
+    cache.store([DiscoveredDevice("001065", "USB::0x19b2::0x30::001065::INSTR", "usb")])
+    assert discover(cache, refresh=True, usb=False, mdns=False) == []
+    assert cache.load() is None
+
+
+def test_resolve_device_by_transport():
+    devices = [DiscoveredDevice("001065", "USB::0x19b2::0x30::001065::INSTR", "usb"),
+               DiscoveredDevice("magnova-1234", "http://10.0.0.1:8080/scpi", "mdns"),
+               DiscoveredDevice("magnova-1234", "TCPIP::10.0.0.1::5025::SOCKET", "mdns")]
+    assert resolve_device("auto", devices) == "TCPIP::10.0.0.1::5025::SOCKET"
+    assert resolve_device("auto", devices, VisaUsbUrl) == "USB::0x19b2::0x30::001065::INSTR"
+    assert resolve_device("1234", devices, RestUrl) == "http://10.0.0.1:8080/scpi"
+    assert resolve_device("001065", devices, VisaTcpUrl) is None
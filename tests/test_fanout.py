@@ -0,0 +1,24 @@
+from pygnova.fanout import print_report, read_inventory, run_on_devices
+
+
+class _Instrument:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+def test_inventory_aliases_label_results(tmp_path, capsys):
+    inventory = tmp_path / "devices.txt"
+    inventory.write_text("# bench\nTCPIP::10.0.0.1::5025::SOCKET  scope-left\nTCPIP::10.0.0.2::5025::SOCKET\n")
+    devices = read_inventory(str(inventory))
+    assert devices == [("TCPIP::10.0.0.1::5025::SOCKET", "scope-left"), ("TCPIP::10.0.0.2::5025::SOCKET", None)]
+
+    results = run_on_devices([url for url, _alias in devices], lambda instrument: "ok",
+                             instrument_factory=lambda url: _Instrument(),
+                             aliases={url: alias for url, alias in devices if alias is not None})
+    assert [r.label for r in results] == ["scope-left (TCPIP::10.0.0.1::5025::SOCKET)", "TCPIP::10.0.0.2::5025::SOCKET"]
+    print_report(results, 0.0)
+    assert "scope-left (TCPIP::10.0.0.1::5025::SOCKET)  ok" in capsys.readouterr().out
@@ -0,0 +1,27 @@
+import pytest
+
+from pygnova.fake_instrument import FakeInstrument, FakeInstrumentThread
+from pygnova.instrument import RestInstrument, TCP_TRANSPORT_SOCKET, get_instrument_from_url
+from pygnova.socket_instrument import SocketInstrument
+
+
+def test_options_of_other_transports_are_dropped():
+    instrument = get_instrument_from_url(
+        "TCPIP::10.0.0.1::5025::SOCKET", tcp_transport=TCP_TRANSPORT_SOCKET, rw_timeout=50, pool_size=2)
+    assert isinstance(instrument, SocketInstrument) and instrument.rw_timeout == 50
+    assert isinstance(get_instrument_from_url("http://10.0.0.1:8080/scpi", pool_size=2), RestInstrument)
+
+
+def test_unknown_option_raises():
+    with pytest.raises(TypeError, match="rw_timout"):
+        get_instrument_from_url("TCPIP::10.0.0.1::5025::SOCKET", tcp_transport=TCP_TRANSPORT_SOCKET, rw_timout=50)
+
+
+@pytest.mark.parametrize("json_blocks", [False, True])
+def test_rest_block_response(json_blocks):
+    with FakeInstrumentThread(FakeInstrument(block_size=1000)) as fake:
+        fake.rest_server.json_blocks = json_blocks
+        with get_instrument_from_url(fake.rest_url) as instrument:
+            assert list(instrument.read_block("WAVeform:DATA")) == list(range(256)) * 3 + list(range(232))
+            with pytest.raises(ValueError, match="block"):
+                instrument.read_block("*IDN")
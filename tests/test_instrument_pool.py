@@ -0,0 +1,41 @@
+import time
+
+from pygnova.instrument_pool import InstrumentPool
+
+URL = "TCPIP::10.0.0.1::5025::SOCKET"
+
+
+class _Instrument:
+
+    def __init__(self):
+        self.listeners = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.closed = True
+        return False
+
+
+def test_idle_instrument_is_closed_without_further_pool_use():
+    pool = InstrumentPool(instrument_factory=lambda url: _Instrument(), idle_timeout=0.05)  # noqa
+    with pool.lease(URL) as instrument:
+        pass
+    assert not instrument.closed
+    time.sleep(0.3)
+    assert instrument.closed
+    assert pool.stats.evictions == 1
+    pool.close()
+
+
+def test_reused_instrument_stays_open():
+    pool = InstrumentPool(instrument_factory=lambda url: _Instrument(), idle_timeout=0.2)  # noqa
+    with pool.lease(URL) as first:
+        pass
+    with pool.lease(URL) as second:
+        time.sleep(0.3)
+    assert second is first and not first.closed
+    pool.close()
+    assert first.closed
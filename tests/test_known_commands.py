@@ -0,0 +1,43 @@
+import hashlib
+import io
+import json
+
+import pytest
+
+from pygnova.fake_instrument import FakeInstrument, FakeInstrumentThread
+from pygnova.instrument_url import url_from_str
+from pygnova.known_commands import KnownCommandsRestReader, iter_json_array
+
+DOCUMENT = ' [ "CHANnel<n>:SCALe" , 12345,-1.5e3,{"a": [1, 2]}, "Frequenz äö €", null, true ] '.encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_iter_json_array_across_chunk_boundaries(chunk_size):
+    digest = hashlib.sha256()
+    items = list(iter_json_array(io.BytesIO(DOCUMENT), chunk_size, digest))
+    # numbers split across chunks and multi-byte characters are decoded as in one piece
+    assert items == json.loads(DOCUMENT)
+    assert digest.hexdigest() == hashlib.sha256(DOCUMENT).hexdigest()
+
+
+@pytest.mark.parametrize("document", [b'{"CHANnel<n>:SCALe": 1}', b'["CHANnel<n>:SCALe", 12', b'["CHANnel<n>:SCALe", "OFF'])
+def test_iter_json_array_rejects_invalid_documents(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(document), 4))
+
+
+def test_conditional_fetch_not_modified():
+    with FakeInstrumentThread(FakeInstrument(known_commands=["CHANnel<n>:SCALe", "CHANnel<n>:OFFSet", "*IDN"])) as fake:
+        url = url_from_str(fake.rest_url)
+        with KnownCommandsRestReader(url, chunk_size=8) as reader:
+            tree = reader.load_known_commands()
+        assert tree is not None and not reader.not_modified and reader.etag is not None and reader.sha256 is not None
+
+        with KnownCommandsRestReader(url, etag=reader.etag) as conditional:
+            assert conditional.not_modified
+            assert conditional.load_known_commands() is None
+
+        fake.instrument.known_commands.append("TIMebase:SCALe")
+        with KnownCommandsRestReader(url, etag=reader.etag) as changed:
+            assert not changed.not_modified and changed.etag != reader.etag
+            assert changed.load_known_commands() != tree
@@ -0,0 +1,73 @@
+import pytest
+
+from pygnova import monitor
+from pygnova.fake_instrument import FakeInstrument
+from pygnova.monitor import Monitor, MonitorSink
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now: float = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class _Instrument:
+
+    def __init__(self, clock: _Clock, poll_times):
+        self.clock = clock
+        self.poll_times = list(poll_times)
+        self.fake = FakeInstrument()
+        self.polled_at = []
+
+    def query(self, message: str) -> str:
+        self.polled_at.append(round(self.clock.now - 100.0, 6))
+        self.clock.now += self.poll_times.pop(0) if self.poll_times else 0.0
+        return self.fake.handle(message).decode("utf-8")
+
+
+class _Sink(MonitorSink):
+
+    def __init__(self):
+        self.samples = []
+        self.closed = False
+
+    def write(self, sample) -> None:
+        self.samples.append(sample)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(monitor.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(monitor.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_ticks_stay_on_the_time_grid(clock):
+    instrument = _Instrument(clock, [0.03, 0.05, 0.01, 0.09])
+    sink = _Sink()
+    stats = Monitor(instrument, ["CHANnel1:SCALe", "CHANnel2:SCALe"], 10.0, sink).run(samples=5)  # noqa
+    assert instrument.polled_at == [0.0, 0.1, 0.2, 0.3, 0.4]  # polling time does not accumulate as drift
+    assert [s.tick for s in sink.samples] == [0, 1, 2, 3, 4]
+    assert all(len(s.values) == 2 for s in sink.samples) and sink.closed
+    assert (stats.samples, stats.late_ticks, stats.skipped_ticks) == (5, 0, 0)
+
+
+def test_missed_ticks_are_skipped(clock):
+    instrument = _Instrument(clock, [0.0, 0.35, 0.12])
+    sink = _Sink()
+    stats = Monitor(instrument, ["CHANnel1:SCALe"], 10.0, sink).run(samples=4)  # noqa
+    # tick 1 polls until 0.45: tick 2 starts 0.25s late, ticks 2 and 3 are skipped; tick 5 (deadline 0.5) is late at 0.57
+    assert [s.tick for s in sink.samples] == [0, 1, 4, 5]
+    assert instrument.polled_at == [0.0, 0.1, 0.45, 0.57]
+    assert (stats.late_ticks, stats.skipped_ticks) == (2, 2)
+    assert stats.max_lateness == pytest.approx(0.25)
@@ -0,0 +1,52 @@
+from pygnova.command_index import CommandIndex
+from pygnova.fake_instrument import FakeInstrument
+from pygnova.query_cache import CachedInstrument
+
+
+class _Instrument:
+
+    def __init__(self):
+        self.fake = FakeInstrument()
+        self.reads: int = 0
+
+    def read(self, command: str) -> str:
+        self.reads += 1
+        return self.fake.handle(f"{command}?").decode("utf-8")
+
+    def write(self, command: str) -> None:
+        for part in CachedInstrument.absolute_commands(command):  # the fake does not resolve relative headers
+            self.fake.handle(part)
+
+
+def test_volatile_queries_are_not_cached():
+    instrument = _Instrument()
+    cache = CachedInstrument(instrument)  # noqa
+    for command in ("*OPC", "SYST:ERR", "SYSTem:ERRor:NEXT", "MEASure:VPP", "CHANnel1:SCALe") * 2:
+        cache.read(command)
+    assert instrument.reads == 9
+    assert cache.stats.hits == 1
+
+
+def test_compound_write_invalidates_relative_headers():
+    instrument = _Instrument()
+    commands = CommandIndex({"CHANnel<n>": {"SCALe": {}, "OFFSet": {}}, "*CLS": {}})
+    cache = CachedInstrument(instrument, commands)  # noqa
+    cache.write(":CHANnel1:SCALe 1;:CHANnel1:OFFSet 2")
+    assert (cache.read("CHANnel1:SCALe"), cache.read("CHANnel1:OFFSet")) == ("1", "2")
+    cache.write("CHANnel1:SCALe 3;*CLS;OFFSet 4")
+    assert (cache.read("CHANnel1:SCALe"), cache.read("CHANnel1:OFFSet")) == ("3", "4")
+    assert CachedInstrument.absolute_commands("CHANnel1:SCALe 3;*CLS;OFFSet 4;:TIMebase:SCALe 1") == [
+        "CHANnel1:SCALe 3", "*CLS", "CHANnel1:OFFSet 4", "TIMebase:SCALe 1"]
+
+
+def test_typed_queries_are_cached():
+    instrument = _Instrument()
+    cache = CachedInstrument(instrument)  # noqa
+    cache.write("CHANnel1:SCALe 0.5")
+    assert cache.query_float("CHANnel1:SCALe") == 0.5
+    assert cache.read("CHANnel1:SCALe") == "0.5"
+    assert list(cache.query_array("CHANnel1:SCALe")) == [0.5]
+    assert instrument.reads == 1
+    cache.write("CHANnel1:SCALe 2")
+    assert list(cache.query_ints("CHANnel1:SCALe")) == [2]
+    assert instrument.reads == 2
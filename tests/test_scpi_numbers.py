@@ -0,0 +1,35 @@
+import math
+
+import pytest
+
+from pygnova.scpi_numbers import parse_array, parse_float
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500m", 0.5),
+    ("5.0E-1 V", 0.5),
+    ("2.5MAHZ", 2.5e6),
+    ("1MHZ", 1e6),
+    ("1 mhz", 1e6),
+    ("10MOHM", 1e7),
+    ("1MV", 1e-3),
+    ("1MS", 1e-3),
+    ("50OHM", 50.0),
+    ("5A", 5.0),
+    ("3KHZ", 3e3),
+])
+def test_parse_float_suffixes(text, expected):
+    assert parse_float(text) == pytest.approx(expected)
+
+
+def test_parse_float_special_values():
+    assert parse_float("9.9E37") == math.inf
+    assert math.isnan(parse_float("9.91E37"))
+    assert parse_float("NINF") == -math.inf
+    with pytest.raises(ValueError):
+        parse_float("1XYZ")
+
+
+def test_parse_array_falls_back_to_suffixes():
+    assert list(parse_array("1,2.5,3e3")) == [1.0, 2.5, 3000.0]
+    assert list(parse_array("1MHZ,500m")) == [1e6, 0.5]
@@ -0,0 +1,109 @@
+import contextlib
+import os
+import socket
+import stat
+import threading
+import time
+
+import pytest
+
+from pygnova.session_daemon import OP_WRITE, DeviceSession, SessionDaemon, daemon_available
+
+
+class _Instrument:
+
+    def __init__(self):
+        self.messages = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def write(self, message: str) -> None:
+        self.messages.append(message)
+
+
+def test_session_serves_clients_round_robin():
+    instrument = _Instrument()
+    opening, release = threading.Event(), threading.Event()
+
+    def factory(_url):
+        opening.set()
+        release.wait(5)  # the requests below queue up meanwhile
+        return instrument
+
+    session = DeviceSession("fake", factory)
+    try:
+        first = session.submit(1, OP_WRITE, "A 0")
+        opening.wait(5)
+        futures = [session.submit(1, OP_WRITE, f"A {i}") for i in range(1, 5)]
+        futures += [session.submit(2, OP_WRITE, f"B {i}") for i in range(2)]
+        release.set()
+        for future in [first] + futures:
+            future.result(5)
+    finally:
+        session.close()
+    # one request per client and round: client 1 does not delay client 2 by its backlog
+    assert instrument.messages == ["A 0", "A 1;:B 0", "A 2;:B 1", "A 3", "A 4"]
+    assert (session.requests, session.messages) == (7, 5)
+
+
+def _serve_until_shutdown(daemon: SessionDaemon) -> None:
+    with contextlib.suppress(OSError):  # accept fails once the listening socket is shut down
+        daemon.serve_forever()
+
+
+def _serve(daemon: SessionDaemon) -> threading.Thread:
+    thread = threading.Thread(target=_serve_until_shutdown, args=(daemon,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not daemon_available(daemon.socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return thread
+
+
+def _stop(daemon: SessionDaemon, thread: threading.Thread) -> None:
+    daemon._server.shutdown(socket.SHUT_RDWR)  # noqa  wakes up accept
+    thread.join(5)
+
+
+def test_daemon_socket_is_private_and_removed_on_exit(tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    with open(socket_path, "w"):
+        pass  # left over by a terminated daemon
+    daemon = SessionDaemon(socket_path, lambda url: _Instrument())  # noqa
+    thread = _serve(daemon)
+    assert stat.S_ISSOCK(os.stat(socket_path).st_mode)
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    _stop(daemon, thread)
+    assert not os.path.exists(socket_path)
+
+
+def test_second_daemon_keeps_the_socket_of_the_first(tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    daemon = SessionDaemon(socket_path, lambda url: _Instrument())  # noqa
+    thread = _serve(daemon)
+    try:
+        with pytest.raises(RuntimeError):
+            SessionDaemon(socket_path, lambda url: _Instrument()).serve_forever()  # noqa
+        assert daemon_available(socket_path)
+    finally:
+        _stop(daemon, thread)
+
+
+def test_failed_bind_leaves_foreign_files(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "daemon.sock")
+    foreign = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    bind = socket.socket.bind
+
+    def racing_bind(self, address):
+        bind(foreign, address)  # another daemon binds between the availability check and bind
+        bind(self, address)
+
+    monkeypatch.setattr(socket.socket, "bind", racing_bind)
+    with foreign:
+        with pytest.raises(OSError):
+            SessionDaemon(socket_path, lambda url: _Instrument()).serve_forever()  # noqa
+        assert os.path.exists(socket_path)
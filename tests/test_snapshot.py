@@ -0,0 +1,37 @@
+from pygnova.fake_instrument import FakeInstrument
+from pygnova.snapshot import StateSnapshot, query_only_headers, restore_snapshot, settings_headers
+
+TREE = {"CHANnel<n>": {"SCALe": {}, "FREQuency?": {}}, "MEASure": {"VPP": {}}, "*IDN?": {}}
+
+
+class _Instrument:
+
+    def __init__(self, errors):
+        self.fake = FakeInstrument()
+        self.errors = list(errors)
+        self.messages = []
+
+    def query(self, message: str) -> str:
+        self.messages.append(message)
+        if message == "SYSTem:ERRor?" and len(self.errors) != 0:
+            return self.errors.pop(0)
+        response = self.fake.handle(message)
+        return response.decode("utf-8") if response is not None else ""
+
+    def write(self, command: str) -> None:
+        self.messages.append(command)
+        self.fake.handle(command)
+
+
+def test_query_only_leaves_are_no_settings():
+    assert settings_headers(TREE, channels=2) == ["CHANnel1:SCALe", "CHANnel2:SCALe"]
+    assert query_only_headers(TREE, channels=2) == ["CHANnel1:FREQuency", "CHANnel2:FREQuency"]
+
+
+def test_restore_skips_query_only_leaves_and_reports_errors():
+    instrument = _Instrument(["-222,\"Data out of range\"", "0,\"No error\""])
+    snapshot = StateSnapshot("fake", "fake", {"CHANnel1:SCALe": "5", "CHANnel1:FREQuency?": "1000"})
+    changes, errors, _messages = restore_snapshot(instrument, snapshot, query_only=query_only_headers(TREE, channels=2))  # noqa
+    assert changes == [("CHANnel1:SCALe", "0", "5")]
+    assert [(e.code, e.message) for e in errors] == [(-222, "Data out of range")]
+    assert not any("FREQ" in message for message in instrument.messages)
@@ -0,0 +1,31 @@
+import time
+
+import pytest
+
+from pygnova.fake_instrument import FakeInstrument, FakeInstrumentThread
+from pygnova.instrument import TCP_TRANSPORT_SOCKET, get_instrument_from_url
+
+
+def test_failed_block_read_does_not_shift_responses():
+    with FakeInstrumentThread(FakeInstrument(block_size=256 * 1024)) as fake:
+        with get_instrument_from_url(fake.tcp_url, tcp_transport=TCP_TRANSPORT_SOCKET) as instrument:
+            instrument.write("CHANnel1:SCALe 1")
+            with pytest.raises(RuntimeError):
+                with instrument._block_reader("WAVeform:DATA?") as reader:  # noqa
+                    reader.readinto(memoryview(bytearray(16)))
+                    raise RuntimeError("consumer failed")
+            assert instrument.read("CHANNEL1:SCALE") == "1"
+            assert len(instrument.read_block("WAVeform:DATA")) == 256 * 1024
+
+
+def test_timed_out_query_does_not_shift_responses():
+    with FakeInstrumentThread() as fake:
+        with get_instrument_from_url(fake.tcp_url, tcp_transport=TCP_TRANSPORT_SOCKET, rw_timeout=100) as instrument:
+            instrument.write("CHANnel1:SCALe 1")
+            instrument.write("CHANnel2:SCALe 2")
+            fake.instrument.latency = 0.3
+            with pytest.raises(TimeoutError):
+                instrument.read("CHANNEL1:SCALE")
+            fake.instrument.latency = 0.0
+            time.sleep(0.4)  # the late response has arrived
+            assert instrument.read("CHANNEL2:SCALE") == "2"